@@ -6,7 +6,16 @@ from exkaldi.core import set_kaldi_path
 
 from exkaldi.core import KaldiArk
 from exkaldi.core import KaldiDict
+from exkaldi.core import KaldiPackedDict
 from exkaldi.core import KaldiLattice
+from exkaldi.core import KaldiMmapArk
+from exkaldi.core import KaldiScpIndex
+from exkaldi.core import CMVNStats
+from exkaldi.core import NormalizeStats
+from exkaldi.core import OnlineSlidingCMVN
+from exkaldi.core import FeatureCache
+from exkaldi.core import OnlineFeatureExtractor
+from exkaldi.core import Pipeline
 
 from exkaldi.core import Supporter
 from exkaldi.core import DataIterator
@@ -7,6 +7,7 @@ import math
 import tempfile
 import os
 import gc
+import numpy as np
 
 class WrongOperation(Exception):pass
 class PathError(Exception):pass
@@ -263,12 +264,14 @@ class Client(object):
         self.threadManager['record'] = threading.Thread(target=recordWave,args=(seconds,self.dataQueue,))
         self.threadManager['record'].start()
 
-    def recognize(self,func,args=None,interval=0.3):
+    def recognize(self,func,args=None,interval=0.3,asArray=False):
         '''
-        Usage:  client.recognize(recogFunc)
+        Usage:  client.recognize(recogFunc) or client.recognize(recogFunc,asArray=True)
         
         Recognize wav.
         <func> received path name of chunk wav file (and <args>).
+        If <asArray> is True, <func> receives the chunk wave data as a NumPy array instead (samples, or samples x channels), so no temporary wav file is written. 
+        It can be given to exkaldi.compute_mfcc() and the other feature functions directly.
         <interval> is the seconds of each chunk wav data.
         '''      
         if not self.safeFlag:
@@ -280,7 +283,7 @@ class Client(object):
         if ('send' in self.threadManager.keys() and self.threadManager['send'].is_alive()) or ('receive' in self.threadManager.keys() and self.threadManager['receive'].is_alive()):
             raise WrongOperation('<local> mode and <remote> mode are not expected to run meanwhile.')
 
-        def recognizeWave(dataQueue,func,args,resultQueue,interval):
+        def recognizeWave(dataQueue,func,args,resultQueue,interval,asArray):
             
             class VAD(object):
                 def __init__(self):
@@ -327,17 +330,26 @@ class Client(object):
                             
                         if count >= timesPerReco:
                             if len(dataPerReco) > 0:
-                                with tempfile.NamedTemporaryFile('w+b',suffix='.wav') as waveFile:
-                                    wf = wave.open(waveFile.name, 'wb')
-                                    wf.setsampwidth(self.width)
-                                    wf.setnchannels(self.channels)
-                                    wf.setframerate(self.rate)
-                                    wf.writeframes(b''.join(dataPerReco))
-                                    wf.close()
+                                if asArray is True:
+                                    waveData = np.frombuffer(b''.join(dataPerReco),dtype=self.formats)
+                                    if self.channels > 1:
+                                        waveData = waveData.reshape(-1,self.channels)
                                     if args != None:
-                                        result = func(waveFile.name,args)
+                                        result = func(waveData,args)
                                     else:
-                                        result = func(waveFile.name)        
+                                        result = func(waveData)
+                                else:
+                                    with tempfile.NamedTemporaryFile('w+b',suffix='.wav') as waveFile:
+                                        wf = wave.open(waveFile.name, 'wb')
+                                        wf.setsampwidth(self.width)
+                                        wf.setnchannels(self.channels)
+                                        wf.setframerate(self.rate)
+                                        wf.writeframes(b''.join(dataPerReco))
+                                        wf.close()
+                                        if args != None:
+                                            result = func(waveFile.name,args)
+                                        else:
+                                            result = func(waveFile.name)
                             if count > timesPerReco:
                                 resultQueue.put((True,result))
                                 break
@@ -356,7 +368,7 @@ class Client(object):
                 else:
                     resultQueue.put('endFlag')
 
-        self.threadManager['recognize'] = threading.Thread(target=recognizeWave,args=(self.dataQueue,func,args,self.resultQueue,interval,))
+        self.threadManager['recognize'] = threading.Thread(target=recognizeWave,args=(self.dataQueue,func,args,self.resultQueue,interval,asArray,))
         self.threadManager['recognize'].start()
 
     def connect_to(self, proto='TCP', targetHost=None, targetPort=9509, timeout=10):
@@ -799,12 +811,14 @@ class Server(object):
         self.threadManager['receive'] = threading.Thread(target=recvWave,args=(self.dataQueue,))
         self.threadManager['receive'].start()
 
-    def recognize(self,func,args=None,interval=0.3):
+    def recognize(self,func,args=None,interval=0.3,asArray=False):
         '''
-        Usage:  client.recognize(recogFunc)
+        Usage:  client.recognize(recogFunc) or client.recognize(recogFunc,asArray=True)
         
         Recognize wav.
         <func> received path name of chunk wav file (and <args>).
+        If <asArray> is True, <func> receives the chunk wave data as a NumPy array instead (samples, or samples x channels), so no temporary wav file is written. 
+        It can be given to exkaldi.compute_mfcc() and the other feature functions directly.
         <interval> is the seconds of each chunk wav data.
         '''      
         if not self.safeFlag:
@@ -813,7 +827,7 @@ class Server(object):
         if 'recognize' in self.threadManager.keys() and self.threadManager['recognize'].is_alive():
             raise WrongOperation('Another recognition task is running now.')
 
-        def recognizeWave(dataQueue,func,args,resultQueue,interval):
+        def recognizeWave(dataQueue,func,args,resultQueue,interval,asArray):
             
             class VAD(object):
                 def __init__(self):
@@ -860,17 +874,26 @@ class Server(object):
                         
                         if count >= timesPerReco:
                             if len(dataPerReco) > 0:
-                                with tempfile.NamedTemporaryFile('w+b',suffix='.wav') as waveFile:
-                                    wf = wave.open(waveFile.name, 'wb')
-                                    wf.setsampwidth(self.width)
-                                    wf.setnchannels(self.channels)
-                                    wf.setframerate(self.rate)
-                                    wf.writeframes(b''.join(dataPerReco))
-                                    wf.close()
+                                if asArray is True:
+                                    waveData = np.frombuffer(b''.join(dataPerReco),dtype=self.formats)
+                                    if self.channels > 1:
+                                        waveData = waveData.reshape(-1,self.channels)
                                     if args != None:
-                                        result = func(waveFile.name,args)
+                                        result = func(waveData,args)
                                     else:
-                                        result = func(waveFile.name) 
+                                        result = func(waveData)
+                                else:
+                                    with tempfile.NamedTemporaryFile('w+b',suffix='.wav') as waveFile:
+                                        wf = wave.open(waveFile.name, 'wb')
+                                        wf.setsampwidth(self.width)
+                                        wf.setnchannels(self.channels)
+                                        wf.setframerate(self.rate)
+                                        wf.writeframes(b''.join(dataPerReco))
+                                        wf.close()
+                                        if args != None:
+                                            result = func(waveFile.name,args)
+                                        else:
+                                            result = func(waveFile.name)
                             else:
                                 result = " "
                             if count > timesPerReco:
@@ -891,7 +914,7 @@ class Server(object):
                 else:
                     resultQueue.put('endFlag')
 
-        self.threadManager['recognize'] = threading.Thread(target=recognizeWave,args=(self.dataQueue,func,args,self.resultQueue,interval,))
+        self.threadManager['recognize'] = threading.Thread(target=recognizeWave,args=(self.dataQueue,func,args,self.resultQueue,interval,asArray,))
         self.threadManager['recognize'].start()
 
     def send(self):
@@ -999,7 +1022,7 @@ class Server(object):
                         self.finalRecognizedResult.append("")
                     return "".join(self.finalRecognizedResult)
     
-    def run(self,targetHost,func,args=None,proto='TCP',bindHost=None,bindPort=9509,interval=0.3):
+    def run(self,targetHost,func,args=None,proto='TCP',bindHost=None,bindPort=9509,interval=0.3,asArray=False):
         '''
         Usage:  server = Server()
                 server.run(targetHost="192.168.1.1",func=func,bindHost="192.168.1.2")
@@ -1022,7 +1045,7 @@ class Server(object):
 
             print("Start receive >> recognize >> send-back loop.")
             self.receive()
-            self.recognize(func,args,interval)
+            self.recognize(func,args,interval,asArray)
             server.send()
             server.wait()
             print("Task over.")
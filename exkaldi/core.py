@@ -23,7 +23,15 @@ import numpy as np
 from io import BytesIO
 import struct,copy,re,time
 import subprocess,threading
-from collections import Iterable
+import mmap
+import glob,wave,hashlib
+import concurrent.futures
+import collections
+import functools
+try:
+	from collections.abc import Iterable
+except ImportError:
+	from collections import Iterable
 
 class PathError(Exception):pass
 class WrongOperation(Exception):pass
@@ -116,6 +124,645 @@ def set_kaldi_path(path):
 
 # ------------ Classes ------------
 
+_ARK_DTYPES = {'FM ':'float32','DM ':'float64','IM ':'int32','UM ':'int64'}
+_ARK_CM_TYPES = ('CM ','CM2 ','CM3 ')
+_ARK_DTYPE_SYMBOLS = { np.dtype(v):k for k,v in _ARK_DTYPES.items() }
+_ARK_MATRIX_HEADER = struct.Struct('<bibi')
+_ARK_CM_HEADER = struct.Struct('<ffii')
+_ARK_SPACES = (9,10,13,32)
+_CM_LUT_STEPS = (
+				np.arange(0,65,dtype=np.float32) * np.float32(1/64.0),
+				np.arange(1,129,dtype=np.float32) * np.float32(1/128.0),
+				np.arange(1,64,dtype=np.float32) * np.float32(1/63.0),
+			)
+_CM_SEGMENT_STEPS = np.array([64,128,63],dtype=np.float32)
+_CM_SEGMENT_BASES = np.array([0,64,192],dtype=np.uint8)
+
+def _parse_ark_header(buf,pos,utt,checkSize=True):
+	'''
+	Usage:  (dataType,dataOffset,rows,cols,endOffset) = _parse_ark_header(buf,pos,utt)
+
+	Decode the header of one matrix whose binary symbol "\\0B" starts at offset <pos> of <buf>.
+	For compressed data, <dataOffset> points to the global header following the data type symbol.
+	If <checkSize> is "False", <buf> is allowed to hold only the header.
+	'''
+	if buf[pos:pos+2] != b'\0B':
+		raise WrongDataFormat('Miss binary symbol before utterance.')
+	try:
+		dataType = bytes(buf[pos+2:pos+5]).decode()
+		if dataType in _ARK_DTYPES:
+			s1,rows,s2,cols = _ARK_MATRIX_HEADER.unpack_from(buf,pos+5)
+			if s1 != 4 or s2 != 4:
+				raise WrongDataFormat('Wrong matrix header at utterance {}.'.format(utt))
+			dataOffset = pos + 15
+			endOffset = dataOffset + rows * cols * (4 if dataType in ('FM ','IM ') else 8)
+		elif dataType == 'CM ':
+			dataOffset = pos + 5
+			_,_,rows,cols = _ARK_CM_HEADER.unpack_from(buf,dataOffset)
+			endOffset = dataOffset + 16 + cols * 8 + rows * cols
+		else:
+			dataType = bytes(buf[pos+2:pos+6]).decode()
+			if not dataType in _ARK_CM_TYPES:
+				raise WrongDataFormat('Expected data type FM(float32),DM(float64),IM(int32),UM(int64),CM(compressed ark data) but got {}.'.format(dataType))
+			dataOffset = pos + 6
+			_,_,rows,cols = _ARK_CM_HEADER.unpack_from(buf,dataOffset)
+			endOffset = dataOffset + 16 + rows * cols * (2 if dataType == 'CM2 ' else 1)
+	except (struct.error,UnicodeDecodeError):
+		raise WrongDataFormat("Matrix header of utterance {} is incomplete.".format(utt))
+	if checkSize and endOffset > len(buf):
+		raise WrongDataFormat("Matrix data of utterance {} is incomplete.".format(utt))
+	return (dataType,dataOffset,rows,cols,endOffset)
+
+def _scan_ark(buf,start=0):
+	'''
+	Usage:  for (utt,dataType,headOffset,dataOffset,rows,cols,endOffset) in _scan_ark(arkData)
+
+	Iterate over the records of Kaldi binary ark data. <buf> can be bytes, mmap or other object with .find() method and buffer interface.
+	Utterance IDs are located with .find() and headers are decoded with precompiled struct layouts, so the matrix data is never read or copied.
+	'''
+	size = len(buf)
+	pos = start
+	while True:
+		while pos < size and buf[pos] in _ARK_SPACES:
+			pos += 1
+		if pos >= size:
+			break
+		space = buf.find(b' ',pos)
+		if space == -1:
+			raise WrongDataFormat('Miss utterance ID before utterance.')
+		utt = bytes(buf[pos:space]).decode()
+		(dataType,dataOffset,rows,cols,endOffset) = _parse_ark_header(buf,space+1,utt)
+		yield (utt,dataType,pos,dataOffset,rows,cols,endOffset)
+		pos = endOffset
+
+def _read_scp(fileName):
+	'''
+	Usage:  entries = _read_scp('feats.scp')
+
+	Read a Kaldi feature scp file. Return a list of (utterance ID, ark file name, offset).
+	Raise UnsupportedDataType if an entry is a pipe command or a matrix range that can only be read by Kaldi.
+	'''
+	entries = []
+	with open(fileName,'r',encoding='utf-8') as fr:
+		for line in fr:
+			line = line.strip()
+			if line == '':
+				continue
+			line = line.split(maxsplit=1)
+			if len(line) < 2:
+				raise WrongDataFormat('Miss file name of utterance {} in {}.'.format(line[0],fileName))
+			utt,location = line
+			location = location.strip()
+			if location.endswith('|') or location.endswith(']'):
+				raise UnsupportedDataType('Cannot read scp entry "{}" without Kaldi.'.format(location))
+			i = location.rfind(':')
+			if i > 0 and location[i+1:].isdigit():
+				entries.append((utt,location[0:i],int(location[i+1:])))
+			else:
+				entries.append((utt,location,0))
+	return entries
+
+def _read_compressed_matrix(buf,dataType,dataOffset):
+	'''
+	Usage:  matrix = _read_compressed_matrix(buf,'CM ',dataOffset)
+
+	Decode a Kaldi compressed matrix whose global header starts at <dataOffset> of <buf>. Return a float32 NumPy array.
+	"CM " data is decoded by a 256-entry lookup table of each column, so every byte is mapped with a single gather.
+	"CM2 " and "CM3 " data are linearly quantized over the global range by uint16 and uint8 respectively.
+	'''
+	globmin, globrange, rows, cols = _ARK_CM_HEADER.unpack_from(buf,dataOffset)
+	dataOffset += 16
+	globmin = np.float32(globmin)
+	globrange = np.float32(globrange)
+
+	if dataType == 'CM2 ':
+		data = np.frombuffer(buf, dtype=np.uint16, count=rows*cols, offset=dataOffset).reshape(rows,cols)
+		return globmin + (globrange * np.float32(1.0/65535.0)) * data.astype(np.float32)
+	elif dataType == 'CM3 ':
+		data = np.frombuffer(buf, dtype=np.uint8, count=rows*cols, offset=dataOffset).reshape(rows,cols)
+		return globmin + (globrange * np.float32(1.0/255.0)) * data.astype(np.float32)
+	elif dataType != 'CM ':
+		raise UnsupportedDataType('Compressed data type {} has not been supported.'.format(dataType))
+
+	# The data is structed as [Colheader, ... , Colheader, Data, Data , .... ]
+	#                         {           cols           }{     size         }
+	percentiles = np.frombuffer(buf, dtype=np.uint16, count=cols*4, offset=dataOffset).reshape(cols,4)
+	percentiles = globmin + (globrange * np.float32(1.0/65535.0)) * percentiles.astype(np.float32)
+	p0 = percentiles[:,0:1]
+	p25 = percentiles[:,1:2]
+	p75 = percentiles[:,2:3]
+	p100 = percentiles[:,3:4]
+
+	# Lookup table of every column: byte value -> float
+	table = np.empty((cols,256), dtype=np.float32)
+	table[:,0:65] = p0 + (p25 - p0) * _CM_LUT_STEPS[0]
+	table[:,65:193] = p25 + (p75 - p25) * _CM_LUT_STEPS[1]
+	table[:,193:256] = p75 + (p100 - p75) * _CM_LUT_STEPS[2]
+
+	# Data is stored as col-major. Its transposed view is turned into row-major indexes of the flattened tables and gathered at once.
+	data = np.frombuffer(buf, dtype=np.uint8, count=cols*rows, offset=dataOffset+cols*8).reshape(cols,rows).T
+	index = np.empty((rows,cols), dtype=np.intp)
+	np.add(data, np.arange(0,cols*256,256,dtype=np.intp), out=index)
+	return table.ravel()[index]
+
+def _compress_matrix(matrix,method='auto'):
+	'''
+	Usage:  data = _compress_matrix(matrix) 
+
+	Encode a 2-dimension NumPy array as Kaldi compressed matrix. Return the binary data from the data type symbol, such as b"CM " + ...
+	This is a port of Kaldi CompressedMatrix. If <method> is "auto", use "CM" format with per-column percentile headers when the matrix has more than 8 rows, else use "CM2".
+	"CM2" and "CM3" formats quantize data over global range to uint16 and uint8 respectively.
+	'''
+	matrix = np.asarray(matrix,dtype=np.float32)
+	rows,cols = matrix.shape
+	if method == 'auto':
+		method = 'CM' if rows > 8 else 'CM2'
+
+	if matrix.size == 0:
+		minValue = maxValue = np.float32(0)
+	else:
+		minValue = matrix.min()
+		maxValue = matrix.max()
+	if maxValue == minValue:
+		maxValue = minValue + (np.float32(1.0) + abs(minValue))
+	globRange = np.float32(maxValue - minValue)
+	header = _ARK_CM_HEADER.pack(minValue,globRange,rows,cols)
+
+	def float_to_uint(value,scale):
+		f = np.clip((value - minValue) / globRange, np.float32(0), np.float32(1))
+		return (f * np.float32(scale) + np.float32(0.499)).astype(np.int32)
+
+	if method == 'CM2':
+		return b'CM2 ' + header + float_to_uint(matrix,65535).astype(np.uint16).tobytes()
+	elif method == 'CM3':
+		return b'CM3 ' + header + float_to_uint(matrix,255).astype(np.uint8).tobytes()
+	elif method != 'CM':
+		raise UnsupportedDataType('Expected compression method "auto", "CM", "CM2" or "CM3" but got {}.'.format(method))
+
+	# Percentile headers of every column: the min, the 25th and 75th order statistics and the max.
+	sortedData = np.sort(matrix,axis=0)
+	if rows >= 5:
+		quarter = rows // 4
+		positions = [0,quarter,3*quarter,rows-1]
+	else:
+		positions = [min(i,rows-1) for i in range(4)]
+	percentiles = float_to_uint(sortedData[positions],65535).T
+	percentiles[:,0] = np.minimum(percentiles[:,0],65532)
+	for i,limit in ((1,65533),(2,65534),(3,65535)):
+		if rows > i:
+			percentiles[:,i] = np.minimum(np.maximum(percentiles[:,i],percentiles[:,i-1]+1),limit)
+		else:
+			percentiles[:,i] = percentiles[:,i-1] + 1
+	colHeaders = percentiles.astype(np.uint16)
+
+	p = minValue + (globRange * np.float32(1.0/65535.0)) * colHeaders.astype(np.float32)
+	lower = p[:,0:3]
+	span = p[:,1:4] - p[:,0:3]
+
+	# Data is stored as col-major. Every value is assigned to its percentile segment at first, 
+	# then mapped to the nearest byte code in it: [p0,p25) -> 0~64, [p25,p75) -> 64~192, [p75,p100] -> 192~255.
+	data = matrix.T
+	segment = (data >= p[:,1:2]).astype(np.intp)
+	segment += data >= p[:,2:3]
+	steps = _CM_SEGMENT_STEPS[segment]
+	with np.errstate(divide='ignore',invalid='ignore'):
+		codes = (data - np.take_along_axis(lower,segment,axis=1)) / np.take_along_axis(span,segment,axis=1) * steps + np.float32(0.5)
+	np.clip(codes,0,steps,out=codes)
+	codes = codes.astype(np.uint8)
+	codes += _CM_SEGMENT_BASES[segment]
+	return b'CM ' + header + colHeaders.tobytes() + codes.tobytes()
+
+def _read_ark_file(fileName):
+	'''
+	Usage:  arkData = _read_ark_file('feat.ark')
+
+	Read a binary ark file without Kaldi. Compressed matrixes are kept compressed and decoded when they are accessed. Return a KaldiArk object.
+	The file is read in one allocation and copied once into the KaldiArk object. Raise UnsupportedDataType if it is a text ark file.
+	'''
+	with open(fileName,'rb') as fr:
+		data = fr.read()
+
+	space = data.find(b' ')
+	if space != -1 and data[space+1:space+3] != b'\0B':
+		raise UnsupportedDataType('{} is not a binary ark file.'.format(fileName))
+
+	return KaldiArk(data)
+
+def _alloc_ark(utts,shapes,dtypes):
+	'''
+	Usage:  buf,matrixes = _alloc_ark(['utt1','utt2'],[(10,13),(8,13)],['float32','float32'])
+
+	Allocate one bytearray for uncompressed matrixes of <shapes> and <dtypes>, and write headers of all records.
+	Return it and writable matrix views of its data parts, so results are computed into the ark buffer directly in one pass.
+	Give the filled buffer to _wrap_ark() to make the KaldiArk object.
+	'''
+	heads = []
+	total = 0
+	for utt,(rows,cols),dtype in zip(utts,shapes,dtypes):
+		dtype = np.dtype(dtype)
+		head = (utt+' \0B'+_ARK_DTYPE_SYMBOLS[dtype]).encode()
+		heads.append(head)
+		total += len(head) + _ARK_MATRIX_HEADER.size + rows*cols*dtype.itemsize
+
+	buf = bytearray(total)
+	matrixes = []
+	offset = 0
+	for head,(rows,cols),dtype in zip(heads,shapes,dtypes):
+		buf[offset:offset+len(head)] = head
+		offset += len(head)
+		_ARK_MATRIX_HEADER.pack_into(buf,offset,4,rows,4,cols)
+		offset += _ARK_MATRIX_HEADER.size
+		matrix = np.frombuffer(buf,dtype=dtype,count=rows*cols,offset=offset).reshape(rows,cols)
+		matrixes.append(matrix)
+		offset += matrix.nbytes
+
+	return buf,matrixes
+
+def _wrap_ark(buf):
+	'''
+	Usage:  arkData = _wrap_ark(buf)
+
+	Make a KaldiArk object from a bytearray filled through the views of _alloc_ark(). Delete the views before calling it.
+	A bytes subclass always copies its source, and a bytearray source is copied twice, so it is turned into bytes at first and 
+	freed before the KaldiArk object is made. It costs two copies and the peak memory is twice of the ark size.
+	'''
+	data = bytes(buf)
+	del buf[:]
+	return KaldiArk(data)
+
+def _join_ark(items):
+	'''
+	Usage:  arkData = _join_ark(obj.items())
+
+	Serialize (utterance ID, matrix) pairs of int32, int64, float32 or float64 matrixes into binary ark data. Return bytes.
+	Headers are packed and the buffers of matrixes are given to bytes.join directly, which sizes the output at first and copies every matrix once,
+	so no intermediate bytes of any record is made.
+	'''
+	pieces = []
+	for utt,matrix in items:
+		rows,cols = matrix.shape
+		pieces.append((utt+' \0B'+_ARK_DTYPE_SYMBOLS[matrix.dtype]).encode() + _ARK_MATRIX_HEADER.pack(4,rows,4,cols))
+		pieces.append(np.ascontiguousarray(matrix))
+	return b''.join(pieces)
+
+def _read_scp_record(fr,offset,utt):
+	'''
+	Usage:  (record,dataType,dataOffset,rows,cols) = _read_scp_record(fr,offset,'utt1')
+
+	Read one matrix record from an opened ark file <fr>. <offset> is the position of the binary symbol "\\0B" given by the scp file.
+	A header is read at first and the rest data is read at second, so it costs one seek and two reads at most.
+	'''
+	fr.seek(offset)
+	record = fr.read(22)
+	(dataType,dataOffset,rows,cols,endOffset) = _parse_ark_header(record,0,utt,checkSize=False)
+	if endOffset <= len(record):
+		record = record[0:endOffset]
+	else:
+		record += fr.read(endOffset-len(record))
+		if len(record) < endOffset:
+			raise WrongDataFormat("Matrix data of utterance {} is incomplete.".format(utt))
+	return (record,dataType,dataOffset,rows,cols)
+
+def _read_scp_data(fileName):
+	'''
+	Usage:  arkData = _read_scp_data('feats.scp')
+
+	Read all matrixes refered by a scp file without Kaldi. Every matrix costs one seek and one read of its ark file. 
+	Compressed matrixes are kept compressed. Return a KaldiArk object.
+	'''
+	newData = []
+	files = {}
+	try:
+		for (utt,arkFile,offset) in _read_scp(fileName):
+			if not arkFile in files:
+				if not os.path.isfile(arkFile):
+					raise PathError('No such file:{}.'.format(arkFile))
+				files[arkFile] = open(arkFile,'rb')
+			(record,dataType,dataOffset,rows,cols) = _read_scp_record(files[arkFile],offset,utt)
+			newData.append((utt+' ').encode())
+			newData.append(record)
+	finally:
+		for fr in files.values():
+			fr.close()
+
+	return KaldiArk(b''.join(newData))
+
+class _ArkIndex(object):
+	'''
+	Usage:  index = _ArkIndex(arkData)
+
+	Offset table of ark binary data. It records the utterance ID, the offset of header, the offset of matrix data, 
+	rows, columns and data type of every utterance, so that meta information can be looked up without parsing the data again.
+	Compressed matrixes are indexed as they are and decoded only when they are gotten.
+	'''
+	def __init__(self,data):
+
+		self.utts = []
+		self.dataTypes = []
+		headOffsets = []
+		dataOffsets = []
+		rows = []
+		cols = []
+		endOffsets = []
+
+		for (utt,dataType,headOffset,dataOffset,r,c,endOffset) in _scan_ark(data):
+			self.utts.append(utt)
+			self.dataTypes.append(dataType)
+			headOffsets.append(headOffset)
+			dataOffsets.append(dataOffset)
+			rows.append(r)
+			cols.append(c)
+			endOffsets.append(endOffset)
+		
+		self.headOffsets = np.array(headOffsets,dtype=np.int64)
+		self.dataOffsets = np.array(dataOffsets,dtype=np.int64)
+		self.rows = np.array(rows,dtype=np.int64)
+		self.cols = np.array(cols,dtype=np.int64)
+		self.endOffsets = np.array(endOffsets,dtype=np.int64)
+
+		# The first position of every utterance ID, which lookups by ID use. Duplicated records are still in the table.
+		self.uttPos = {}
+		for i,utt in enumerate(self.utts):
+			if not utt in self.uttPos:
+				self.uttPos[utt] = i
+
+	def __len__(self):
+		return len(self.utts)
+
+	def record_span(self,start,end):
+		'''
+		Return the (begin,end) byte offsets which cover records from <start> to <end>-1.
+		'''
+		return int(self.headOffsets[start]),int(self.endOffsets[end-1])
+
+	def spans(self,positions):
+		'''
+		Return a list of (begin,end) byte offsets which cover records at sorted <positions>. Adjacent records are merged into one span.
+		'''
+		positions = np.asarray(positions,dtype=np.int64)
+		if len(positions) == 0:
+			return []
+		breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+		starts = positions[np.concatenate([[0],breaks])]
+		ends = positions[np.concatenate([breaks-1,[len(positions)-1]])]
+		return list(zip(self.headOffsets[starts].tolist(),self.endOffsets[ends].tolist()))
+
+	def dtype(self,i):
+		'''
+		Return the NumPy data type name of the <i>th matrix. Compressed matrixes are decoded as float32.
+		'''
+		return _ARK_DTYPES.get(self.dataTypes[i],'float32')
+
+	def get_matrix(self,buf,i):
+		'''
+		Return the <i>th matrix of <buf>. An uncompressed matrix is a read-only view of <buf> and a compressed matrix is decoded.
+		'''
+		dataType = self.dataTypes[i]
+		if dataType in _ARK_CM_TYPES:
+			return _read_compressed_matrix(buf,dataType,int(self.dataOffsets[i]))
+		rows = int(self.rows[i])
+		cols = int(self.cols[i])
+		matrix = np.frombuffer(buf,dtype=_ARK_DTYPES[dataType],count=rows*cols,offset=int(self.dataOffsets[i]))
+		return matrix.reshape(rows,cols)
+
+
+def _parse_dims(dims,dim):
+	'''
+	Usage:  selectFlag,retainFlag = _parse_dims('1,5-20',40)
+
+	Return a list of selected dimensions and its sorted unique version. <dims> should be an int value or string like "1,5-20".
+	'''
+	if dim == 1:
+		raise WrongOperation('Cannot select any data from 1-dim data.')
+	elif isinstance(dims,int):
+		assert dims >= 0, '<dims> should be a non-negative value.'
+		assert dims < dim, "Selection index should be smaller than data dimension {} but got {}.".format(dim,dims)
+		selectFlag = [dims,]
+	elif isinstance(dims,str):
+
+		if dims.strip() == "":
+			raise WrongOperation("<dims> is not a dmensional value avaliable.")
+
+		selectFlag = []
+		for i in dims.split(','):
+			if not '-' in i:
+				try:
+					i = int(i)
+				except ValueError:
+					raise WrongOperation('Expected int value but got {}.'.format(i))
+				else:
+					assert i >= 0, '<dims> should be a non-negative value.'
+					assert i < dim, "Selection index should be smaller than data dimension {} but got {}.".format(dim,i)
+					selectFlag.append(i)
+			else:
+				i = i.split('-')
+				if i[0].strip() == '':
+					i[0] = 0
+				if i[1].strip() == '':
+					i[1] = dim-1
+				try:
+					i[0] = int(i[0])
+					i[1] = int(i[1])
+				except ValueError:
+					raise WrongOperation('Expected selection index is int value.')
+				else:
+					if i[0] > i[1]:
+						i[0], i[1] = i[1], i[0]
+					assert i[1] < dim, "Selection index should be smaller than data dimension {} but got {}.".format(dim, i[1])
+					selectFlag.extend(range(i[0],i[1]+1))
+	else:
+		raise WrongOperation('Expected <dims> is int value or string like 1,4-9,12 but got {}.'.format(type(dims)))
+
+	retainFlag = sorted(set(selectFlag))
+
+	return selectFlag,retainFlag
+
+def _dims_index(flag):
+	'''
+	Return a slice if the dimensions in <flag> have a constant positive step, so indexing gives a view, or a read-only int array otherwise.
+	'''
+	if len(flag) == 1:
+		return slice(flag[0],flag[0]+1)
+	step = flag[1] - flag[0]
+	if step > 0 and all( flag[i+1]-flag[i] == step for i in range(len(flag)-1) ):
+		return slice(flag[0],flag[-1]+1,step)
+	index = np.array(flag,dtype=np.intp)
+	index.flags.writeable = False
+	return index
+
+@functools.lru_cache(maxsize=128)
+def _cached_dims(dims,dim):
+	selectFlag,retainFlag = _parse_dims(dims,dim)
+	restFlag = sorted(set(range(dim)) - set(retainFlag))
+	return _dims_index(selectFlag),(_dims_index(restFlag) if len(restFlag) > 0 else None)
+
+def _compile_dims(dims,dim):
+	'''
+	Usage:  selectIndex,restIndex = _compile_dims('1,5-20',40)
+
+	Compile a dimension spec of <dim>-dim data into the index of selected dimensions and the index of the other dimensions (None if no one is left).
+	An index is a slice when it is possible, or an int array. Compiled specs are cached, so a spec is parsed only once.
+	'''
+	if not isinstance(dims,(int,str)):
+		raise WrongOperation('Expected <dims> is int value or string like 1,4-9,12 but got {}.'.format(type(dims)))
+	return _cached_dims(dims,dim)
+
+def _take_dims(matrix,dimIndex,copy=True):
+	'''
+	Usage:  newMatrix = _take_dims(matrix,_compile_dims('1,5-20',40)[0])
+
+	Return the columns of <matrix> at a compiled dimension index. A slice index gives a view of <matrix> if <copy> is "False".
+	'''
+	if copy and isinstance(dimIndex,slice):
+		return matrix[:,dimIndex].copy()
+	return matrix[:,dimIndex]
+
+def _splice_matrix(matrix,left,right,out=None):
+	'''
+	Usage:  newMatrix = _splice_matrix(matrix,4,4)
+
+	Splice context frames of a matrix like Kaldi "splice-feats". Edge frames are repeated and the context of frame t is ordered from t-<left> to t+<right>.
+	Every output frame is a window over the padded matrix, so all windows are gathered by a single copy from a strided view.
+	If <out> is given, write the result into it.
+	'''
+	frames,dim = matrix.shape
+	if frames == 0:
+		if out is None:
+			out = np.empty((0,dim*(left+right+1)),dtype=matrix.dtype)
+		return out
+	padded = np.empty((frames+left+right,dim),dtype=matrix.dtype)
+	padded[0:left] = matrix[0]
+	padded[left:left+frames] = matrix
+	padded[left+frames:] = matrix[-1]
+	itemsize = padded.itemsize
+	windows = np.lib.stride_tricks.as_strided(padded,shape=(frames,dim*(left+right+1)),strides=(dim*itemsize,itemsize),writeable=False)
+	if out is None:
+		return windows.copy()
+	out[...] = windows
+	return out
+
+def _delta_scales(order,window):
+	'''
+	Usage:  scales = _delta_scales(2,2)
+
+	Return a list of regression coefficients of every order, computed in the same way as Kaldi DeltaFeatures.
+	The scales of order i are the scales of order i-1 convolved with [-window, ..., window] and divided by the sum of j^2.
+	'''
+	scales = [np.ones(1,dtype=np.float32)]
+	ramp = np.arange(-window,window+1,dtype=np.float32)
+	for i in range(order):
+		scales.append((np.convolve(ramp,scales[-1]) / np.float32(np.sum(ramp*ramp))).astype(np.float32))
+	return scales
+
+def _delta_matrix(matrix,scales,out=None):
+	'''
+	Usage:  newMatrix = _delta_matrix(matrix,_delta_scales(2,2))
+
+	Compute delta features of one utterance. Frames out of the edges are replaced with the first or the last frame.
+	Every coefficient is applied to the whole shifted matrix at once. If <out> is given, write the result into it.
+	'''
+	if not matrix.dtype in (np.float32,np.float64):
+		matrix = matrix.astype(np.float32)
+	frames,dim = matrix.shape
+	if out is None:
+		out = np.empty((frames,dim*len(scales)),dtype=matrix.dtype)
+	if frames == 0:
+		return out
+
+	maxOffset = (len(scales[-1])-1) // 2
+	padded = np.empty((frames+2*maxOffset,dim),dtype=matrix.dtype)
+	padded[0:maxOffset] = matrix[0]
+	padded[maxOffset:maxOffset+frames] = matrix
+	padded[maxOffset+frames:] = matrix[-1]
+
+	for i,scale in enumerate(scales):
+		output = out[:,i*dim:(i+1)*dim]
+		output[...] = 0
+		offset = (len(scale)-1) // 2
+		for j in range(-offset,offset+1):
+			if scale[j+offset] != 0:
+				start = maxOffset + j
+				output += scale[j+offset] * padded[start:start+frames]
+	return out
+
+def _sliding_window_bounds(frames,cmnWindow,minWindow,center,numFrames=None):
+	'''
+	Usage:  (start,end) = _sliding_window_bounds(np.arange(T),600,100,False,T)
+
+	Return the start and end (one past the last) frame of the CMVN window of every frame in <frames>, in the same way as Kaldi SlidingWindowCmn.
+	If <numFrames> is None, the stream is treated as unfinished and the windows are not limited by the end of data.
+	'''
+	if center:
+		start = frames - cmnWindow // 2
+		end = start + cmnWindow
+	else:
+		start = frames - cmnWindow
+		end = frames + 1
+	shift = np.minimum(start,0)
+	start = start - shift
+	end = end - shift
+	if not center:
+		end = np.maximum(end,minWindow)
+	if numFrames != None:
+		over = np.maximum(end - numFrames,0)
+		start = np.maximum(start - over,0)
+		end = np.minimum(end,numFrames)
+	return start,end
+
+def _sliding_cmvn(frames,start,end,sums,sumsqs,std):
+	'''
+	Normalize <frames> by the windows [<start>,<end>). <sums> and <sumsqs> are functions which map window edges to cumulative sums.
+	'''
+	counts = (end - start).astype(np.float64)[:,None]
+	windowSum = sums(end) - sums(start)
+	result = frames - windowSum / counts
+	if std:
+		variance = (sumsqs(end) - sumsqs(start)) / counts - (windowSum / counts) ** 2
+		np.maximum(variance,1.0e-10,out=variance)
+		result /= np.sqrt(variance)
+		result[counts[:,0] == 1] = 0
+	return result
+
+def _sliding_cmvn_matrix(matrix,cmnWindow=600,minWindow=100,center=False,std=False):
+	'''
+	Usage:  newMatrix = _sliding_cmvn_matrix(matrix)
+
+	Apply sliding window CMVN to one utterance like Kaldi "apply-cmvn-sliding". The window sums of all frames are taken from cumulative sums, 
+	so it costs O(frames*dim) regardless of window size. If <cmnWindow> is None, the whole utterance is used as window.
+	'''
+	frames = len(matrix)
+	dtype = matrix.dtype if matrix.dtype == np.float64 else np.float32
+	if frames == 0:
+		return np.array(matrix,dtype=dtype)
+	if cmnWindow == None:
+		cmnWindow = frames
+	data = np.asarray(matrix,dtype=np.float64)
+	cumSum = np.zeros((frames+1,data.shape[1]),dtype=np.float64)
+	np.cumsum(data,axis=0,out=cumSum[1:])
+	if std:
+		cumSumsq = np.zeros_like(cumSum)
+		np.cumsum(data*data,axis=0,out=cumSumsq[1:])
+	else:
+		cumSumsq = None
+	start,end = _sliding_window_bounds(np.arange(frames),cmnWindow,minWindow,center,frames)
+	result = _sliding_cmvn(data,start,end,cumSum.__getitem__,None if cumSumsq is None else cumSumsq.__getitem__,std)
+	return result.astype(dtype)
+
+def _normalize_frames(data,std,alpha,beta,epsilon,axis,inPlace=False):
+	'''
+	Return alpha * (data-mean)/(std+epsilon) + beta, or alpha * (data-mean) + beta if <std> is not True, with the mean and std along <axis>.
+	If <inPlace> is "True", float <data> is overwritten.
+	'''
+	mean = np.mean(data,axis=axis,keepdims=True)
+	scale = alpha/(np.std(data,axis=axis,keepdims=True)+epsilon) if std is True else alpha
+	if not (inPlace and data.dtype in (np.float32,np.float64)):
+		data = data - mean
+	else:
+		data -= mean
+	data *= scale
+	data += beta
+	return data
+
 class KaldiArk(bytes):
 	'''
 	Usage: obj = KaldiArk(binaryData) or obj = KaldiArk()
@@ -125,49 +772,43 @@ class KaldiArk(bytes):
 	'''
 	def __init__(self,*args):
 		super(KaldiArk,self).__init__()
+		self._index = None
 	
-	def _read_one_record(self,fp):
+	def _get_index(self):
 		'''
-		Read a utterance.
+		Return the offset index of all utterances. It is built when it is used at the first time and cached in this object.
 		'''
-		utt = ''
-		while True:
-			char = fp.read(1).decode()
-			if (char == '') or (char == ' '):break
-			utt += char
-		utt = utt.strip()
-		if utt == '':
-			if fp.read() == b'':
-				return (None,None,None,None,None)
-			else:
-				fp.close()
-				raise WrongDataFormat('Miss utterance ID before utterance.')
-		binarySymbol = fp.read(2).decode()
-		if binarySymbol == '\0B':
-			dataType = fp.read(3).decode() 
-			if dataType == 'CM ':
-				fp.close()
-				raise UnsupportedDataType('This is compressed ark data. Use load(<arkFile>) function to load ark file again or \
-					use decompress(<KaldiArk>) function to decompress it firstly.')                    
-			elif dataType == 'FM ' or dataType == 'IM ':
-				sampleSize = 4
-			elif dataType == 'DM ' or dataType == 'UM ':
-				sampleSize = 8
-			else:
-				fp.close()
-				raise WrongDataFormat('Expected data type FM(float32),DM(float64),IM(int32),UM(int64),CM(compressed ark data) but got {}.'.format(dataType))
-			s1,rows,s2,cols = np.frombuffer(fp.read(10), dtype='int8,int32,int8,int32', count=1)[0]
-			rows = int(rows)
-			cols = int(cols)
-			buf = fp.read(rows * cols * sampleSize)
-		else:
-			fp.close()
-			raise WrongDataFormat('Miss binary symbol before utterance.')
-		return (utt,dataType,rows,cols,buf)
+		if getattr(self,'_index',None) is None:
+			self._index = _ArkIndex(self)
+		return self._index
 	
 	def __str__(self):
 		return "This is a KaldiArk object with unviewable binary data. To looking its content, please use .array method."
 
+	def get_matrix(self,utt):
+		'''
+		Usage:  matrix = obj.get_matrix('utt1')
+
+		Return the matrix of <utt> as a read-only view of the binary data. Compressed matrix is decoded at this time, and only it is decoded.
+		Indexing a KaldiArk object with [] is the same as bytes. Use .array[utt] to get a matrix from the transformed KaldiDict object.
+		'''
+		index = self._get_index() if self != b'' else None
+		if index is None or not utt in index.uttPos:
+			raise KeyError(utt)
+		return index.get_matrix(memoryview(self),index.uttPos[utt])
+
+	def items(self):
+		'''
+		Usage:  for utt,matrix in obj.items()
+
+		Iterate the utterance IDs and matrixes. Compressed matrixes are decoded one by one, so only one of them is expanded in memory at a time.
+		'''
+		if self != b'':
+			index = self._get_index()
+			buf = memoryview(self)
+			for i,utt in enumerate(index.utts):
+				yield utt,index.get_matrix(buf,i)
+
 	@property
 	def lens(self):
 		'''
@@ -179,14 +820,8 @@ class KaldiArk(bytes):
 		if self == b"":
 			lengths = (0, None)
 		else:
-			with BytesIO(self) as sp:
-				_lens = {}
-				while True:
-					(utt,dataType,rows,cols,buf) = self._read_one_record(sp)
-					if utt == None:
-						break
-					else:
-						_lens[utt] = rows
+			index = self._get_index()
+			_lens = dict(zip(index.utts,index.rows.tolist()))
 			lengths = (len(_lens), _lens)
 		
 		return lengths
@@ -201,9 +836,8 @@ class KaldiArk(bytes):
 		if self == b"":
 			dimension = None
 		else:
-			with BytesIO(self) as sp:
-				(utt,dataType,rows,cols,buf) = self._read_one_record(sp)
-			dimension = cols
+			index = self._get_index()
+			dimension = int(index.cols[0]) if len(index) > 0 else None
 		
 		return dimension
 	
@@ -217,16 +851,8 @@ class KaldiArk(bytes):
 		if self == b"":
 			_dtype = None
 		else:
-			with BytesIO(self) as sp:
-				(utt,dataType,rows,cols,buf) = self._read_one_record(sp)
-			if dataType == 'FM ':
-				_dtype = 'float32'
-			elif dataType == 'DM ':
-				_dtype = 'float64'
-			elif dataType == 'IM ':
-				_dtype = 'int32'
-			else:
-				_dtype = 'int64'                
+			index = self._get_index()
+			_dtype = index.dtype(0) if len(index) > 0 else None
 		return _dtype
 
 	def to_dtype(self,dtype):
@@ -241,38 +867,10 @@ class KaldiArk(bytes):
 		if self == b"" or self.dtype == dtype:
 			result = copy.deepcopy(self)
 		else:
-			if dtype == 'float32' or dtype == 'float':
-				newDataType = 'FM '
-			elif dtype == 'float64':
-				newDataType = 'DM '
-			elif dtype == 'int32' or dtype == 'int':
-				newDataType = 'IM '
-			else:
-				newDataType = 'UM '
-			
-			result = []
-			with BytesIO(self) as sp:
-				while True:
-					(utt,dataType,rows,cols,buf) = self._read_one_record(sp)
-					if utt == None:
-						break
-					if dataType == 'FM ': 
-						matrix = np.frombuffer(buf, dtype=np.float32)
-					elif dataType == 'DM ':
-						matrix = np.frombuffer(buf, dtype=np.float64)
-					elif dataType == 'IM ':
-						matrix = np.frombuffer(buf, dtype=np.int32)
-					else:
-						matrix = np.frombuffer(buf, dtype=np.int64)
-					newMatrix = np.array(matrix,dtype=dtype).tobytes()
-					data = (utt+' '+'\0B'+newDataType).encode()
-					data += '\04'.encode()
-					data += struct.pack(np.dtype('uint32').char, rows)
-					data += '\04'.encode()
-					data += struct.pack(np.dtype('uint32').char, cols)
-					data += newMatrix
-					result.append(data)
-			result = KaldiArk(b''.join(result))
+			dtype = {'float':'float32','int':'int32'}.get(dtype,dtype)
+			index = self._get_index()
+			data = memoryview(self)
+			result = KaldiArk(_join_ark( (utt,index.get_matrix(data,i).astype(dtype)) for i,utt in enumerate(index.utts) ))
 
 		return result
 
@@ -283,15 +881,9 @@ class KaldiArk(bytes):
 		
 		Return a list: including all utterance IDs.
 		'''
-		allUtts = []
-		with BytesIO(self) as sp:
-			while True:
-				(utt,dataType,rows,cols,buf) = self._read_one_record(sp)
-				if utt == None:
-					break
-				else:
-					allUtts.append(utt)
-		return allUtts
+		if self == b"":
+			return []
+		return list(self._get_index().utts)
 	
 	def check_format(self):
 		'''
@@ -300,33 +892,15 @@ class KaldiArk(bytes):
 		Check whether data has a correct format of Kaldi ark data. If having, return True, or raise ERROR.
 		'''
 		if self != b'':
-			_dim = 'unknown'
-			_dataType = 'unknown'
-			with BytesIO(self) as sp:
-				while True: 
-					(utt,dataType,rows,cols,buf) = self._read_one_record(sp)
-					if utt == None:
-						break
-					if _dim == 'unknown':
-						_dim = cols
-						_dataType = dataType
-					elif cols != _dim:
-						raise WrongDataFormat("Expected dimension {} but got {} at utterance {}.".format(_dim,cols,utt))
-					elif _dataType != dataType:
-						raise WrongDataFormat("Expected data type {} but got {} at uttwerance {}.".format(_dataType,dataType,utt))                    
-					else:
-						try:
-							if dataType == 'FM ':
-								vec = np.frombuffer(buf, dtype=np.float32)
-							elif dataType == 'DM ':
-								vec = np.frombuffer(buf, dtype=np.float64)
-							elif dataType == 'IM ':
-								vec = np.frombuffer(buf, dtype=np.int32)
-							else:
-								vec = np.frombuffer(buf, dtype=np.int64)
-						except Exception as e:
-							print("Wrong matrix data format at utterance {}.".format(utt))
-							raise e
+			index = self._get_index()
+			if len(index) > 0:
+				_dim = index.cols[0]
+				_dataType = index.dataTypes[0]
+				for i,utt in enumerate(index.utts):
+					if index.cols[i] != _dim:
+						raise WrongDataFormat("Expected dimension {} but got {} at utterance {}.".format(_dim,index.cols[i],utt))
+					elif index.dataTypes[i] != _dataType:
+						raise WrongDataFormat("Expected data type {} but got {} at uttwerance {}.".format(_dataType,index.dataTypes[i],utt))
 			return True
 		else:
 			return False
@@ -340,35 +914,33 @@ class KaldiArk(bytes):
 		Usage:  newObj = obj.array
 		
 		Return a KaldiDict object. Transform ark data into NumPy array data.
+		The matrixes are read-only views of this KaldiArk object. Use .to_dict(copy=True) if you want to get writable matrixes.
+		'''
+		return self.to_dict(copy=False)
+
+	def to_dict(self,copy=False):
+		'''
+		Usage:  newObj = obj.to_dict() or newObj = obj.to_dict(copy=True)
+		
+		Return a KaldiDict object. Transform ark data into NumPy array data.
+		If <copy> is "False", every matrix is a read-only view at its offset of the binary data of this object, so no memory is copied.
+		Note that the views keep this KaldiArk object alive. If <copy> is "True", every matrix is an independent and writable copy.
+		Compressed matrixes are always decoded to new float32 arrays. Use .items() or obj[utt] to decode them one by one.
 		'''
 		newDict = KaldiDict()
-		if self != b'':
-			with BytesIO(self) as sp:
-				while True:
-					(utt,dataType,rows,cols,buf) = self._read_one_record(sp)
-					if utt == None:
-						break
-					try:
-						if dataType == 'FM ': 
-							newMatrix = np.frombuffer(buf, dtype=np.float32)
-						elif dataType == 'DM ':
-							newMatrix = np.frombuffer(buf, dtype=np.float64)
-						elif dataType == 'IM ':
-							newMatrix = np.frombuffer(buf, dtype=np.int32)
-						else:
-							newMatrix = np.frombuffer(buf, dtype=np.int64)
-					except Exception as e:
-						print("Wrong matrix data format at utterance {}.".format(utt))
-						raise e	
-					else:				
-						newDict[utt] = np.reshape(newMatrix,(rows,cols))
+		for utt,newMatrix in self.items():
+			if copy is True and not newMatrix.flags.writeable:
+				newMatrix = newMatrix.copy()
+			newDict[utt] = newMatrix
 		return newDict
 	
-	def save(self,fileName,chunks=1,outScpFile=False):
+	def save(self,fileName,chunks=1,outScpFile=False,compress=False):
 		'''
-		Usage: obj.save('feat.ark')
+		Usage: obj.save('feat.ark') or obj.save('feat.ark',compress=True)
 		
 		Save as .ark (and .scp) file. If <chunks> is larger than "1", split it averagely and save them.
+		Int data is saved as float data so that the file can be read by Kaldi.
+		If <compress> is "True", save matrixes as Kaldi compressed matrix, in the same way as Kaldi "copy-feats --compress=true".
 		'''        
 		if self == b'':
 			raise WrongOperation('No data to save.')
@@ -376,28 +948,29 @@ class KaldiArk(bytes):
 		#if sys.getsizeof(self)/chunks > 10000000000:
 		#   print("Warning: Data size is extremely large. Try to save it with a long time.")
 
-		global KALDIROOT,kaidiNotFoundError,ENV
-		if KALDIROOT is None:
-			raise kaidiNotFoundError
-
 		def save_chunk_data(chunkData,fileName,outScpFile):
+			if compress:
+				# Compressed matrixes are copied as they are so that they are not quantized again
+				chunkData = KaldiArk(chunkData)
+				index = chunkData._get_index()
+				newData = []
+				for i,utt in enumerate(index.utts):
+					if index.dataTypes[i] in _ARK_CM_TYPES:
+						begin,stop = index.record_span(i,i+1)
+						newData.append(chunkData[begin:stop])
+					else:
+						newData.append((utt+' \0B').encode() + _compress_matrix(index.get_matrix(chunkData,i)))
+				chunkData = b''.join(newData)
+			with open(fileName,'wb') as fw:
+				fw.write(chunkData)
 			if outScpFile is True:
-				cmd = "copy-feats ark:- ark,scp:{},{}".format(fileName,fileName[0:-3]+"scp")
-			else:
-				cmd = "copy-feats ark:- ark:{}".format(fileName)
-			p = subprocess.Popen(cmd,shell=True,stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate(input=chunkData)
-			if not os.path.isfile(fileName) or os.path.getsize(fileName) == 0:
-				err = err.decode()
-				print(err)
-				if os.path.isfile(fileName):
-					os.remove(fileName)
-				raise KaldiProcessError('Save ark data defeated.')
+				scpFile = fileName[0:-3]+"scp"
+				with open(scpFile,'w',encoding='utf-8') as fw:
+					for (utt,dataType,headOffset,dataOffset,rows,cols,endOffset) in _scan_ark(chunkData):
+						fw.write('{} {}:{}\n'.format(utt,fileName,chunkData.find(b' ',headOffset)+1))
+				return (fileName,scpFile)
 			else:
-				if outScpFile is True:
-					return (fileName,fileName[0:-3]+"scp")
-				else:
-					return fileName
+				return fileName
 		
 		if self.dtype == 'int32':
 			savingData = self.to_dtype('float32')
@@ -413,37 +986,27 @@ class KaldiArk(bytes):
 		else:
 			if fileName.strip().endswith('.ark'):
 				fileName = fileName[0:-4]
-			with BytesIO(savingData) as sp:
-				uttLens = []
-				while True:
-					(utt,dataType,rows,cols,buf) = self._read_one_record(sp)
-					if utt == None:
-						break
-					if dataType == 'DM ' or dataType == 'UM ':
-						sampleSize = 8
-					else:
-						sampleSize = 4
-					oneRecordLen = len(utt) + 16 + rows * cols * sampleSize
-					uttLens.append(oneRecordLen)
-				sp.seek(0)
-				allLens = len(uttLens)
-				chunkUtts = allLens//chunks
-				if chunkUtts == 0:
-					chunks = allLens
-					chunkUtts = 1
-					t = 0
-					print("Warning: utterances is fewer than <chunks> so only {} files will be saved.".format(chunks))
-				else:
-					t = allLens - chunkUtts * chunks
+			index = savingData._get_index()
+			allLens = len(index)
+			chunkUtts = allLens//chunks
+			if chunkUtts == 0:
+				chunks = allLens
+				chunkUtts = 1
+				t = 0
+				print("Warning: utterances is fewer than <chunks> so only {} files will be saved.".format(chunks))
+			else:
+				t = allLens - chunkUtts * chunks
 
-				savedFilesName = []
-				for i in range(chunks):
-					if i < t:
-						chunkLen = sum(uttLens[i*(chunkUtts+1):(i+1)*(chunkUtts+1)])
-					else:
-						chunkLen = sum(uttLens[i*chunkUtts:(i+1)*chunkUtts])
-					chunkData = sp.read(chunkLen)
-					savedFilesName.append(save_chunk_data(chunkData,fileName+'_ck{}.ark'.format(i),outScpFile))
+			savedFilesName = []
+			start = 0
+			for i in range(chunks):
+				if i < t:
+					end = start + chunkUtts + 1
+				else:
+					end = start + chunkUtts
+				begin,stop = index.record_span(start,end)
+				savedFilesName.append(save_chunk_data(savingData[begin:stop],fileName+'_ck{}.ark'.format(i),outScpFile))
+				start = end
 
 		return savedFilesName
 		
@@ -464,34 +1027,27 @@ class KaldiArk(bytes):
 		if self.dim != None and other.dim != None and self.dim != other.dim:
 			raise WrongOperation('Expected unified dimenson but {}!={}.'.format(self.dim,other.dim))        
 
-		selfUtts = self.utts
+		if other == b'':
+			return KaldiArk(self)
+
+		selfUtts = self._get_index().uttPos if self != b'' else {}
 		selfDtype = self.dtype
+		otherIndex = other._get_index()
+		otherBuf = memoryview(other)
+		positions = [ i for i,outt in enumerate(otherIndex.utts) if not outt in selfUtts ]
+		convertTypes = set( t for t in set(otherIndex.dataTypes) if selfDtype != None and _ARK_DTYPES.get(t,'float32') != selfDtype )
 		newData = []
-		with BytesIO(other) as op:
-			while True:
-				(outt,odataType,orows,ocols,obuf) = self._read_one_record(op)
-				if outt == None:
-					break
-				elif not outt in selfUtts:
-					if odataType == 'FM ': 
-						temp = 'float32'
-					elif odataType == 'DM ':
-						temp = 'float64'
-					elif odataType == 'IM ':
-						temp = 'int32'
-					else:
-						temp = 'int64'
-					if selfDtype != None and odataType != None and selfDtype != temp:
-						obuf = np.array(np.frombuffer(obuf,dtype=temp),dtype=selfDtype).tobytes()
-					data = (outt+' ').encode()
-					data += '\0B'.encode()        
-					data += odataType.encode()
-					data += '\04'.encode()
-					data += struct.pack(np.dtype('uint32').char, orows)
-					data += '\04'.encode()
-					data += struct.pack(np.dtype('uint32').char, ocols)
-					data += obuf
-					newData.append(data)
+		if len(convertTypes) == 0:
+			# Records are copied as they are, and adjacent ones are sliced at once.
+			for begin,stop in otherIndex.spans(positions):
+				newData.append(otherBuf[begin:stop])
+		else:
+			for i in positions:
+				if otherIndex.dataTypes[i] in convertTypes:
+					newData.append(_join_ark([(otherIndex.utts[i],otherIndex.get_matrix(other,i).astype(selfDtype))]))
+				else:
+					begin,stop = otherIndex.record_span(i,i+1)
+					newData.append(otherBuf[begin:stop])
 
 		return KaldiArk(b''.join([self,*newData]))
 
@@ -500,40 +1056,28 @@ class KaldiArk(bytes):
 		Usage:  newObj = obj.splice(4) or newObj = obj.splice(4,3)
 		
 		Return a new KaldiArk object. If <right> is None, we define: right = left. If you don't want to splice the right frames, set it "0".
+		Matrixes are read from the binary data and spliced into one preallocated ark buffer. Int data keeps its data type.
 		''' 
 		assert isinstance(left,int) and left >= 0, "Expected <left> is a positive int number."
-
-		global KALDIROOT,kaidiNotFoundError,ENV
-		if KALDIROOT is None:
-			raise kaidiNotFoundError
 		
 		if right == None:
 			right = left
 		else:
 			assert isinstance(right,int) and right >= 0, "Expected <right> is a positive int number."
-		
-		if self.dtype == 'int32':
-			temp = self.to_dtype('float32')
-		elif self.dtype == 'int64':
-			temp = self.to_dtype('float64')
-		else:
-			temp = self
 
-		cmd = 'splice-feats --left-context={} --right-context={} ark:- ark:-'.format(left,right)
-		p = subprocess.Popen(cmd,shell=True,stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-		(out,err) = p.communicate(input=temp)
+		if self == b"":
+			return KaldiArk()
 
-		if out == b'':
-			err = err.decode()
-			print(err)
-			raise KaldiProcessError("Splice left-right frames defeated.")
-		else:
-			result = KaldiArk(out)
-			if self.dtype == 'int32':
-				result = result.to_dtype('int32')
-			elif self.dtype == 'int64':
-				result = result.to_dtype('int64')
-			return result
+		index = self._get_index()
+		shapes = [ (int(rows),int(cols)*(left+right+1)) for rows,cols in zip(index.rows,index.cols) ]
+		dtypes = [ index.dtype(i) for i in range(len(index)) ]
+		buf,outs = _alloc_ark(index.utts,shapes,dtypes)
+		data = memoryview(self)
+		for i in range(len(outs)):
+			_splice_matrix(index.get_matrix(data,i),left,right,out=outs[i])
+		del outs
+
+		return _wrap_ark(buf)
 
 	def select(self,dims,retain=False):
 		'''
@@ -541,115 +1085,48 @@ class KaldiArk(bytes):
 		
 		Select data by pointing dimensions. <dims> should be an int value or string like "1,5-20".
 		If <retain> is "True", return two KaldiArk objects of both selected data and non-selected data.
+		Both of them are gathered in one pass over the binary data into preallocated ark buffers. Int data keeps its data type.
 		''' 
-		global KALDIROOT,kaidiNotFoundError,ENV
-		if KALDIROOT is None:
-			raise kaidiNotFoundError
-
-		_dim = self.dim
-		if _dim == 1:
-			raise WrongOperation('Cannot select any data from 1-dim data.')
-
-		elif isinstance(dims,int):
-			assert dims >= 0, "Expected <dims> is a non-negative int number."
-			assert dims < _dim, "Selection index should be smaller than data dimension {} but got {}.".format(_dim,dims)
-			selectFlag = str(dims)
-			if retain:
-				if dims == 0:
-					retainFlag = '1-{}'.format(_dim-1)
-				elif dims == _dim-1:
-					retainFlag = '0-{}'.format(_dim-2)
-				else:
-					retainFlag = '0-{},{}-{}'.format(dims-1,dims+1,_dim-1)
-		elif isinstance(dims,str):
-			
-			if dims.strip() == "":
-				raise WrongOperation("<dims> is not a dmensional value avaliable.")
+		if self == b"":
+			return (KaldiArk(),KaldiArk()) if retain else KaldiArk()
 
-			if retain:
-				retainFlag = [x for x in range(_dim)]
-				for i in dims.strip().split(','):
-					if i.strip() == "":
-						continue
-					if not '-' in i:
-						try:
-							i = int(i)
-						except ValueError:
-							raise WrongOperation('Expected int value but got {}.'.format(i))
-						else:
-							assert i >= 0, "Expected <dims> is a non-negative int number."
-							assert i < _dim, "Selection index should be smaller than data dimension {} but got {}.".format(_dim,i)
-							retainFlag[i]=-1
-					else:
-						i = i.split('-')
-						if i[0].strip() == '':
-							i[0] = 0
-						if i[1].strip() == '':
-							i[1] = _dim-1
-						try:
-							i[0] = int(i[0])
-							i[1] = int(i[1])
-						except ValueError:
-							raise WrongOperation('Expected selection index is int value.')
-						else:
-							if i[0] > i[1]:
-								i[0], i[1] = i[1], i[0]
-							assert i[1] < _dim, "Selection index should be smaller than data dimension {} but got {}.".format(_dim, i[1])
-						for j in range(i[0],i[1]+1,1):
-							retainFlag[j] = -1
-				temp = ''
-				for x in retainFlag:
-					if x != -1:
-						temp += str(x)+','
-				retainFlag = temp[0:-1]
-			selectFlag = dims
-		else:
-			raise WrongOperation('Expected int value or string like "1,4-9,12" but got {}.'.format(type(dims)))
-		
-		if self.dtype == 'int32':
-			temp = self.to_dtype('float32')
-		elif self.dtype == 'int64':
-			temp = self.to_dtype('float64')
-		else:
-			temp = self
+		index = self._get_index()
+		indexes = [ _compile_dims(dims,int(cols)) for cols in index.cols ]
+		dtypes = [ index.dtype(i) for i in range(len(index)) ]
 
-		cmdS = 'select-feats {} ark:- ark:-'.format(selectFlag)
-		pS = subprocess.Popen(cmdS,shell=True,stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-		(outS,errS) = pS.communicate(input=temp)
-		if outS == b'':
-			errS = errS.decode()
-			print(errS)
-			raise KaldiProcessError("Select data defeated.")
-		else:
-			selectedResult = KaldiArk(outS)
+		def width(dimIndex,cols):
+			if isinstance(dimIndex,slice):
+				return len(range(*dimIndex.indices(cols)))
+			return len(dimIndex)
 
+		seleShapes = [ (int(rows),width(s,int(cols))) for rows,cols,(s,_) in zip(index.rows,index.cols,indexes) ]
+		seleBuf,seleOuts = _alloc_ark(index.utts,seleShapes,dtypes)
 		if retain:
-			if retainFlag == "":
-				retainedResult = KaldiArk()
-			else: 
-				cmdR = 'select-feats {} ark:- ark:-'.format(retainFlag)
-				pR = subprocess.Popen(cmdR,shell=True,stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-				(outR,errR) = pR.communicate(input=temp)
-				if outR == b'':
-					errR = errR.decode()
-					print(errS)
-					raise KaldiProcessError("Select retained data defeated.")
-				else:
-					retainedResult = KaldiArk(outR)
-		
-			if self.dtype == 'int32':
-				return selectedResult.to_dtype('int32'),retainedResult.to_dtype('int32')
-			elif self.dtype == 'int64':
-				return selectedResult.to_dtype('int64'),retainedResult.to_dtype('int64')
+			# Utterances whose all dimensions are selected have no retained data.
+			reseIds = [ i for i,(_,r) in enumerate(indexes) if r is not None ]
+			reseShapes = [ (int(index.rows[i]),width(indexes[i][1],int(index.cols[i]))) for i in reseIds ]
+			reseBuf,reseOuts = _alloc_ark([index.utts[i] for i in reseIds],reseShapes,[dtypes[i] for i in reseIds])
+			reseOuts = dict(zip(reseIds,reseOuts))
+
+		def take(matrix,dimIndex,out):
+			if isinstance(dimIndex,slice):
+				out[...] = matrix[:,dimIndex]
 			else:
-				return selectedResult,retainedResult
+				np.take(matrix,dimIndex,axis=1,out=out)
+
+		data = memoryview(self)
+		for i in range(len(seleOuts)):
+			matrix = index.get_matrix(data,i)
+			take(matrix,indexes[i][0],seleOuts[i])
+			if retain and i in reseOuts:
+				take(matrix,indexes[i][1],reseOuts[i])
+		del seleOuts
+
+		if retain:
+			del reseOuts
+			return _wrap_ark(seleBuf),_wrap_ark(reseBuf)
 		else:
-			if self.dtype == 'int32':
-				return selectedResult.to_dtype('int32')
-			elif self.dtype == 'int64':
-				return selectedResult.to_dtype('int64')
-			else:
-				return selectedResult
+			return _wrap_ark(seleBuf)
 
 	def subset(self,nHead=0,chunks=1,uttList=None):
 		'''
@@ -665,22 +1142,11 @@ class KaldiArk(bytes):
 			if len(self) == 0:
 				return KaldiArk()
 
-			with BytesIO(self) as sp:
-				uttLens = []
-				while nHead > 0:
-					(utt,dataType,rows,cols,buf) = self._read_one_record(sp)
-					if utt == None:
-						break
-					if dataType == 'DM ' or dataType == 'UM ':
-						sampleSize = 8
-					else:
-						sampleSize = 4
-					oneRecordLen = len(utt) + 16 + rows * cols * sampleSize
-					uttLens.append(oneRecordLen) 
-					nHead -= 1       
-				sp.seek(0)
-				data = sp.read(sum(uttLens))
-			return KaldiArk(data)
+			index = self._get_index()
+			nHead = min(nHead,len(index))
+			if nHead == 0:
+				return KaldiArk()
+			return KaldiArk(self[0:index.endOffsets[nHead-1]])
 		
 		elif chunks > 1:
 			assert isinstance(chunks,int), "Expected <chunks> is an int number but got {}.".format(chunks)
@@ -688,35 +1154,26 @@ class KaldiArk(bytes):
 			if len(self) == 0:
 				return []
 
+			index = self._get_index()
+			allLens = len(index)
+			chunkUtts = allLens//chunks
+			if chunkUtts == 0:
+				chunks = allLens
+				chunkUtts = 1
+				t = 0
+			else:
+				t = allLens - chunkUtts * chunks
+
 			datas = []
-			with BytesIO(self) as sp:
-				uttLens = []
-				while True:
-					(utt,dataType,rows,cols,buf) = self._read_one_record(sp)
-					if utt == None:
-						break
-					if dataType == 'DM ' or dataType == 'UM ':
-						sampleSize = 8
-					else:
-						sampleSize = 4
-					oneRecordLen = len(utt) + 16 + rows * cols * sampleSize
-					uttLens.append(oneRecordLen)                                
-				sp.seek(0)
-				allLens = len(uttLens)
-				chunkUtts = allLens//chunks
-				if chunkUtts == 0:
-					chunks = allLens
-					chunkUtts = 1
-					t = 0
+			start = 0
+			for i in range(chunks):
+				if i < t:
+					end = start + chunkUtts + 1
 				else:
-					t = allLens - chunkUtts * chunks
-				for i in range(chunks):
-					if i < t:
-						chunkLen = sum(uttLens[i*(chunkUtts+1):(i+1)*(chunkUtts+1)])
-					else:
-						chunkLen = sum(uttLens[i*chunkUtts:(i+1)*chunkUtts])
-					chunkData = sp.read(chunkLen)
-					datas.append(KaldiArk(chunkData))
+					end = start + chunkUtts
+				begin,stop = index.record_span(start,end)
+				datas.append(KaldiArk(self[begin:stop]))
+				start = end
 			return datas
 
 		elif uttList != None:
@@ -729,26 +1186,37 @@ class KaldiArk(bytes):
 			else:
 				raise UnsupportedDataType('Expected <uttList> is string, list or tuple but got {}.'.format(type(uttList)))
 
+			# Every record of a selected utterance ID is kept, in the order of the data, even if the ID is duplicated.
+			uttSet = set(uttList)
+			index = self._get_index()
+			positions = [ i for i,utt in enumerate(index.utts) if utt in uttSet ]
+			buf = memoryview(self)
 			newData = []
-			with BytesIO(self) as sp:
-				while True:
-					(utt,dataType,rows,cols,buf) = self._read_one_record(sp)
-					if utt == None:
-						break
-					elif utt in uttList:
-						data = b''
-						data = (utt+' \0B'+dataType).encode()
-						data += '\04'.encode()
-						data += struct.pack(np.dtype('uint32').char, rows)
-						data += '\04'.encode()
-						data += struct.pack(np.dtype('uint32').char, cols)
-						data += buf
-						newData.append(data)
+			for begin,stop in index.spans(positions):
+				newData.append(buf[begin:stop])
 			return KaldiArk(b''.join(newData))
 
 		else:
 			raise WrongOperation('Expected <nHead> is larger than "0", or <chunks> is larger than "1", or <uttList> is not None.')
 
+def _kaldi_dicts(others):
+	'''
+	Usage:  others = _kaldi_dicts(others)
+
+	Return a list of KaldiDict objects. <others> can be a KaldiArk or KaldiDict object, or a list or tuple of them. KaldiArk objects are viewed as KaldiDict objects.
+	'''
+	if not isinstance(others,(list,tuple)):
+		others = [others,]
+	dicts = []
+	for other in others:
+		if isinstance(other,KaldiDict):
+			dicts.append(other)
+		elif isinstance(other,KaldiArk):
+			dicts.append(other.array)
+		else:
+			raise UnsupportedDataType('Excepted a KaldiArk or KaldiDict object but got {}.'.format(type(other)))
+	return dicts
+
 class KaldiDict(dict):
 	'''
 	Usage:  obj = KaldiDict(binaryData) or obj = KaldiDict()
@@ -762,9 +1230,8 @@ class KaldiDict(dict):
 		self.check_format()
 
 	def __add_dim_to_1dimData(self):
-		for utt in self.keys():
-			if len(self[utt].shape) == 1:
-				self[utt] = self[utt][None,:]
+		for utt in [ utt for utt,matrix in self.items() if len(matrix.shape) == 1 ]:
+			self[utt] = self[utt][None,:]
 
 	@property
 	def dim(self):
@@ -901,6 +1368,15 @@ class KaldiDict(dict):
 		
 		Return a KaldiArk object. Transform NumPy array data into ark binary data.
 		'''
+		return self.to_ark()
+
+	def to_ark(self,compress=False):
+		'''
+		Usage:  newObj = obj.to_ark() or newObj = obj.to_ark(compress=True)
+		
+		Return a KaldiArk object. Transform NumPy array data into ark binary data.
+		If <compress> is "True", encode every matrix as Kaldi compressed matrix in the same way as Kaldi "copy-feats --compress=true".
+		'''
 
 		#totalSize = 0
 		#for u in self.keys():
@@ -908,31 +1384,22 @@ class KaldiDict(dict):
 		#if totalSize > 10000000000:
 		#    print('Warning: Data is extramely large. Try to transform it but it maybe result in MemoryError.')
 
-		newData = []
-		for utt in self.keys():
+		utts = list(self.keys())
+		for utt in utts:
 			if len(self[utt].shape) == 1:
 				self[utt] = self[utt][None,:]
-			matrix = self[utt]
-			data = (utt+' ').encode()
-			data += '\0B'.encode()
-			if matrix.dtype == 'float32':
-				data += 'FM '.encode()
-			elif matrix.dtype == 'float64':
-				data += 'DM '.encode()
-			elif matrix.dtype == 'int32':
-				data += 'IM '.encode()
-			elif matrix.dtype == 'int64':
-				data += 'UM '.encode()
-			else:
-				raise UnsupportedDataType('Expected "int32", "int64", "float32" or "float64" data, but got {}.'.format(matrix.dtype))
-			data += '\04'.encode()
-			data += struct.pack(np.dtype('uint32').char, matrix.shape[0])
-			data += '\04'.encode()
-			data += struct.pack(np.dtype('uint32').char, matrix.shape[1])
-			data += matrix.tobytes()
-			newData.append(data)
 
-		return KaldiArk(b''.join(newData))
+		if compress:
+			newData = []
+			for utt in utts:
+				newData.append((utt+' \0B').encode() + _compress_matrix(self[utt]))
+			return KaldiArk(b''.join(newData))
+
+		for utt in utts:
+			if not self[utt].dtype in (np.float32,np.float64,np.int32,np.int64):
+				raise UnsupportedDataType('Expected "int32", "int64", "float32" or "float64" data, but got {}.'.format(self[utt].dtype))
+
+		return KaldiArk(_join_ark( (utt,self[utt]) for utt in utts ))
 
 	def save(self,fileName,chunks=1):
 		'''
@@ -991,20 +1458,48 @@ class KaldiDict(dict):
 			other = other.array
 		else:
 			raise UnsupportedDataType('Expected a KaldiArk or KaldiDict object but got {}.'.format(type(other)))
-	
-		if self.dim != None and other.dim != None and self.dim != other.dim:
-			raise WrongDataFormat('Expected unified dimension but {}!={}.'.format(self.dim,other.dim))
+
+		return self.join(other)
+
+	def join(self,others):
+		'''
+		Usage:  newObj = obj1.join(obj2) or newObj = obj1.join([obj2,obj3....])
+
+		Return a new KaldiDict object of all utterances in obj1, obj2 .... obj2,obj3... can be KaldiArk or KaldiDict objects.
+		If an utterance ID appears in more than one object, data only in the formar will be retained, the same as "+". Matrixes are not copied.
+		'''
+		others = _kaldi_dicts(others)
+		for other in others:
+			if self.dim != None and other.dim != None and self.dim != other.dim:
+				raise WrongDataFormat('Expected unified dimension but {}!={}.'.format(self.dim,other.dim))
 
 		self.__add_dim_to_1dimData()
 
-		temp = self.copy()
-		selfUtts = list(self.keys())
-		for utt in other.keys():
-			if len(other[utt].shape) == 1:
-				other[utt] = other[utt][None,:]
-			if not utt in selfUtts:
-				temp[utt] = other[utt]
-		return KaldiDict(temp)
+		# Matrixes have been checked in their own objects, so they are added without checking again.
+		newDict = KaldiDict()
+		newDict.update(self)
+		for other in others:
+			for utt in [ utt for utt in other.keys() if not utt in newDict ]:
+				matrix = other[utt]
+				newDict[utt] = matrix[None,:] if len(matrix.shape) == 1 else matrix
+		return newDict
+
+	def intersect(self,others):
+		'''
+		Usage:  newObj1,newObj2 = obj1.intersect(obj2) or newObjs = obj1.intersect([obj2,obj3....])
+
+		Return a list of new KaldiDict objects of obj1, obj2 ... which only have the utterance IDs appeared in all of them, in the order of obj1. 
+		obj2,obj3... can be KaldiArk or KaldiDict objects. It can be used to align features with labels. Matrixes are not copied.
+		'''
+		others = _kaldi_dicts(others)
+		common = set(self.keys()).intersection(*[other.keys() for other in others])
+		utts = [ utt for utt in self.keys() if utt in common ]
+		newDicts = []
+		for obj in [self,*others]:
+			newDict = KaldiDict()
+			newDict.update( (utt,obj[utt]) for utt in utts )
+			newDicts.append(newDict)
+		return newDicts
 	
 	def concat(self,others,axis=1):
 		'''
@@ -1013,20 +1508,12 @@ class KaldiDict(dict):
 		Return a KaldiDict object. obj2,obj3... can be KaldiArk or KaldiDict objects.
 		Note that only these utterance IDs which appeared in all objects can be retained in concatenated result. 
 		When one member of the data only has a dim or only have one frames and axis is 1, it will be concatenated to all frames.
+		Only one such member is allowed at every utterance, or WrongDataFormat error will be raised.
 		''' 
 		if axis != 1 and axis != 0:
 			raise WrongOperation('Expected <axis> is "1" or "0" but got {}.'.format(axis))
 
-		if not isinstance(others,(list,tuple)):
-			others = [others,]
-
-		for index,other in enumerate(others):
-			if isinstance(other,KaldiDict):                   
-				pass
-			elif isinstance(other,KaldiArk):
-				others[index] = other.array       
-			else:
-				raise UnsupportedDataType('Excepted a KaldiArk or KaldiDict object but got {}.'.format(type(other))) 
+		others = _kaldi_dicts(others)
 
 		newDict = KaldiDict()
 
@@ -1048,7 +1535,7 @@ class KaldiDict(dict):
 			dim = self[utt].shape[1]
 			
 			for index,other in enumerate(others,start=1):
-				if utt in other.keys():
+				if utt in other:
 					if len(other[utt].shape) == 1:
 						other[utt] = other[utt][None,:]
 					if axis == 1:
@@ -1070,20 +1557,22 @@ class KaldiDict(dict):
 			if axis == 0:
 				newDict[utt] = np.concatenate(newMat,axis=0)
 			else:
-				if len(adjustFrameIndexs) > 0:
-					for index in adjustFrameIndexs:
-						new = []
-						for i in range(maxFrames):
-							new.append(newMat[index][0])
-					newMat[index] = np.row_stack(new)
+				if maxFrames > 1 and len(adjustFrameIndexs) > 1:
+					raise WrongDataFormat("Only one member with one frame can be concatenated to all frames but got {} at utterance ID {}.".format(len(adjustFrameIndexs),utt))
+				for index in adjustFrameIndexs:
+					newMat[index] = np.repeat(newMat[index],maxFrames,axis=0)
 				newDict[utt] = np.concatenate(newMat,axis=1)
 		return newDict
 
-	def splice(self,left=4,right=None):
+	def splice(self,left=4,right=None,lazy=False):
 		'''
-		Usage:  newObj = obj.splice(4) or newObj = obj.splice(4,3)
+		Usage:  newObj = obj.splice(4) or newObj = obj.splice(4,3) or for utt,matrix in obj.splice(4,lazy=True)
 		
 		Return a new KaldiDict object. If <right> is None, we define: right = left. If you don't want to splice, set the value zero.
+		Every utterance is spliced independently and its edge frames are repeated, in the same way as Kaldi "splice-feats". 
+		The context frames of each output frame are ordered from t-<left> to t+<right>.
+		The result is a KaldiPackedDict object whose matrixes are views of one preallocated matrix with the same data type as input.
+		If <lazy> is "True", return a generator which splices and yields utterance ID and matrix one by one.
 		''' 
 		assert isinstance(left,int) and left >= 0, 'Expected <left> is non-negative int value.'
 		if right == None:
@@ -1091,108 +1580,77 @@ class KaldiDict(dict):
 		else:
 			assert isinstance(right,int) and right >= 0, 'Expected <right> is non-negative int value.'
 
-		lengths = []
-		matrixes = []
-		for utt in self.keys():
-			if len(self[utt].shape) == 1:
-				self[utt] = self[utt][None,:]
-			lengths.append((utt,len(self[utt])))
-			matrixes.append(self[utt])
-
-		leftSub = []
-		rightSub = []
-		for i in range(left):
-			leftSub.append(matrixes[0][0])
-		for j in range(right):
-			rightSub.append(matrixes[-1][-1])
-		matrixes = np.row_stack([*leftSub,*matrixes,*rightSub])
-		
-		N = matrixes.shape[0]
-		dim = matrixes.shape[1]
-		newMat=np.empty([N,dim*(left+right+1)])
-
-		index = 0
-		for lag in range(right,-left-1,-1):
-			newMat[:,index:index+dim]=np.roll(matrixes,lag,axis=0)
-			index += dim
-		newMat = newMat[left:(0-right),:]
-
-		newFea = KaldiDict()
-		index = 0
-		for utt,length in lengths:
-			newFea[utt] = newMat[index:index+length]
-			index += length
-		return newFea
+		self.__add_dim_to_1dimData()
+
+		if lazy is True:
+			return ((utt,_splice_matrix(matrix,left,right)) for utt,matrix in self.items())
+
+		if len(self.keys()) == 0:
+			return KaldiDict()
+
+		utts = list(self.keys())
+		offsets = np.zeros(len(utts)+1,dtype=np.int64)
+		np.cumsum([len(self[utt]) for utt in utts],out=offsets[1:])
+		dtype = np.result_type(*[self[utt] for utt in utts])
+		newMat = np.empty((offsets[-1],self.dim*(left+right+1)),dtype=dtype)
+
+		for i,utt in enumerate(utts):
+			_splice_matrix(self[utt],left,right,out=newMat[offsets[i]:offsets[i+1]])
+
+		return KaldiPackedDict._from_frames(newMat,offsets,utts)
 	
-	def select(self,dims,retain=False):
+	def add_delta(self,order=2,window=2):
+		'''
+		Usage:  newObj = obj.add_delta() or newObj = obj.add_delta(order=1,window=3)
+
+		Return a new KaldiPackedDict object. Add N orders delta to every utterance in the same way as Kaldi "add-deltas".
+		Int data is computed as float32.
+		'''
+		assert isinstance(order,int) and order >= 0, "Expected <order> is a non-negative int number."
+		assert isinstance(window,int) and window > 0, "Expected <window> is a positive int number."
+
+		self.__add_dim_to_1dimData()
+		if len(self.keys()) == 0:
+			return KaldiPackedDict()
+
+		scales = _delta_scales(order,window)
+		utts = list(self.keys())
+		offsets = np.zeros(len(utts)+1,dtype=np.int64)
+		np.cumsum([len(self[utt]) for utt in utts],out=offsets[1:])
+		dtype = np.float64 if any(self[utt].dtype == np.float64 for utt in utts) else np.float32
+		newMat = np.empty((offsets[-1],self.dim*(order+1)),dtype=dtype)
+
+		for i,utt in enumerate(utts):
+			_delta_matrix(self[utt],scales,out=newMat[offsets[i]:offsets[i+1]])
+
+		return KaldiPackedDict._from_frames(newMat,offsets,utts)
+
+	def _parse_dims(self,dims):
+		'''
+		Return a list of selected dimensions and its sorted unique version. <dims> should be an int value or string like "1,5-20".
+		'''
+		return _parse_dims(dims,self.dim)
+
+	def select(self,dims,retain=False,copy=True):
 		'''
-		Usage:  newObj = obj.select(4) or newObj1,newObj2 = obj.select('5,10-15',True)
+		Usage:  newObj = obj.select(4) or newObj1,newObj2 = obj.select('5,10-15',True) or newObj = obj.select('0-12',copy=False)
 		
 		Select dimensions data. <dims> should be an int value or string like "1,5-20".
 		If <retain> is True, return two new KaldiDict objects concluding both slected data and non-selected data.
+		If <copy> is "False", dimensions with a constant step are selected as views sharing memory with <obj>, so modifying them changes <obj> too. 
+		Other dimensions are always gathered by one copy per utterance.
 		'''
-		_dim = self.dim
-		if _dim == 1:
-			raise WrongOperation('Cannot select any data from 1-dim data.')
-		elif isinstance(dims,int):
-			assert dims >= 0, '<dims> should be a non-negative value.'
-			assert dims < _dim, "Selection index should be smaller than data dimension {} but got {}.".format(_dim,dims)
-			selectFlag = [dims,]
-		elif isinstance(dims,str):
-
-			if dims.strip() == "":
-				raise WrongOperation("<dims> is not a dmensional value avaliable.")
-
-			temp = dims.split(',')
-			selectFlag = []
-			for i in temp:
-				if not '-' in i:
-					try:
-						i = int(i)
-					except ValueError:
-						raise WrongOperation('Expected int value but got {}.'.format(i))
-					else:
-						assert i >= 0, '<dims> should be a non-negative value.'
-						assert i < _dim, "Selection index should be smaller than data dimension {} but got {}.".format(_dim,i)
-						selectFlag.append(i)
-				else:
-					i = i.split('-')
-					if i[0].strip() == '':
-						i[0] = 0
-					if i[1].strip() == '':
-						i[1] = _dim-1
-					try:
-						i[0] = int(i[0])
-						i[1] = int(i[1])
-					except ValueError:
-						raise WrongOperation('Expected selection index is int value.')
-					else:
-						if i[0] > i[1]:
-							i[0], i[1] = i[1], i[0]
-						assert i[1] < _dim, "Selection index should be smaller than data dimension {} but got {}.".format(_dim, i[1])
-						selectFlag.extend([x for x in range(int(i[0]),int(i[1])+1)])
-		else:
-			raise WrongOperation('Expected <dims> is int value or string like 1,4-9,12 but got {}.'.format(type(dims)))
-
-		retainFlag = sorted(list(set(selectFlag)))
-
 		seleDict = KaldiDict()
 		if retain:
 			reseDict = KaldiDict()
-		for utt in self.keys():
-			if len(self[utt].shape) == 1:
-				self[utt] = self[utt][None,:]
-			newMat = []
-			for index in selectFlag:
-				newMat.append(self[utt][:,index][:,None])
-			newMat = np.concatenate(newMat,axis=1)
-			seleDict[utt] = newMat
-			if retain:
-				if len(retainFlag) == _dim:
-					continue
-				else:
-					matrix = self[utt].copy()
-					reseDict[utt] = np.delete(matrix,retainFlag,1)
+		if len(self.keys()) == 0:
+			return (seleDict,reseDict) if retain else seleDict
+		selectIndex,restIndex = _compile_dims(dims,self.dim)
+
+		for utt,matrix in self.items():
+			seleDict[utt] = _take_dims(matrix,selectIndex,copy)
+			if retain and restIndex is not None:
+				reseDict[utt] = _take_dims(matrix,restIndex,copy)
 		if retain:
 			return seleDict,reseDict
 		else:
@@ -1255,9 +1713,8 @@ class KaldiDict(dict):
 				raise UnsupportedDataType('Expected <uttList> is a string,list or tuple but got {}.'.format(type(uttList)))
 
 			newDict = KaldiDict()
-			selfKeys = list(self.keys())
 			for utt in uttList:
-				if utt in selfKeys:
+				if utt in self:
 					newDict[utt] = self[utt]
 				else:
 					#print('Subset Warning: no data for utt {}'.format(utt))
@@ -1317,7 +1774,7 @@ class KaldiDict(dict):
 			uttLens[utt] = len(mat)
 			matrixs.append(mat)
 		if keepDim is False:
-			matrixs = np.row_stack(matrixs)
+			matrixs = np.concatenate(matrixs,axis=0)
 		return matrixs, uttLens
 
 	def remerge(self,data,uttLens):
@@ -1374,114 +1831,1678 @@ class KaldiDict(dict):
 		if returnFlag is True:
 			return newDict
 
-	def normalize(self,std=True,alpha=1.0,beta=0.0,epsilon=1e-6,axis=0):
+	def normalize(self,std=True,alpha=1.0,beta=0.0,epsilon=1e-6,axis=0):
+		'''
+		Usage:  newObj = obj.normalize()
+		
+		Return a KaldiDict object. If <std> is True, do: 
+					alpha * (x-mean)/(std+epsilon) + belta, 
+		or do: 
+					alpha * (x-mean) + belta.
+		'''
+		if len(self.keys()) == 0:
+			return KaldiDict()
+
+		assert isinstance(epsilon,(float,int)) and epsilon > 0, "Expected <epsilon> is positive value."
+		assert isinstance(alpha,(float,int)) and alpha > 0, "Expected <alpha> is positive value."
+		assert isinstance(beta,(float,int)), "Expected <beta> is an int or float value."
+		assert isinstance(axis,int), "Expected <axis> is an int value."
+
+		# Data in memory is merged and normalized at once. Data read chunk by chunk is normalized with NormalizeStats.
+		data,uttLens = self.merge()
+		data = _normalize_frames(data,std,alpha,beta,epsilon,axis,inPlace=True)
+
+		newDict = KaldiDict()
+		start = 0
+		for utt,lens in uttLens.items():
+			newDict[utt] = data[start:(start+lens)]
+			start += lens
+
+		return newDict
+
+	def pack(self):
+		'''
+		Usage:  newObj = obj.pack()
+
+		Return a KaldiPackedDict object which holds all matrixes in one contiguous frame matrix.
+		'''
+		return KaldiPackedDict(self)
+
+	def cut(self,maxFrames):
+		'''
+		Usage:  newObj = obj.cut(100)
+		
+		Cut data by <maxFrames> if its frame length is larger than 1.25*<maxFrames>.
+		'''
+		if len(self.keys()) == 0:
+			raise WrongOperation('No data to cut.')
+
+		assert isinstance(maxFrames,int) and maxFrames > 0, "Expected <maxFrames> is positive int number but got {}.".format(type(maxFrames))
+
+		newData = {}
+
+		cutThreshold = maxFrames + maxFrames//4
+
+		for key in self.keys():
+			if len(self[key].shape) == 1:
+				self[key] = self[key][None,:]
+			matrix = self[key]
+			if len(matrix) <= cutThreshold:
+				newData[key] = matrix
+			else:
+				i = 0 
+				while True:
+					newData[key+"_"+str(i)] = matrix[i*maxFrames:(i+1)*maxFrames]
+					i += 1
+					if len(matrix[i*maxFrames:]) <= cutThreshold:
+						break
+				if len(matrix[i*maxFrames:]) != 0:
+					newData[key+"_"+str(i)] = matrix[i*maxFrames:]
+		
+		return KaldiDict(newData)
+
+	def tuple_value(self,others,sort=False):
+		'''
+		Usage:  data = obj1.tuple_value(obj1)
+		
+		Return a list.
+		Tuple the utterance ID and data of the same utterance ID from different Kaldidict or KaldiArk objects.
+		Every utterance ID of current object should appear in others, or KeyError will be raised. Use .intersect() at first to drop the missing utterances.
+		If <sort> is True, sort the data by frame length of current object.
+		'''         
+
+		objs = [self,*_kaldi_dicts(others)]
+		new = []
+		for utt in self.keys():
+			new.append( (utt,*[ obj[utt][None,:] if len(obj[utt].shape) == 1 else obj[utt] for obj in objs ]) )
+		
+		if sort is True:
+			new = sorted(new, key=lambda x:len(x[1]))
+		
+		return new
+
+class KaldiPackedDict(KaldiDict):
+	'''
+	Usage:  obj = KaldiPackedDict(kaldiDictObj) or obj = kaldiDictObj.pack()
+
+	KaldiPackedDict is a subclass of KaldiDict. All matrixes are packed into one contiguous frame matrix with a offsets array and a utterance ID list, 
+	and the value of every utterance is a view of the frame matrix. So global operations such as .merge(), .normalize(), .select() and .to_dtype() 
+	are implemented as single vectorized calls on the frame matrix and return new packed objects.
+	It can be used as a KaldiDict object. When an utterance is added, replaced or removed, the packing is discarded and it works as a normal KaldiDict object 
+	until .repack() is called.
+	'''
+	def __init__(self,*args):
+		super(KaldiPackedDict,self).__init__(*args)
+		self.repack()
+
+	@classmethod
+	def _from_frames(cls,frames,offsets,utts):
+		newDict = cls.__new__(cls)
+		newDict._frames = frames
+		newDict._offsets = offsets
+		newDict._packedUtts = utts
+		for i,utt in enumerate(utts):
+			dict.__setitem__(newDict,utt,frames[offsets[i]:offsets[i+1]])
+		return newDict
+
+	def repack(self):
+		'''
+		Usage:  obj.repack()
+
+		Copy all matrixes into a new contiguous frame matrix and replace them with its views.
+		'''
+		self._frames = None
+		self._offsets = None
+		self._packedUtts = None
+		if len(self.keys()) == 0:
+			return
+		self.check_format()
+		utts = list(self.keys())
+		matrixes = [dict.__getitem__(self,utt) for utt in utts]
+		offsets = np.zeros(len(utts)+1,dtype=np.int64)
+		np.cumsum([len(m) for m in matrixes],out=offsets[1:])
+		frames = np.concatenate(matrixes,axis=0)
+		for i,utt in enumerate(utts):
+			dict.__setitem__(self,utt,frames[offsets[i]:offsets[i+1]])
+		self._frames = frames
+		self._offsets = offsets
+		self._packedUtts = utts
+
+	@property
+	def is_packed(self):
+		'''
+		Usage:  flag = obj.is_packed
+
+		Return True if the matrixes are still packed in one frame matrix.
+		'''
+		return getattr(self,'_frames',None) is not None
+
+	@property
+	def frames(self):
+		'''
+		Usage:  frames = obj.frames
+
+		Return the packed frame matrix. Note that it shares memory with the matrixes of all utterances.
+		'''
+		if not self.is_packed:
+			self.repack()
+		return self._frames
+
+	@property
+	def offsets(self):
+		'''
+		Usage:  offsets = obj.offsets
+
+		Return an int64 NumPy array. The frames of the i-th utterance are frames[offsets[i]:offsets[i+1]].
+		'''
+		if not self.is_packed:
+			self.repack()
+		return self._offsets
+
+	def _unpack(self):
+		self._frames = None
+		self._offsets = None
+		self._packedUtts = None
+
+	def __setitem__(self,utt,matrix):
+		self._unpack()
+		super(KaldiPackedDict,self).__setitem__(utt,matrix)
+
+	def __delitem__(self,utt):
+		self._unpack()
+		super(KaldiPackedDict,self).__delitem__(utt)
+
+	def pop(self,*args):
+		self._unpack()
+		return super(KaldiPackedDict,self).pop(*args)
+
+	def popitem(self):
+		self._unpack()
+		return super(KaldiPackedDict,self).popitem()
+
+	def clear(self):
+		self._unpack()
+		super(KaldiPackedDict,self).clear()
+
+	def update(self,*args,**kwargs):
+		self._unpack()
+		super(KaldiPackedDict,self).update(*args,**kwargs)
+
+	def setdefault(self,*args):
+		self._unpack()
+		return super(KaldiPackedDict,self).setdefault(*args)
+
+	@property
+	def lens(self):
+		'''
+		Usage: length = obj.lens
+		Return a tuple: (the numbers of all utterances, the utterance IDs and frames of each utterance). 
+		If there is not any data, return (0, None).
+		'''
+		if not self.is_packed:
+			return super(KaldiPackedDict,self).lens
+		return (len(self._packedUtts),dict(zip(self._packedUtts,np.diff(self._offsets).tolist())))
+
+	def to_dtype(self,dtype):
+		'''
+		Usage:  newObj = obj.to_dtype('float')
+
+		Return a new KaldiPackedDict object. 'float' will be treated as 'float32' and 'int' will be 'int32'.
+		'''
+		if not self.is_packed:
+			return super(KaldiPackedDict,self).to_dtype(dtype).pack()
+		assert dtype in ['int','int32','int64','float','float32','float64'],'Expected <dtype> is "int", "int32", "int64", "float", "float32" or "float64" but got {}.'.format(dtype)
+		if dtype == 'int': 
+			dtype = 'int32'
+		elif dtype == 'float': 
+			dtype = 'float32'
+		if self.dtype == dtype:
+			return self
+		return KaldiPackedDict._from_frames(self._frames.astype(dtype),self._offsets,list(self._packedUtts))
+
+	def select(self,dims,retain=False,copy=True):
+		'''
+		Usage:  newObj = obj.select(4) or newObj1,newObj2 = obj.select('5,10-15',True) or newObj = obj.select('0-12',copy=False)
+		
+		Select dimensions data. <dims> should be an int value or string like "1,5-20".
+		If <retain> is True, return two new KaldiPackedDict objects concluding both slected data and non-selected data.
+		If <copy> is "False", dimensions with a constant step are selected as a view of the packed frame matrix, so modifying them changes <obj> too.
+		'''
+		if not self.is_packed:
+			self.repack()
+		if not self.is_packed:
+			return super(KaldiPackedDict,self).select(dims,retain,copy)
+
+		selectIndex,restIndex = _compile_dims(dims,self._frames.shape[1])
+		seleDict = KaldiPackedDict._from_frames(_take_dims(self._frames,selectIndex,copy),self._offsets,list(self._packedUtts))
+		if retain:
+			if restIndex is None:
+				reseDict = KaldiPackedDict()
+			else:
+				reseDict = KaldiPackedDict._from_frames(_take_dims(self._frames,restIndex,copy),self._offsets,list(self._packedUtts))
+			return seleDict,reseDict
+		else:
+			return seleDict
+
+	def merge(self,keepDim=False,sortFrame=False):
+		'''
+		Usage:  data,uttlength = obj.merge() or data,uttlength = obj.merge(keepDim=True)
+		
+		Return two value. The same as KaldiDict.merge() function.
+		If <keepDim> and <sortFrame> are both "False", the packed frame matrix is returned without copying, so it shares memory with this object.
+		'''
+		if keepDim is True or sortFrame is True or not self.is_packed:
+			return super(KaldiPackedDict,self).merge(keepDim,sortFrame)
+		return self._frames, self.lens[1]
+
+	def normalize(self,std=True,alpha=1.0,beta=0.0,epsilon=1e-6,axis=0):
+		'''
+		Usage:  newObj = obj.normalize()
+		
+		Return a KaldiPackedDict object. If <std> is True, do: 
+					alpha * (x-mean)/(std+epsilon) + belta, 
+		or do: 
+					alpha * (x-mean) + belta.
+		'''
+		if not self.is_packed:
+			self.repack()
+		if not self.is_packed:
+			return KaldiPackedDict()
+
+		assert isinstance(epsilon,(float,int)) and epsilon > 0, "Expected <epsilon> is positive value."
+		assert isinstance(alpha,(float,int)) and alpha > 0, "Expected <alpha> is positive value."
+		assert isinstance(beta,(float,int)), "Expected <beta> is an int or float value."
+		assert isinstance(axis,int), "Expected <axis> is an int value."
+
+		data = _normalize_frames(self._frames,std,alpha,beta,epsilon,axis)
+
+		return KaldiPackedDict._from_frames(data,self._offsets,list(self._packedUtts))
+
+class KaldiMmapArk(object):
+	'''
+	Usage:  obj = KaldiMmapArk('feat.ark') or obj = KaldiMmapArk('feats.scp') or obj = load('feats.scp',useMmap=True)
+
+	KaldiMmapArk maps binary ark files into memory instead of reading them. Only the offset of every utterance is kept in memory and
+	the matrix of an utterance is materialized as a read-only NumPy view on demand, so a large feature store can be accessed randomly with very small resident memory.
+	The entries of scp files are resolved directly by their "file:offset" information. Each ark file is mapped only once.
+	Compressed matrixes are decoded to new float32 arrays when they are accessed.
+	'''
+	def __init__(self,fileName=None,useSuffix=None):
+
+		self._maps = {}
+		self._sources = []
+		self._utts = []
+		self._uttPos = {}
+		self._dataTypes = []
+		self._records = []
+
+		if fileName != None:
+			if isinstance(fileName,str):
+				fileName = [fileName,]
+			for f in fileName:
+				self.open(f,useSuffix)
+
+	def _map_file(self,fileName):
+		fileName = os.path.abspath(fileName)
+		if not fileName in self._maps:
+			if not os.path.isfile(fileName):
+				raise PathError('No such file:{}.'.format(fileName))
+			with open(fileName,'rb') as fr:
+				if os.path.getsize(fileName) == 0:
+					buf = b''
+				else:
+					buf = mmap.mmap(fr.fileno(),0,access=mmap.ACCESS_READ)
+			self._maps[fileName] = len(self._sources)
+			self._sources.append(buf)
+		return self._maps[fileName]
+
+	def _append(self,utt,source,binOffset,dataType,dataOffset,rows,cols,endOffset):
+		if not utt in self._uttPos:
+			self._uttPos[utt] = len(self._utts)
+		self._utts.append(utt)
+		self._dataTypes.append(dataType)
+		self._records.append((source,binOffset,dataOffset,rows,cols,endOffset))
+
+	def open(self,fileName,useSuffix=None):
+		'''
+		Usage:  obj.open('feat.ark') or obj.open('feats.lst',useSuffix='scp')
+
+		Map a binary ark file or all ark files refered by a scp file and append their utterances.
+		'''
+		assert isinstance(fileName,str), 'Expected <fileName> is a file name-like string but got {}.'.format(type(fileName))
+		if useSuffix != None:
+			assert isinstance(useSuffix,str), "Expected <useSuffix> is a string."
+			useSuffix = useSuffix.strip().lower()[-3:]
+		suffix = fileName[-3:].lower()
+		if not suffix in ["ark","scp"]:
+			suffix = useSuffix
+		if suffix == "ark":
+			source = self._map_file(fileName)
+			buf = self._sources[source]
+			space = buf.find(b' ')
+			if space != -1 and buf[space+1:space+3] != b'\0B':
+				raise UnsupportedDataType('{} is not a binary ark file.'.format(fileName))
+			for (utt,dataType,headOffset,dataOffset,rows,cols,endOffset) in _scan_ark(buf):
+				self._append(utt,source,buf.find(b' ',headOffset)+1,dataType,dataOffset,rows,cols,endOffset)
+		elif suffix == "scp":
+			for (utt,arkFile,offset) in _read_scp(fileName):
+				source = self._map_file(arkFile)
+				(dataType,dataOffset,rows,cols,endOffset) = _parse_ark_header(self._sources[source],offset,utt)
+				self._append(utt,source,offset,dataType,dataOffset,rows,cols,endOffset)
+		else:
+			raise UnsupportedDataType('Unknown file format. You can assign the <useSuffix> with "scp" or "ark".')
+
+	def close(self):
+		'''
+		Usage:  obj.close()
+
+		Release all mapped files. If some matrixes gotten from this object are still alive, their files will be released when they are deleted.
+		'''
+		for buf in self._sources:
+			if isinstance(buf,mmap.mmap):
+				try:
+					buf.close()
+				except BufferError:
+					pass
+		self.__init__()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,errType,errValue,errTrace):
+		self.close()
+
+	def __len__(self):
+		return len(self._utts)
+
+	def __contains__(self,utt):
+		return utt in self._uttPos
+
+	def __iter__(self):
+		return iter(self._utts)
+
+	def keys(self):
+		return list(self._utts)
+
+	def __getitem__(self,utt):
+		'''
+		Usage:  matrix = obj['utt1']
+
+		Return a read-only NumPy view of the matrix of <utt>. If it is compressed, return the decoded matrix.
+		'''
+		if not utt in self._uttPos:
+			raise KeyError(utt)
+		return self._get_matrix(self._uttPos[utt])
+
+	def _get_matrix(self,i):
+		dataType = self._dataTypes[i]
+		(source,binOffset,dataOffset,rows,cols,endOffset) = self._records[i]
+		if dataType in _ARK_CM_TYPES:
+			return _read_compressed_matrix(self._sources[source],dataType,dataOffset)
+		matrix = np.frombuffer(self._sources[source],dtype=_ARK_DTYPES[dataType],count=rows*cols,offset=dataOffset)
+		return matrix.reshape(rows,cols)
+
+	def items(self):
+		'''
+		Usage:  for utt,matrix in obj.items()
+
+		Iterate the utterance IDs and matrixes. The matrixes are materialized one by one.
+		'''
+		for i,utt in enumerate(self._utts):
+			yield utt,self._get_matrix(i)
+
+	@property
+	def utts(self):
+		'''
+		Usage:  utteranceIDs = obj.utts
+		
+		Return a list: including all utterance IDs.
+		'''
+		return list(self._utts)
+
+	@property
+	def lens(self):
+		'''
+		Usage:  lengths = obj.lens
+		
+		Return a tuple: (the numbers of all utterances, the utterance ID and frames of each utterance).
+		If there is not any data, return (0, None).
+		'''
+		if len(self._utts) == 0:
+			return (0,None)
+		_lens = dict(zip(self._utts,[x[3] for x in self._records]))
+		return (len(_lens),_lens)
+
+	@property
+	def dim(self):
+		'''
+		Usage:  dimension = obj.dim
+		
+		Return an int value: data dimension.
+		'''
+		if len(self._utts) == 0:
+			return None
+		return self._records[0][4]
+
+	@property
+	def dtype(self):
+		'''
+		Usage:  dataType = obj.dtype
+		
+		Return a string: data type. We only use 'float32', 'float64', 'int32', 'int64'.
+		'''
+		if len(self._utts) == 0:
+			return None
+		return _ARK_DTYPES.get(self._dataTypes[0],'float32')
+
+	@property
+	def array(self):
+		'''
+		Usage:  newObj = obj.array
+		
+		Return a KaldiDict object whose matrixes are read-only views of the mapped files.
+		'''
+		newDict = KaldiDict()
+		for utt,matrix in self.items():
+			newDict[utt] = matrix
+		return newDict
+
+	@property
+	def ark(self):
+		'''
+		Usage:  newObj = obj.ark
+		
+		Return a KaldiArk object. All data will be read into memory.
+		'''
+		newData = []
+		for i,utt in enumerate(self._utts):
+			(source,binOffset,dataOffset,rows,cols,endOffset) = self._records[i]
+			newData.append((utt+' ').encode())
+			newData.append(self._sources[source][binOffset:endOffset])
+		return KaldiArk(b''.join(newData))
+
+	def subset(self,uttList):
+		'''
+		Usage:  newObj = obj.subset(uttList)
+
+		Return a KaldiDict object whose matrixes are views of the utterances in <uttList>.
+		'''
+		if isinstance(uttList,str):
+			uttList = [uttList,]
+		elif not isinstance(uttList,(list,tuple)):
+			raise UnsupportedDataType('Expected <uttList> is string, list or tuple but got {}.'.format(type(uttList)))
+		newDict = KaldiDict()
+		for utt in uttList:
+			if utt in self._uttPos:
+				newDict[utt] = self._get_matrix(self._uttPos[utt])
+		return newDict
+
+class KaldiScpIndex(object):
+	'''
+	Usage:  index = KaldiScpIndex('feats.scp') or index = KaldiScpIndex('feats.scp',indexFile='feats.idx.npz')
+
+	KaldiScpIndex is a random-access index of a scp file. Utterance IDs, ark file IDs and offsets are hold in arrays and a hash table maps
+	every utterance ID to its position, so an utterance can be found in constant time without reading any other entry.
+	Ark files are opened once and kept in a pool, so reading a matrix costs one seek and one read only.
+	If <indexFile> is given, the index is loaded from it when it is newer than the scp file and all ark files in it, otherwise it is built and saved to it.
+	'''
+	def __init__(self,scpFile,indexFile=None):
+
+		assert isinstance(scpFile,str), 'Expected <scpFile> is a file name-like string but got {}.'.format(type(scpFile))
+		if not os.path.isfile(scpFile):
+			raise PathError('No such file:{}.'.format(scpFile))
+
+		self.scpFile = scpFile
+		self._files = {}
+
+		if indexFile != None:
+			assert isinstance(indexFile,str), 'Expected <indexFile> is a file name-like string but got {}.'.format(type(indexFile))
+			if not indexFile.strip().endswith('.npz'):
+				indexFile += '.npz'
+
+		if indexFile == None or not self._load_index(indexFile):
+			arkFiles = {}
+			utts = []
+			fileIds = []
+			offsets = []
+			for (utt,arkFile,offset) in _read_scp(scpFile):
+				if not arkFile in arkFiles:
+					arkFiles[arkFile] = len(arkFiles)
+				utts.append(utt)
+				fileIds.append(arkFiles[arkFile])
+				offsets.append(offset)
+			self._utts = utts
+			self._arkFiles = list(arkFiles.keys())
+			self._fileIds = np.array(fileIds,dtype=np.int32)
+			self._offsets = np.array(offsets,dtype=np.int64)
+			if indexFile != None:
+				self.save(indexFile)
+
+		self._uttPos = {}
+		for i,utt in enumerate(self._utts):
+			if not utt in self._uttPos:
+				self._uttPos[utt] = i
+
+	def _load_index(self,indexFile):
+		'''
+		Load the index from <indexFile> if it is newer than the scp file and all ark files it refers to. Return True if it is loaded.
+		'''
+		if not os.path.isfile(indexFile):
+			return False
+		indexTime = os.path.getmtime(indexFile)
+		if indexTime < os.path.getmtime(self.scpFile):
+			return False
+		with np.load(indexFile) as npz:
+			utts = npz['utts'].tobytes().decode('utf-8').split('\n')
+			arkFiles = npz['arkFiles'].tobytes().decode('utf-8').split('\n')
+			fileIds = npz['fileIds']
+			offsets = npz['offsets']
+		if len(offsets) == 0:
+			utts = []
+			arkFiles = []
+		for arkFile in arkFiles:
+			if not os.path.isfile(arkFile) or os.path.getmtime(arkFile) > indexTime:
+				return False
+		self._utts = utts
+		self._arkFiles = arkFiles
+		self._fileIds = fileIds
+		self._offsets = offsets
+		return True
+
+	def save(self,indexFile):
+		'''
+		Usage:  index.save('feats.idx.npz')
+
+		Save the index as a NumPy .npz file. Return the file name.
+		'''
+		assert isinstance(indexFile,str), 'Expected <indexFile> is a file name-like string but got {}.'.format(type(indexFile))
+		if not indexFile.strip().endswith('.npz'):
+			indexFile += '.npz'
+		np.savez(indexFile,
+				utts=np.frombuffer('\n'.join(self._utts).encode('utf-8'),dtype=np.uint8),
+				arkFiles=np.frombuffer('\n'.join(self._arkFiles).encode('utf-8'),dtype=np.uint8),
+				fileIds=self._fileIds,
+				offsets=self._offsets
+			)
+		return indexFile
+
+	def close(self):
+		'''
+		Usage:  index.close()
+
+		Close all opened ark files. They will be opened again when a matrix is read.
+		'''
+		for fr in self._files.values():
+			fr.close()
+		self._files = {}
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,errType,errValue,errTrace):
+		self.close()
+
+	def __len__(self):
+		return len(self._utts)
+
+	def __contains__(self,utt):
+		return utt in self._uttPos
+
+	def __iter__(self):
+		return iter(self._utts)
+
+	def keys(self):
+		return list(self._utts)
+
+	@property
+	def utts(self):
+		'''
+		Usage:  utteranceIDs = index.utts
+		
+		Return a list: including all utterance IDs in the order of scp file.
+		'''
+		return list(self._utts)
+
+	def location(self,utt):
+		'''
+		Usage:  (arkFile,offset) = index.location('utt1')
+
+		Return the ark file name and the offset of <utt>.
+		'''
+		if not utt in self._uttPos:
+			raise KeyError(utt)
+		i = self._uttPos[utt]
+		return (self._arkFiles[self._fileIds[i]],int(self._offsets[i]))
+
+	def _read_matrix(self,i):
+		fileId = int(self._fileIds[i])
+		if not fileId in self._files:
+			arkFile = self._arkFiles[fileId]
+			if not os.path.isfile(arkFile):
+				raise PathError('No such file:{}.'.format(arkFile))
+			self._files[fileId] = open(arkFile,'rb')
+		utt = self._utts[i]
+		(record,dataType,dataOffset,rows,cols) = _read_scp_record(self._files[fileId],int(self._offsets[i]),utt)
+		if dataType in _ARK_CM_TYPES:
+			return _read_compressed_matrix(record,dataType,dataOffset)
+		else:
+			return np.frombuffer(record,dtype=_ARK_DTYPES[dataType],count=rows*cols,offset=dataOffset).reshape(rows,cols)
+
+	def __getitem__(self,key):
+		'''
+		Usage:  matrix = index['utt1'] or newObj = index[0:10]
+
+		Return the NumPy matrix of an utterance ID. If <key> is a slice, return a KaldiDict object of the utterances in the range of scp order.
+		'''
+		if isinstance(key,slice):
+			newDict = KaldiDict()
+			for i in range(*key.indices(len(self._utts))):
+				newDict[self._utts[i]] = self._read_matrix(i)
+			return newDict
+		elif isinstance(key,str):
+			if not key in self._uttPos:
+				raise KeyError(key)
+			return self._read_matrix(self._uttPos[key])
+		else:
+			raise UnsupportedDataType('Expected an utterance ID or a slice but got {}.'.format(type(key)))
+
+	def get_many(self,uttList):
+		'''
+		Usage:  newObj = index.get_many(['utt1','utt2'])
+
+		Return a KaldiDict object of the utterances in <uttList>. The matrixes are read in the order of file offset.
+		'''
+		if isinstance(uttList,str):
+			uttList = [uttList,]
+		elif not isinstance(uttList,(list,tuple)):
+			raise UnsupportedDataType('Expected <uttList> is string, list or tuple but got {}.'.format(type(uttList)))
+
+		positions = []
+		for utt in uttList:
+			if not utt in self._uttPos:
+				raise KeyError(utt)
+			positions.append(self._uttPos[utt])
+		positions = np.array(positions,dtype=np.int64)
+		order = np.lexsort((self._offsets[positions],self._fileIds[positions]))
+
+		matrixes = {}
+		for i in positions[order]:
+			matrixes[self._utts[i]] = self._read_matrix(i)
+
+		newDict = KaldiDict()
+		for utt in uttList:
+			newDict[utt] = matrixes[utt]
+		return newDict
+
+def _read_utt_map(data,inverse=False):
+	'''
+	Usage:  utt2spk = _read_utt_map('utt2spk') or utt2spk = _read_utt_map('spk2utt',inverse=True)
+
+	Return a dict object which maps utterance ID to speaker ID. <data> can be a file name or a dict object.
+	If <inverse> is "True", <data> is expected to be spk2utt and each line is like "spk utt1 utt2 ...".
+	'''
+	if isinstance(data,dict):
+		items = data.items()
+	elif isinstance(data,str):
+		if not os.path.isfile(data):
+			raise PathError('No such file:{}.'.format(data))
+		items = []
+		with open(data,'r',encoding='utf-8') as fr:
+			for line in fr:
+				line = line.split()
+				if len(line) == 0:
+					continue
+				elif len(line) < 2:
+					raise WrongDataFormat('Miss the mapping of {} in {}.'.format(line[0],data))
+				if inverse:
+					items.append((line[0],line[1:]))
+				else:
+					items.append((line[0],line[1]))
+	else:
+		raise UnsupportedDataType('Expected a file name or dict object but got {}.'.format(type(data)))
+
+	if not inverse:
+		return dict(items)
+	utt2spk = {}
+	for spk,utts in items:
+		if isinstance(utts,str):
+			utts = utts.split()
+		for utt in utts:
+			utt2spk[utt] = spk
+	return utt2spk
+
+class CMVNStats(object):
+	'''
+	Usage:  obj = CMVNStats() or obj = CMVNStats('cmvn.ark')
+
+	CMVNStats holds the cepstral mean and variance normalization statistics in Kaldi format. The statistics of every utterance or speaker 
+	is a 2 x (dim+1) float64 matrix whose first row is the sums of frames and the frame count, and second row is the sums of squares of frames.
+	Statistics are accumulated in one pass and can be accumulated incrementally chunk by chunk, so it can be used with streaming data loaders.
+	'''
+	def __init__(self,statsFile=None):
+
+		self.stats = {}
+		if statsFile != None:
+			self.read(statsFile)
+
+	def read(self,statsFile):
+		'''
+		Usage:  obj.read('cmvn.ark') or obj.read('cmvn.scp')
+
+		Read statistics from a Kaldi ark or scp file. They are added to current statistics.
+		'''
+		for key,matrix in load(statsFile).items():
+			self._add(key,np.array(matrix,dtype=np.float64))
+
+	def _add(self,key,stats):
+		if stats.shape[0] != 2:
+			raise WrongDataFormat('Expected CMVN statistics has 2 rows but got {} at {}.'.format(stats.shape[0],key))
+		if key in self.stats:
+			if self.stats[key].shape != stats.shape:
+				raise WrongDataFormat('Expected dimension {} but got {} at {}.'.format(self.stats[key].shape[1]-1,stats.shape[1]-1,key))
+			self.stats[key] += stats
+		else:
+			self.stats[key] = stats
+
+	def accumulate(self,feat,utt2spk=None,spk2utt=None):
+		'''
+		Usage:  obj.accumulate(feat) or obj.accumulate(feat,utt2spk='utt2spk') or obj.accumulate(feat,spk2utt='spk2utt')
+
+		Accumulate statistics of <feat>. <feat> can be a KaldiArk, KaldiDict, KaldiMmapArk or Pipeline object.
+		If <utt2spk> or <spk2utt> is given, statistics is accumulated for every speaker, or for every utterance. They can be file names or dict objects.
+		'''
+		if isinstance(feat,(KaldiArk,KaldiDict,KaldiMmapArk,Pipeline)):
+			items = feat.items()
+		else:
+			raise UnsupportedDataType("Expected <feat> is a KaldiArk or KaldiDict object but got {}.".format(type(feat)))
+
+		if utt2spk != None:
+			uttMap = _read_utt_map(utt2spk)
+		elif spk2utt != None:
+			uttMap = _read_utt_map(spk2utt,inverse=True)
+		else:
+			uttMap = None
+
+		for utt,matrix in items:
+			if len(matrix.shape) == 1:
+				matrix = matrix[None,:]
+			if uttMap is None:
+				key = utt
+			elif utt in uttMap:
+				key = uttMap[utt]
+			else:
+				print('Warning: No speaker ID of utterance {}. Skip it.'.format(utt))
+				continue
+			matrix = np.asarray(matrix,dtype=np.float64)
+			stats = np.zeros((2,matrix.shape[1]+1),dtype=np.float64)
+			np.sum(matrix,axis=0,out=stats[0,:-1])
+			np.einsum('ij,ij->j',matrix,matrix,out=stats[1,:-1])
+			stats[0,-1] = len(matrix)
+			self._add(key,stats)
+
+	@property
+	def keys(self):
+		'''
+		Usage:  keys = obj.keys
+
+		Return a list: utterance IDs or speaker IDs of all statistics.
+		'''
+		return list(self.stats.keys())
+
+	@property
+	def global_stats(self):
+		'''
+		Usage:  stats = obj.global_stats
+
+		Return a 2 x (dim+1) NumPy array: the sum of all statistics.
+		'''
+		if len(self.stats) == 0:
+			return None
+		return np.sum(list(self.stats.values()),axis=0)
+
+	def save(self,fileName):
+		'''
+		Usage:  obj.save('cmvn.ark') or obj.save('cmvn.scp')
+
+		Save statistics as Kaldi ark file. If <fileName> ends with ".scp", save both ark and scp files and return scp file name.
+		'''
+		if len(self.stats) == 0:
+			raise WrongOperation('No statistics to save.')
+		ark = KaldiDict(self.stats).ark
+		if fileName.endswith('.scp'):
+			ark.save(fileName[0:-4]+'.ark',outScpFile=True)
+			return fileName
+		else:
+			if not fileName.endswith('.ark'):
+				fileName += '.ark'
+			return ark.save(fileName)
+
+	@staticmethod
+	def _transform(stats,std):
+		count = stats[0,-1]
+		if count < 1.0:
+			raise WrongOperation('Insufficient statistics for CMVN: count = {}.'.format(count))
+		mean = stats[0,:-1] / count
+		if not std:
+			return None,-mean
+		var = stats[1,:-1] / count - mean * mean
+		var = np.maximum(var,1.0e-20)
+		scale = 1.0 / np.sqrt(var)
+		return scale,-(mean*scale)
+
+	def apply(self,feat,utt2spk=None,std=False,isGlobal=False):
+		'''
+		Usage:  newObj = obj.apply(feat) or newObj = obj.apply(feat,utt2spk='utt2spk',std=True) or newObj = obj.apply(feat,isGlobal=True)
+
+		Apply CMVN to <feat> in the same way as Kaldi "apply-cmvn". Return a KaldiDict object.
+		Statistics is looked up by utterance ID, or by speaker ID if <utt2spk> is given. If <isGlobal> is "True", the sum of all statistics is used.
+		If <std> is "False", only normalize mean, or normalize both mean and variance. Utterances without statistics are skipped.
+		'''
+		if isinstance(feat,(KaldiArk,KaldiDict,KaldiMmapArk)):
+			items = feat.items()
+		else:
+			raise UnsupportedDataType("Expected <feat> is a KaldiArk or KaldiDict object but got {}.".format(type(feat)))
+
+		if isGlobal:
+			if len(self.stats) == 0:
+				raise WrongOperation('No statistics to apply.')
+			globalTransform = self._transform(self.global_stats,std)
+		elif utt2spk != None:
+			uttMap = _read_utt_map(utt2spk)
+
+		transforms = {}
+		newDict = KaldiDict()
+		for utt,matrix in items:
+			if len(matrix.shape) == 1:
+				matrix = matrix[None,:]
+			if isGlobal:
+				scale,offset = globalTransform
+			else:
+				key = utt if utt2spk == None else uttMap.get(utt,None)
+				if not key in self.stats:
+					print('Warning: No CMVN statistics of utterance {}. Skip it.'.format(utt))
+					continue
+				if not key in transforms:
+					transforms[key] = self._transform(self.stats[key],std)
+				scale,offset = transforms[key]
+			if matrix.shape[1] != len(offset):
+				raise WrongDataFormat('Expected dimension {} but got {} at utterance {}.'.format(len(offset),matrix.shape[1],utt))
+			dtype = matrix.dtype if matrix.dtype == np.float64 else np.float32
+			if scale is None:
+				newDict[utt] = matrix + offset.astype(dtype)
+			else:
+				newDict[utt] = matrix * scale.astype(dtype) + offset.astype(dtype)
+		return newDict
+
+class NormalizeStats(object):
+	'''
+	Usage:  obj = NormalizeStats() or obj = NormalizeStats('norm.npz')
+
+	NormalizeStats holds the frame count, mean and sum of squared deviations of every dimension over all data, which are needed by global normalization.
+	They are accumulated in one pass utterance by utterance (or chunk by chunk) with Chan's parallel algorithm, so data larger than memory can be normalized with 
+	KaldiMmapArk, KaldiScpIndex or Pipeline objects, and statistics of several parts can be merged.
+	'''
+	def __init__(self,statsFile=None):
+
+		self.count = 0
+		self.mean = None
+		self.m2 = None
+		if statsFile != None:
+			self.read(statsFile)
+
+	def _add(self,count,mean,m2):
+		if count == 0:
+			return
+		if self.mean is None:
+			self.count,self.mean,self.m2 = count,mean.copy(),m2.copy()
+			return
+		if len(mean) != len(self.mean):
+			raise WrongDataFormat('Expected dimension {} but got {}.'.format(len(self.mean),len(mean)))
+		total = self.count + count
+		delta = mean - self.mean
+		self.mean += delta * (count / total)
+		self.m2 += m2 + delta * delta * (self.count * count / total)
+		self.count = total
+
+	def accumulate(self,feat):
+		'''
+		Usage:  obj.accumulate(feat)
+
+		Accumulate statistics of <feat>. <feat> can be a KaldiArk, KaldiDict, KaldiMmapArk, KaldiScpIndex or Pipeline object, or a NumPy matrix.
+		'''
+		if isinstance(feat,np.ndarray):
+			matrixes = [feat]
+		elif isinstance(feat,(KaldiArk,KaldiDict,KaldiMmapArk,Pipeline)):
+			matrixes = ( matrix for _,matrix in feat.items() )
+		elif isinstance(feat,KaldiScpIndex):
+			matrixes = ( feat[utt] for utt in feat )
+		else:
+			raise UnsupportedDataType("Expected <feat> is a KaldiArk or KaldiDict object but got {}.".format(type(feat)))
+
+		for matrix in matrixes:
+			if len(matrix.shape) == 1:
+				matrix = matrix[None,:]
+			if len(matrix) == 0:
+				continue
+			matrix = np.asarray(matrix,dtype=np.float64)
+			mean = matrix.mean(axis=0)
+			deviation = matrix - mean
+			self._add(len(matrix),mean,np.einsum('ij,ij->j',deviation,deviation))
+
+	def merge(self,other):
+		'''
+		Usage:  obj.merge(otherObj)
+
+		Add statistics of another NormalizeStats object.
+		'''
+		assert isinstance(other,NormalizeStats), "Expected NormalizeStats object but got {}.".format(type(other))
+		if other.mean is not None:
+			self._add(other.count,other.mean,other.m2)
+		return self
+
+	@property
+	def var(self):
+		'''
+		Usage:  var = obj.var
+
+		Return the (population) variance of every dimension.
+		'''
+		if self.mean is None:
+			return None
+		return self.m2 / self.count
+
+	@property
+	def std(self):
+		'''
+		Usage:  std = obj.std
+
+		Return the (population) standard deviation of every dimension.
+		'''
+		if self.mean is None:
+			return None
+		return np.sqrt(self.var)
+
+	def save(self,fileName):
+		'''
+		Usage:  obj.save('norm.npz')
+
+		Save statistics as a .npz file.
+		'''
+		if self.mean is None:
+			raise WrongOperation('No statistics to save.')
+		if not fileName.endswith('.npz'):
+			fileName += '.npz'
+		np.savez(fileName,count=self.count,mean=self.mean,m2=self.m2)
+		return fileName
+
+	def read(self,statsFile):
+		'''
+		Usage:  obj.read('norm.npz')
+
+		Read statistics from a .npz file. They are added to current statistics.
+		'''
+		with np.load(statsFile) as data:
+			self._add(int(data['count']),data['mean'],data['m2'])
+
+	def transform(self,matrix,std=True,alpha=1.0,beta=0.0,epsilon=1e-6,out=None):
+		'''
+		Usage:  newMatrix = obj.transform(matrix)
+
+		Return alpha * (x-mean)/(std+epsilon) + beta if <std> is True, or alpha * (x-mean) + beta. If <out> is given, write the result into it.
+		'''
+		if self.mean is None:
+			raise WrongOperation('No statistics to apply.')
+		if matrix.shape[-1] != len(self.mean):
+			raise WrongDataFormat('Expected dimension {} but got {}.'.format(len(self.mean),matrix.shape[-1]))
+		dtype = matrix.dtype if matrix.dtype in (np.float32,np.float64) else np.float64
+		scale = alpha / (self.std + epsilon) if std is True else np.full(len(self.mean),float(alpha))
+		offset = beta - self.mean * scale
+		if out is None:
+			out = np.empty(matrix.shape,dtype=dtype)
+		np.multiply(matrix,scale.astype(dtype),out=out)
+		out += offset.astype(dtype)
+		return out
+
+	def apply(self,feat,std=True,alpha=1.0,beta=0.0,epsilon=1e-6,inPlace=False):
+		'''
+		Usage:  newObj = obj.apply(feat) or obj.apply(feat,inPlace=True)
+
+		Normalize every matrix of <feat> with the statistics. Return a new KaldiDict object. 
+		If <inPlace> is "True", <feat> should be a KaldiDict object and its float matrixes are overwritten, so no new memory is needed.
+		'''
+		if inPlace:
+			if not isinstance(feat,KaldiDict):
+				raise UnsupportedDataType("Expected <feat> is a KaldiDict object to normalize in place but got {}.".format(type(feat)))
+			for utt in list(feat.keys()):
+				matrix = feat[utt]
+				if matrix.dtype in (np.float32,np.float64) and matrix.flags.writeable:
+					self.transform(matrix,std,alpha,beta,epsilon,out=matrix)
+				else:
+					feat[utt] = self.transform(matrix,std,alpha,beta,epsilon)
+			return feat
+
+		if isinstance(feat,(KaldiArk,KaldiDict,KaldiMmapArk,Pipeline)):
+			items = feat.items()
+		else:
+			raise UnsupportedDataType("Expected <feat> is a KaldiArk or KaldiDict object but got {}.".format(type(feat)))
+		newDict = KaldiDict()
+		for utt,matrix in items:
+			newDict[utt] = self.transform(matrix,std,alpha,beta,epsilon)
+		return newDict
+
+class OnlineSlidingCMVN(object):
+	'''
+	Usage:  obj = OnlineSlidingCMVN(cmnWindow=600,minWindow=100)
+
+	Online sliding window CMVN which gives the same result as Kaldi "apply-cmvn-sliding" on a stream of frames. 
+	Feed frames chunk by chunk (or frame by frame) with .accept(), and the normalized frames whose windows are complete are returned at once. 
+	The first frames are delayed until <minWindow> frames (or half window in <center> mode) are received. Call .finish() at the end of utterance 
+	to get the rest frames, then the object is reset for next utterance.
+	Only cumulative sums of recent frames are kept, so every frame costs O(dim).
+	'''
+	def __init__(self,cmnWindow=600,minWindow=100,center=False,std=False):
+
+		assert isinstance(cmnWindow,int) and cmnWindow > 0, "Expected <cmnWindow> is a positive int number."
+		assert isinstance(minWindow,int) and minWindow >= 0, "Expected <minWindow> is a non-negative int number."
+
+		self.cmnWindow = cmnWindow
+		self.minWindow = minWindow
+		self.center = center
+		self.std = std
+		# Cumulative sums at positions older than this margin before the first unemitted frame are never used again
+		self._margin = max(cmnWindow + 1,minWindow) + 1
+		self.reset()
+
+	def reset(self):
+		'''
+		Usage:  obj.reset()
+
+		Clear all received frames.
+		'''
+		self._count = 0
+		self._emitted = 0
+		self._frames = None
+		self._sums = None
+		self._base = 0
+
+	def _append(self,matrix):
+		dim = matrix.shape[1]
+		if self._frames is None:
+			self._frames = np.zeros((1024,dim),dtype=np.float64)
+			self._sums = np.zeros((1025,2,dim),dtype=np.float64)
+			self._base = 0
+		elif matrix.shape[1] != self._frames.shape[1]:
+			raise WrongDataFormat('Expected dimension {} but got {}.'.format(self._frames.shape[1],matrix.shape[1]))
+
+		# When the buffers are full, drop old frames and sums, and keep at least half of the buffers free.
+		if self._count - self._base + len(matrix) > len(self._frames):
+			newBase = max(0,self._emitted - self._margin)
+			used = self._count - newBase
+			size = len(self._frames)
+			while (used + len(matrix)) * 2 > size:
+				size *= 2
+			frames = np.zeros((size,dim),dtype=np.float64)
+			sums = np.zeros((size+1,2,dim),dtype=np.float64)
+			frames[0:used] = self._frames[newBase-self._base:self._count-self._base]
+			sums[0:used+1] = self._sums[newBase-self._base:self._count-self._base+1]
+			self._frames = frames
+			self._sums = sums
+			self._base = newBase
+
+		i = self._count - self._base
+		self._frames[i:i+len(matrix)] = matrix
+		np.cumsum(matrix,axis=0,out=self._sums[i+1:i+1+len(matrix),0])
+		self._sums[i+1:i+1+len(matrix),0] += self._sums[i,0]
+		if self.std:
+			np.cumsum(matrix*matrix,axis=0,out=self._sums[i+1:i+1+len(matrix),1])
+			self._sums[i+1:i+1+len(matrix),1] += self._sums[i,1]
+		self._count += len(matrix)
+
+	def _emit(self,numFrames=None):
+		frames = np.arange(self._emitted,self._count)
+		start,end = _sliding_window_bounds(frames,self.cmnWindow,self.minWindow,self.center,numFrames)
+		if numFrames == None:
+			N = int(np.searchsorted(end,self._count,side='right'))
+			frames,start,end = frames[0:N],start[0:N],end[0:N]
+		if len(frames) == 0:
+			return None
+		base = self._base
+		result = _sliding_cmvn(self._frames[frames-base],start,end,
+								lambda i:self._sums[i-base,0],
+								lambda i:self._sums[i-base,1],
+								self.std)
+		self._emitted += len(frames)
+		return result
+
+	def accept(self,matrix):
+		'''
+		Usage:  newMatrix = obj.accept(chunk)
+
+		Receive a chunk of frames. Return a float32 NumPy array of normalized frames which are available now. It may have no frames.
+		'''
+		matrix = np.asarray(matrix,dtype=np.float64)
+		if len(matrix.shape) == 1:
+			matrix = matrix[None,:]
+		if len(matrix) > 0:
+			self._append(matrix)
+		result = self._emit() if self._frames is not None else None
+		if result is None:
+			return np.zeros((0,matrix.shape[1]),dtype=np.float32)
+		return result.astype(np.float32)
+
+	def finish(self):
+		'''
+		Usage:  newMatrix = obj.finish()
+
+		Finish current utterance. Return a float32 NumPy array of all remaining normalized frames and reset this object.
+		'''
+		if self._frames is None:
+			self.reset()
+			return None
+		dim = self._frames.shape[1]
+		result = self._emit(self._count)
+		self.reset()
+		if result is None:
+			return np.zeros((0,dim),dtype=np.float32)
+		return result.astype(np.float32)
+
+class FeatureCache(object):
+	'''
+	Usage:  cache = FeatureCache('feat_cache',maxSize=10*1024**3)  then  compute_mfcc("wav.scp",cache=cache)
+
+	A disk cache of computed features. Give it to compute_mfcc, compute_fbank, compute_plp or compute_spectrogram, and only utterances that are not cached yet are computed.
+	Every utterance is saved as one .npy file under <cacheDir>, keyed by the feature type, the full resolved configure and the wave file. The wave file is identified by its 
+	path, modification time and size, or by the hash of its content if <hashContent> is "True".
+	If <maxSize> (bytes) is given, least recently used files are removed when the cache grows larger than it.
+	The directory is scanned only once when the object is made, then the size and the use order of files are kept in memory. So use one object in one process:
+	compute_* with <numWorkers> reads and writes it only in the calling process. Files saved by other processes are indexed when they are gotten, 
+	but their sizes are not counted for <maxSize> before that.
+	'''
+	def __init__(self,cacheDir,maxSize=None,hashContent=False):
+
+		assert isinstance(cacheDir,str), "Expected <cacheDir> is a path-like string."
+		assert maxSize is None or (isinstance(maxSize,int) and maxSize > 0), "Expected <maxSize> is None or a positive int value."
+
+		self.cacheDir = os.path.abspath(cacheDir)
+		self.maxSize = maxSize
+		self.hashContent = hashContent
+		self.hits = 0
+		self.misses = 0
+		os.makedirs(self.cacheDir,exist_ok=True)
+		# Key -> file size, from the least recently used one to the most recently used one.
+		self._index = collections.OrderedDict()
+		entries = [ entry for entry in os.scandir(self.cacheDir) if entry.name.endswith('.npy') ]
+		for info,key in sorted([ (entry.stat(),entry.name[0:-4]) for entry in entries ],key=lambda x:x[0].st_mtime_ns):
+			self._index[key] = info.st_size
+		self._size = sum(self._index.values())
+
+	@property
+	def size(self):
+		'''
+		Usage:  size = obj.size
+
+		Return the total size of cached files in bytes.
+		'''
+		return self._size
+
+	def __len__(self):
+		return len(self._index)
+
+	def _add(self,key,size):
+		self._size += size - self._index.pop(key,0)
+		self._index[key] = size
+
+	def key(self,name,wavFile,config):
+		'''
+		Usage:  key = obj.key('compute_mfcc','test.wav',config)
+
+		Return the cache key of features computed by function <name> from <wavFile> (a file name or a waveform array) with resolved configure <config>.
+		'''
+		h = hashlib.sha1()
+		h.update(name.encode())
+		h.update(repr(sorted(config.items())).encode())
+		if isinstance(wavFile,np.ndarray):
+			h.update(np.ascontiguousarray(wavFile).tobytes())
+		elif not os.path.isfile(wavFile):
+			h.update(wavFile.encode())
+		elif self.hashContent:
+			with open(wavFile,'rb') as fr:
+				for block in iter(lambda:fr.read(1<<20),b''):
+					h.update(block)
+		else:
+			info = os.stat(wavFile)
+			h.update('{} {} {}'.format(os.path.abspath(wavFile),info.st_mtime_ns,info.st_size).encode())
+		return h.hexdigest()
+
+	def get(self,key):
+		'''
+		Usage:  matrix = obj.get(key)
+
+		Return the cached matrix as a read-only memory map, or None if <key> is not cached.
+		'''
+		fileName = os.path.join(self.cacheDir,key+'.npy')
+		try:
+			matrix = np.load(fileName,mmap_mode='r')
+			os.utime(fileName)
+		except (FileNotFoundError,ValueError):
+			if key in self._index:
+				self._size -= self._index.pop(key)
+			self.misses += 1
+			return None
+		if key in self._index:
+			self._index.move_to_end(key)
+		else:
+			# Saved by another process.
+			self._add(key,os.path.getsize(fileName))
+		self.hits += 1
+		return matrix
+
+	def put(self,key,matrix):
+		'''
+		Usage:  obj.put(key,matrix)
+
+		Save <matrix> with <key>. Then remove least recently used files if the cache is larger than <maxSize>.
+		'''
+		fileName = os.path.join(self.cacheDir,key+'.npy')
+		# Write to a temporary file and rename it so that other processes never read a partial file.
+		tempFile = '{}.{}.tmp'.format(fileName,os.getpid())
+		with open(tempFile,'wb') as fw:
+			np.save(fw,np.ascontiguousarray(matrix))
+		size = os.path.getsize(tempFile)
+		os.replace(tempFile,fileName)
+		self._add(key,size)
+		if self.maxSize is not None and self._size > self.maxSize:
+			self._evict()
+
+	def _evict(self):
+		while self._size > self.maxSize and len(self._index) > 0:
+			key,size = self._index.popitem(last=False)
+			try:
+				os.remove(os.path.join(self.cacheDir,key+'.npy'))
+			except FileNotFoundError:
+				pass
+			self._size -= size
+
+	def clear(self):
+		'''
+		Usage:  obj.clear()
+
+		Remove all cached files.
+		'''
+		for key in self._index:
+			try:
+				os.remove(os.path.join(self.cacheDir,key+'.npy'))
+			except FileNotFoundError:
+				pass
+		self._index.clear()
+		self._size = 0
+
+class OnlineFeatureExtractor(object):
+	'''
+	Usage:  extractor = OnlineFeatureExtractor('mfcc',config={'--dither':0})
+
+	Online feature extractor which gives the same frames as compute_mfcc (or compute_fbank, compute_plp, compute_spectrogram) on a stream of audio. 
+	<featType> is "mfcc", "fbank", "plp" or "spectrogram", and <config> has the same format as theirs. Feed audio chunk by chunk with .accept(): a NumPy 
+	waveform, or PCM bytes with <sampleWidth> bytes per sample and <channels> channels. Only frames completed by the new audio are computed and returned.
+	Only samples still needed by later frames are kept, so every chunk costs O(chunk size). Call .finish() at the end of utterance to get the rest frames, 
+	then the object is reset for next utterance. It can be used in the function given to Client.recognize(asArray=True) or Server.recognize(asArray=True).
+	'''
+	def __init__(self,featType='mfcc',config=None,sampleWidth=2,channels=1):
+
+		assert featType in ['mfcc','fbank','plp','spectrogram'], 'Expected <featType> is "mfcc", "fbank", "plp" or "spectrogram" but got {}.'.format(featType)
+
+		self.name = 'compute_' + featType
+		check_config(name=self.name,config=config)
+		self.opts = _feature_options(self.name,config)
+		self.sampleWidth = sampleWidth
+		self.channels = channels
+		self._shift,self._length,_ = _frame_geometry(self.opts)
+		self.dim = _frames_to_features(self.name,np.zeros((0,self._length),dtype=np.float32),self.opts).shape[1]
+		self.reset()
+
+	def reset(self):
+		'''
+		Usage:  obj.reset()
+
+		Clear all received audio.
+		'''
+		self._buffer = np.zeros(0,dtype=np.float32)
+		self._offset = 0
+		self._emitted = 0
+
+	@property
+	def received(self):
+		'''
+		Usage:  samples = obj.received
+
+		Return the number of samples received in current utterance.
+		'''
+		return self._offset + len(self._buffer)
+
+	def _first_sample(self,frame):
+		if self.opts['snip-edges']:
+			return frame*self._shift
+		else:
+			return frame*self._shift + self._shift//2 - self._length//2
+
+	def _compute(self,numFrames):
+		numSamples = self.received
+		if numFrames <= self._emitted:
+			return np.zeros((0,self.dim),dtype=np.float32)
+		index = _frame_indices(numSamples,numFrames,self._shift,self._length,self.opts['snip-edges'],self._emitted)
+		frames = self._buffer[index - self._offset]
+		self._emitted = numFrames
+		# Drop samples which later frames never use, keeping one frame length to reflect at the end.
+		keepFrom = max(self._first_sample(self._emitted) - self._length,0)
+		if keepFrom > self._offset:
+			self._buffer = self._buffer[keepFrom-self._offset:]
+			self._offset = keepFrom
+		return _frames_to_features(self.name,frames,self.opts).astype(np.float32)
+
+	def accept(self,chunk):
+		'''
+		Usage:  frames = obj.accept(chunk)
+
+		Receive a chunk of audio, and return features of frames which are completed by it. The result can have 0 frames.
+		'''
+		if isinstance(chunk,(bytes,bytearray)):
+			chunk = _pcm_to_samples(chunk,self.sampleWidth,self.channels,self.opts['channel'])
+		elif not isinstance(chunk,np.ndarray):
+			raise UnsupportedDataType('Expected chunk is a NumPy array or PCM bytes but got a {}.'.format(type(chunk)))
+		elif chunk.ndim == 2:
+			chunk = chunk[:,max(self.opts['channel'],0)]
+		self._buffer = np.concatenate([self._buffer,np.asarray(chunk,dtype=np.float32)])
+
+		numSamples = self.received
+		if self.opts['snip-edges']:
+			numFrames = _num_frames(numSamples,self._shift,self._length,True)
+		else:
+			# Without snip-edges, the last frames need samples that are not received yet.
+			numFrames = _num_frames(numSamples,self._shift,self._length,False)
+			while numFrames > 0 and self._first_sample(numFrames-1) + self._length > numSamples:
+				numFrames -= 1
+		return self._compute(numFrames)
+
+	def finish(self):
+		'''
+		Usage:  frames = obj.finish()
+
+		End current utterance and return features of rest frames. Then the object is reset.
+		'''
+		try:
+			return self._compute(_num_frames(self.received,self._shift,self._length,self.opts['snip-edges']))
+		finally:
+			self.reset()
+
+class Pipeline(object):
+	'''
+	Usage:  feat = Pipeline('wav.scp').compute('mfcc').cmvn(utt2spk='utt2spk').delta().splice(4).run()
+
+	A lazy feature process pipeline. Stages are only recorded until the pipeline is iterated or .run() is called, then every utterance flows through 
+	all stages one by one in this process, so only the final output is materialized. Every stage method returns a new Pipeline object.
+	<source> can be feature data (KaldiArk, KaldiDict, KaldiMmapArk or KaldiScpIndex object, or ark, scp or npy file name), or waveforms if the 
+	first stage is .compute() (wav or scp file name, waveform array, PCM bytes or a dict of them, as compute_mfcc accepts).
+	Stages which need statistics of all data, like .cmvn() with speaker or global statistics, need their input twice. Their input is written to a temporary 
+	ark file, statistics are accumulated from it and later stages go on from it, so the source is read and every stage runs only once.
+	'''
+	def __init__(self,source,useSuffix=None):
+
+		self.source = source
+		self.useSuffix = useSuffix
+		self._compute = None
+		self._stages = []
+
+	def _then(self,func,prepare=None):
+		new = copy.copy(self)
+		new._stages = self._stages + [(func,prepare)]
+		return new
+
+	def compute(self,featType='mfcc',config=None,cache=None,sampleWidth=2,channels=1):
+		'''
+		Usage:  newPipeline = obj.compute('mfcc') or newPipeline = obj.compute('fbank',config=your-configure)
+
+		Compute features of source waveforms with compute_mfcc, compute_fbank, compute_plp or compute_spectrogram. It must be the first stage.
+		'''
+		assert featType in ['mfcc','fbank','plp','spectrogram'], 'Expected <featType> is "mfcc", "fbank", "plp" or "spectrogram" but got {}.'.format(featType)
+		if self._compute != None or len(self._stages) > 0:
+			raise WrongOperation('.compute() must be the first stage of pipeline.')
+		check_config(name='compute_'+featType,config=config)
+		new = copy.copy(self)
+		new._compute = ('compute_'+featType,config,cache,sampleWidth,channels)
+		return new
+
+	def _source_items(self):
+		if self._compute != None:
+			name,config,cache,sampleWidth,channels = self._compute
+			useSuffix = "" if self.useSuffix == None else self.useSuffix.strip().lower()[-3:]
+			for _,entries in _feature_inputs(name,self.source,useSuffix,config,sampleWidth,channels):
+				for start in range(0,len(entries),64):
+					batch = entries[start:start+64]
+					if cache is None:
+						result,_ = _compute_feature_task(name,config,batch)
+					else:
+						keys = _cache_keys(name,config,batch,cache)
+						cached = [ cache.get(key) for key in keys ]
+						computed,_ = _compute_feature_task(name,config,[ entry for entry,matrix in zip(batch,cached) if matrix is None ])
+						result = _merge_cached(batch,keys,cached,computed.array,cache)
+					for utt,matrix in result.items():
+						yield utt,matrix
+		elif isinstance(self.source,(KaldiArk,KaldiDict,KaldiMmapArk)):
+			for utt,matrix in self.source.items():
+				yield utt,matrix
+		elif isinstance(self.source,KaldiScpIndex):
+			for utt in self.source:
+				yield utt,self.source[utt]
+		elif isinstance(self.source,str):
+			try:
+				data = load(self.source,self.useSuffix,useMmap=not self.source.endswith('.npy'))
+			except UnsupportedDataType:
+				# Text ark, pipe command or matrix range can not be mapped, so it is read by load() with Kaldi.
+				data = load(self.source,self.useSuffix)
+			try:
+				for utt,matrix in data.items():
+					yield utt,matrix
+			finally:
+				if isinstance(data,KaldiMmapArk):
+					data.close()
+		else:
+			raise UnsupportedDataType('Expected <source> is feature data or file name but got {}. Waveforms need .compute() stage.'.format(type(self.source)))
+
+	def _segment(self,start,end,source):
+		# A pipeline which applies stages from <start> to <end>-1 to <source>, without preparing them again.
+		new = copy.copy(self)
+		if not source is self.source:
+			new.source = source
+			new.useSuffix = None
+			new._compute = None
+		new._stages = [ (func,None) for func,_ in self._stages[start:end] ]
+		return new
+
+	def _items(self):
+		stages = [ func for func,_ in self._stages ]
+		for utt,matrix in self._source_items():
+			if len(matrix.shape) == 1:
+				matrix = matrix[None,:]
+			for func in stages:
+				matrix = func(utt,matrix)
+				if matrix is None:
+					break
+			else:
+				yield utt,matrix
+
+	def items(self):
+		'''
+		Usage:  for utt,matrix in obj.items():
+
+		Run the pipeline and yield (utterance ID, matrix) one by one.
+		Before the first output, the input of every stage which needs statistics of all data is written to a temporary ark file (unless it is the source data itself)
+		and its statistics are accumulated from the file. Later stages go on from the file, so it costs temporary disk space as large as the data at that stage.
+		'''
+		with tempfile.TemporaryDirectory() as tempDir:
+			source = self.source
+			start = 0
+			for i,(_,prepare) in enumerate(self._stages):
+				if prepare is None:
+					continue
+				if i > start or (source is self.source and self._compute != None):
+					fileName = os.path.join(tempDir,'stage{}.ark'.format(i))
+					with open(fileName,'wb') as fw:
+						for utt,matrix in self._segment(start,i,source)._items():
+							if not matrix.dtype in _ARK_DTYPE_SYMBOLS:
+								matrix = matrix.astype(np.float32)
+							fw.write(_join_ark([(utt,matrix)]))
+					source = fileName
+					start = i
+				prepare(self._segment(start,i,source))
+
+			for utt,matrix in self._segment(start,len(self._stages),source)._items():
+				yield utt,matrix
+
+	def __iter__(self):
+		return self.items()
+
+	def run(self,outFile=None):
+		'''
+		Usage:  newObj = obj.run() or obj.run('feat.ark')
+
+		Run the pipeline. Return a KaldiDict object, or if <outFile> is given, write the results into it one by one and return the file name.
+		'''
+		if outFile == None:
+			newDict = KaldiDict()
+			for utt,matrix in self.items():
+				newDict[utt] = matrix
+			return newDict
+		else:
+			assert isinstance(outFile,str), "Expected <outFile> is a name-like string."
+			if not outFile.endswith('.ark'):
+				outFile += '.ark'
+			with open(outFile,'wb') as fw:
+				for utt,matrix in self.items():
+					if not matrix.dtype in (np.float32,np.float64):
+						matrix = matrix.astype(np.float32)
+					fw.write(_join_ark([(utt,matrix)]))
+			return outFile
+
+	def map(self,func):
 		'''
-		Usage:  newObj = obj.normalize()
-		
-		Return a KaldiDict object. If <std> is True, do: 
-					alpha * (x-mean)/(std+epsilon) + belta, 
-		or do: 
-					alpha * (x-mean) + belta.
+		Usage:  newPipeline = obj.map(lambda matrix:matrix*2)
+
+		Add a stage which applies <func> to every matrix. If it returns None, the utterance is dropped.
 		'''
-		if len(self.keys()) == 0:
-			return KaldiDict()
+		return self._then(lambda utt,matrix:func(matrix))
 
-		assert isinstance(epsilon,(float,int)) and epsilon > 0, "Expected <epsilon> is positive value."
-		assert isinstance(alpha,(float,int)) and alpha > 0, "Expected <alpha> is positive value."
-		assert isinstance(beta,(float,int)), "Expected <beta> is an int or float value."
-		assert isinstance(axis,int), "Expected <axis> is an int value."
+	def cmvn(self,stats=None,utt2spk=None,std=False,isGlobal=False):
+		'''
+		Usage:  newPipeline = obj.cmvn() or newPipeline = obj.cmvn(utt2spk='utt2spk',std=True) or newPipeline = obj.cmvn('cmvn.ark',isGlobal=True)
 
-		data,uttLens = self.merge()
-		mean = np.mean(data,axis=axis)
+		Add a CMVN stage, the same as CMVNStats.apply(). <stats> can be a CMVNStats object or statistics file name.
+		If <stats> is None, statistics of every utterance (or every speaker in <utt2spk>, or of all data if <isGlobal> is "True") is accumulated by 
+		running the stages before this stage once more, unless it is per utterance, which is computed on the fly.
+		'''
+		uttMap = None if utt2spk == None else _read_utt_map(utt2spk)
+		state = {'stats':None,'transforms':{}}
+		if isinstance(stats,str):
+			stats = CMVNStats(stats)
+		elif stats != None and not isinstance(stats,CMVNStats):
+			raise UnsupportedDataType('Expected <stats> is a CMVNStats object or file name but got {}.'.format(type(stats)))
+
+		def prepare(upstream):
+			state['stats'] = CMVNStats()
+			state['stats'].accumulate(upstream,utt2spk=uttMap)
+			state['transforms'] = {}
+
+		def apply(utt,matrix):
+			if state['stats'] is None:
+				frames = np.asarray(matrix,dtype=np.float64)
+				scale,offset = CMVNStats._transform(np.stack([np.append(frames.sum(axis=0),len(frames)),np.append((frames*frames).sum(axis=0),0)]),std)
+			else:
+				key = '' if isGlobal else (utt if uttMap is None else uttMap.get(utt,None))
+				if not key in state['transforms']:
+					if isGlobal:
+						state['transforms'][key] = CMVNStats._transform(state['stats'].global_stats,std)
+					elif key in state['stats'].stats:
+						state['transforms'][key] = CMVNStats._transform(state['stats'].stats[key],std)
+					else:
+						print('Warning: No CMVN statistics of utterance {}. Skip it.'.format(utt))
+						return None
+				scale,offset = state['transforms'][key]
+			dtype = matrix.dtype if matrix.dtype == np.float64 else np.float32
+			if scale is None:
+				return matrix + offset.astype(dtype)
+			else:
+				return matrix * scale.astype(dtype) + offset.astype(dtype)
 
-		if std is True:  
-			std = np.std(data,axis=axis)
-			data = alpha*(data-mean)/(std+epsilon) + beta
+		if stats != None:
+			state['stats'] = stats
+			return self._then(apply)
+		elif uttMap is None and not isGlobal:
+			return self._then(apply)
 		else:
-			data = alpha*(data-mean) + beta
-
-		newDict = KaldiDict()
-		start = 0
-		for utt,lens in uttLens.items():
-			newDict[utt] = data[start:(start+lens)]
-			start += lens
-
-		return newDict 
+			return self._then(apply,prepare)
 
-	def cut(self,maxFrames):
+	def normalize(self,stats=None,std=True,alpha=1.0,beta=0.0,epsilon=1e-6):
 		'''
-		Usage:  newObj = obj.cut(100)
-		
-		Cut data by <maxFrames> if its frame length is larger than 1.25*<maxFrames>.
+		Usage:  newPipeline = obj.normalize() or newPipeline = obj.normalize('norm.npz')
+
+		Add a global normalization stage, the same as KaldiDict().normalize(). <stats> can be a NormalizeStats object or statistics file name.
+		If <stats> is None, statistics of all data is accumulated by running the stages before this stage once more.
 		'''
-		if len(self.keys()) == 0:
-			raise WrongOperation('No data to cut.')
+		state = {'stats':stats}
+		if isinstance(stats,str):
+			state['stats'] = NormalizeStats(stats)
+		elif stats != None and not isinstance(stats,NormalizeStats):
+			raise UnsupportedDataType('Expected <stats> is a NormalizeStats object or file name but got {}.'.format(type(stats)))
 
-		assert isinstance(maxFrames,int) and maxFrames > 0, "Expected <maxFrames> is positive int number but got {}.".format(type(maxFrames))
+		def prepare(upstream):
+			state['stats'] = NormalizeStats()
+			state['stats'].accumulate(upstream)
 
-		newData = {}
+		def apply(utt,matrix):
+			return state['stats'].transform(matrix,std,alpha,beta,epsilon)
 
-		cutThreshold = maxFrames + maxFrames//4
+		if stats != None:
+			return self._then(apply)
+		else:
+			return self._then(apply,prepare)
 
-		for key in self.keys():
-			if len(self[key].shape) == 1:
-				self[key] = self[key][None,:]
-			matrix = self[key]
-			if len(matrix) <= cutThreshold:
-				newData[key] = matrix
-			else:
-				i = 0 
-				while True:
-					newData[key+"_"+str(i)] = matrix[i*maxFrames:(i+1)*maxFrames]
-					i += 1
-					if len(matrix[i*maxFrames:]) <= cutThreshold:
-						break
-				if len(matrix[i*maxFrames:]) != 0:
-					newData[key+"_"+str(i)] = matrix[i*maxFrames:]
-		
-		return KaldiDict(newData)
+	def sliding_cmvn(self,windowsSize=600,minWindow=100,center=False,std=False):
+		'''
+		Usage:  newPipeline = obj.sliding_cmvn()
 
-	def tuple_value(self,others,sort=False):
+		Add a sliding window CMVN stage, the same as use_cmvn_sliding().
 		'''
-		Usage:  data = obj1.tuple_value(obj1)
-		
-		Return a list.
-		Tuple the utterance ID and data of the same utterance ID from different Kaldidict or KaldiArk objects.
-		If <sort> is True, sort the data by frame length of current object.
-		'''         
+		return self._then(lambda utt,matrix:_sliding_cmvn_matrix(matrix,windowsSize,minWindow,center,std))
 
-		if not isinstance(others,(list,tuple)):
-			others = [others,]
+	def delta(self,order=2,window=2):
+		'''
+		Usage:  newPipeline = obj.delta() or newPipeline = obj.delta(order=2,window=2)
 
-		for index,other in enumerate(others):
-			if isinstance(other,KaldiDict):                   
-				pass
-			elif isinstance(other,KaldiArk):
-				others[index] = other.array       
-			else:
-				raise UnsupportedDataType('Excepted KaldiArk or KaldiDict object but got {}.'.format(type(other)))
+		Add a stage to add delta features, the same as add_delta().
+		'''
+		assert isinstance(order,int) and order >= 0, "Expected <order> is a non-negative int value."
+		assert isinstance(window,int) and window > 0, "Expected <window> is a positive int value."
+		scales = _delta_scales(order,window)
+		return self._then(lambda utt,matrix:_delta_matrix(matrix,scales))
 
-		new = []
-		for utt in self.keys():
-			if len(self[utt].shape) == 1:
-				self[utt] = self[utt][None,:]
-			temp = (utt,self[utt],)
-			for other in others:
-				if len(other[utt].shape) == 1:
-					other[utt] = other[utt][None,:]
-				if not utt in other.keys():
-					break
-				else:
-					temp += (other[utt],)
-			if len(temp) < len(others) + 2:
-				continue
-			else:
-				new.append(temp)
-		
-		if sort is True:
-			new = sorted(new, key=lambda x:len(x[1]))
-		
-		return new
+	def splice(self,left=4,right=None):
+		'''
+		Usage:  newPipeline = obj.splice(4) or newPipeline = obj.splice(left=3,right=5)
+
+		Add a stage to splice context frames, the same as KaldiDict().splice().
+		'''
+		if right == None:
+			right = left
+		assert isinstance(left,int) and left >= 0, "Expected <left> is a non-negative int value."
+		assert isinstance(right,int) and right >= 0, "Expected <right> is a non-negative int value."
+		return self._then(lambda utt,matrix:_splice_matrix(matrix,left,right))
+
+	def select(self,dims):
+		'''
+		Usage:  newPipeline = obj.select('0-12')
+
+		Add a stage to select dimensions, the same as KaldiDict().select().
+		'''
+		return self._then(lambda utt,matrix:_take_dims(matrix,_compile_dims(dims,matrix.shape[1])[0]))
 
 class KaldiLattice(object):
 	'''
@@ -2458,10 +4479,16 @@ def normalize(data,std=True,alpha=1.0,beta=0.0,epsilon=1e-6,axis=0):
 	Usage:  newObj = normalize(obj)
 	
 	Return a KaldiDict object. The same as KaldiDict().normalize() fucntion.
+	A KaldiMmapArk object is normalized utterance by utterance with NormalizeStats (only <axis>=0), so it is not read into memory at once.
 	'''
 
-	if not isinstance(data,(KaldiArk,KaldiDict)):
-		raise UnsupportedDataType('Expected KaldiDict or KaldiArk object but got {}.'.format(data))
+	if isinstance(data,KaldiMmapArk):
+		assert axis == 0, "Expected <axis> is 0 to normalize a KaldiMmapArk object."
+		stats = NormalizeStats()
+		stats.accumulate(data)
+		return stats.apply(data,std,alpha,beta,epsilon)
+	elif not isinstance(data,(KaldiArk,KaldiDict)):
+		raise UnsupportedDataType('Expected KaldiDict, KaldiArk or KaldiMmapArk object but got {}.'.format(data))
 	elif isinstance(data,KaldiArk):
 		data = data.array
 
@@ -2517,129 +4544,467 @@ def splice(data,left=4,right=None):
 
 # ---------- Feature & Label Process Fucntions -----------
 
-def compute_mfcc(wavFile,rate=16000,frameWidth=25,frameShift=10,melBins=23,featDim=13,windowType='povey',useSuffix=None,config=None,asFile=False):
+_FLT_EPSILON = float(np.finfo(np.float32).eps)
+_FLT_MIN = float(np.finfo(np.float32).tiny)
+_FEATURE_TOOLS = {'compute_mfcc':'compute-mfcc-feats','compute_fbank':'compute-fbank-feats',
+				'compute_plp':'compute-plp-feats','compute_spectrogram':'compute-spectrogram-feats'}
+_FEATURE_SUFFIXES = {'compute_mfcc':'mfcc','compute_fbank':'fbank','compute_plp':'plp','compute_spectrogram':'spectrogram'}
+# Defaults of Kaldi's own binaries, which apply to every option not given in <config>.
+_FEATURE_DEFAULTS = {'sample-frequency':16000.0,'frame-length':25.0,'frame-shift':10.0,'dither':1.0,
+					'preemphasis-coefficient':0.97,'remove-dc-offset':True,'window-type':'povey',
+					'round-to-power-of-two':True,'blackman-coeff':0.42,'snip-edges':True,
+					'allow-downsample':False,'allow-upsample':False,'max-feature-vectors':-1,
+					'channel':-1,'min-duration':0.0,'subtract-mean':False,'output-format':'kaldi',
+					'utt2spk':'','vtln-map':'','vtln-warp':1.0,'write-utt2dur':'',
+					'energy-floor':0.0,'raw-energy':True,
+					'num-mel-bins':23,'low-freq':20.0,'high-freq':0.0,'vtln-low':100.0,'vtln-high':-500.0,
+					'debug-mel':False,'htk-compat':False}
+_FEATURE_KIND_DEFAULTS = {'compute_mfcc':{'num-ceps':13,'use-energy':True,'cepstral-lifter':22.0},
+						'compute_fbank':{'use-energy':False,'use-log-fbank':True,'use-power':True},
+						'compute_plp':{'num-ceps':13,'use-energy':True,'cepstral-lifter':22.0,'lpc-order':12,
+										'compress-factor':0.33333,'cepstral-scale':1.0},
+						'compute_spectrogram':{}}
+# Options the native front-end does not implement. Any value but the default makes compute_* run Kaldi.
+_FEATURE_KALDI_ONLY = {'vtln-warp':1.0,'vtln-map':'','utt2spk':'','output-format':'kaldi','write-utt2dur':''}
+_FEATURE_BATCH_FRAMES = 4000
+
+def _feature_options(name,config=None):
 	'''
-	Usage:  obj = compute_mfcc("test.wav") or compute_mfcc("test.scp")
+	Merge a compute_* <config> over Kaldi's defaults. Values are cast to the type of the default, so "true"/"false" strings and numbers are both accepted.
+	Raise UnsupportedDataType if <config> has an option the native front-end does not know or implement, so that the caller can run Kaldi instead.
+	'''
+	opts = dict(_FEATURE_DEFAULTS)
+	opts.update(_FEATURE_KIND_DEFAULTS[name])
+	if config is not None:
+		for key,value in config.items():
+			key = key.lstrip('-')
+			if not key in opts.keys():
+				raise UnsupportedDataType('Option < --{} > of {} is only supported by Kaldi.'.format(key,name))
+			proto = type(opts[key])
+			if proto is bool:
+				opts[key] = str(value).strip().lower() in ('true','1')
+			else:
+				opts[key] = proto(value)
 
-	Compute MFCC feature. If <asFile> is False, return a KaldiArk object. Or return file-path.
-	Some usual options can be assigned directly. If you want use more, set <config> = your-configure, but if you do this, these usual configures we provided will be ignored.
-	You can use .check_config('compute_mfcc') function to get configure information that you can set.
-	Also you can run shell command "compute-mfcc-feats" to look their meaning.
+	kaldiOnly = [ key for key,default in _FEATURE_KALDI_ONLY.items() if opts[key] != default ]
+	if len(kaldiOnly) > 0:
+		raise UnsupportedDataType('Option(s) {} of {} are only supported by Kaldi.'.format(' '.join([ '--'+key for key in kaldiOnly ]),name))
+	return opts
+
+def _frame_geometry(opts):
 	'''
-	if useSuffix != None:
-		assert isinstance(useSuffix,str), "Expected <useSuffix> is a string."
-		useSuffix = useSuffix.strip().lower()[-3:]
+	Return (frame shift, frame length, padded frame length) in samples, rounded the way Kaldi does.
+	'''
+	shift = int(opts['sample-frequency']*0.001*opts['frame-shift'])
+	length = int(opts['sample-frequency']*0.001*opts['frame-length'])
+	assert shift > 0 and length > 0, "Frame length and shift must be at least one sample."
+	padded = 1 << (length-1).bit_length() if opts['round-to-power-of-two'] else length
+	return shift,length,padded
+
+def _num_frames(numSamples,shift,length,snipEdges):
+	if snipEdges:
+		return 0 if numSamples < length else 1 + (numSamples-length)//shift
 	else:
-		useSuffix = ""
-	assert useSuffix in ["","scp","wav"], 'Expected <useSuffix> is "scp" or "wav".'
+		return (numSamples + shift//2)//shift
+
+def _frame_indices(numSamples,numFrames,shift,length,snipEdges,firstFrame=0):
+	'''
+	Sample index of every point of frames <firstFrame> ~ <numFrames>-1. Without <snipEdges>, frames are centered on multiples of <shift> and samples beyond the edges are reflected.
+	'''
+	starts = np.arange(firstFrame,numFrames,dtype=np.int64)*shift
+	if not snipEdges:
+		starts += shift//2 - length//2
+	index = starts[:,None] + np.arange(length,dtype=np.int64)
+	while numFrames > firstFrame:
+		low = index < 0
+		high = index >= numSamples
+		if not (low.any() or high.any()):
+			break
+		index = np.where(low,-index-1,np.where(high,2*numSamples-1-index,index))
+	return index
+
+def _window_function(windowType,length,blackmanCoeff=0.42):
+	a = 2*np.pi/(length-1) if length > 1 else 0.0
+	i = np.arange(length,dtype=np.float64)
+	if windowType == 'hanning':
+		return 0.5 - 0.5*np.cos(a*i)
+	elif windowType == 'sine':
+		return np.sin(0.5*a*i)
+	elif windowType == 'hamming':
+		return 0.54 - 0.46*np.cos(a*i)
+	elif windowType == 'povey':
+		return (0.5 - 0.5*np.cos(a*i))**0.85
+	elif windowType == 'rectangular':
+		return np.ones(length)
+	elif windowType == 'blackman':
+		return blackmanCoeff - 0.5*np.cos(a*i) + (0.5-blackmanCoeff)*np.cos(2*a*i)
+	else:
+		raise WrongOperation('Invalid window type: {}.'.format(windowType))
+
+def _mel_banks(numBins,rate,padded,lowFreq,highFreq):
+	'''
+	Return the triangular mel filters as a (numBins, padded//2+1) matrix, and their center frequencies.
+	'''
+	nyquist = 0.5*rate
+	if highFreq <= 0:
+		highFreq += nyquist
+	if numBins < 3 or not (0 <= lowFreq < nyquist and 0 < highFreq <= nyquist and lowFreq < highFreq):
+		raise WrongOperation('Bad values in options: num-mel-bins {}, low-freq {} and high-freq {} vs. nyquist {}.'.format(numBins,lowFreq,highFreq,nyquist))
+	melLow = 1127.0*np.log(1.0 + lowFreq/700.0)
+	melHigh = 1127.0*np.log(1.0 + highFreq/700.0)
+	delta = (melHigh-melLow)/(numBins+1)
+	left = (melLow + np.arange(numBins)*delta)[:,None]
+	center = left + delta
+	right = center + delta
+	mel = 1127.0*np.log(1.0 + (rate/padded)*np.arange(padded//2)/700.0)[None,:]
+	weights = np.where(mel <= center,(mel-left)/(center-left),(right-mel)/(right-center))
+	weights[(mel <= left) | (mel >= right)] = 0
+	banks = np.zeros((numBins,padded//2+1))
+	banks[:,:-1] = weights
+	return banks,700.0*(np.exp(center[:,0]/1127.0)-1.0)
+
+def _dct_matrix(numCeps,numBins):
+	k = np.arange(numCeps,dtype=np.float64)[:,None]
+	n = np.arange(numBins,dtype=np.float64)[None,:]
+	dct = np.sqrt(2.0/numBins)*np.cos(np.pi/numBins*(n+0.5)*k)
+	dct[0] = np.sqrt(1.0/numBins)
+	return dct
+
+def _lifter_coeffs(lifter,numCeps):
+	return 1.0 + 0.5*lifter*np.sin(np.pi*np.arange(numCeps)/lifter)
+
+def _floor_energy(energy,opts):
+	if opts['energy-floor'] > 0:
+		energy = np.maximum(energy,np.log(opts['energy-floor']))
+	return energy
+
+def _mfcc_from_power(power,energy,opts):
+	numBins,numCeps = opts['num-mel-bins'],opts['num-ceps']
+	if not 0 < numCeps <= numBins:
+		raise WrongOperation('<num-ceps> must be in 1 ~ num-mel-bins but got {}.'.format(numCeps))
+	banks,_ = _mel_banks(numBins,opts['sample-frequency'],(power.shape[1]-1)*2,opts['low-freq'],opts['high-freq'])
+	feat = np.log(np.maximum(power @ banks.T,_FLT_EPSILON)) @ _dct_matrix(numCeps,numBins).T
+	if opts['cepstral-lifter'] != 0:
+		feat *= _lifter_coeffs(opts['cepstral-lifter'],numCeps)
+	if opts['use-energy']:
+		feat[:,0] = _floor_energy(energy,opts)
+	if opts['htk-compat']:
+		c0 = feat[:,0] if opts['use-energy'] else feat[:,0]*np.sqrt(2)
+		feat = np.concatenate([feat[:,1:],c0[:,None]],axis=1)
+	return feat
+
+def _fbank_from_power(power,energy,opts):
+	numBins = opts['num-mel-bins']
+	banks,_ = _mel_banks(numBins,opts['sample-frequency'],(power.shape[1]-1)*2,opts['low-freq'],opts['high-freq'])
+	if not opts['use-power']:
+		power = np.sqrt(power)
+	feat = power @ banks.T
+	if opts['use-log-fbank']:
+		feat = np.log(np.maximum(feat,_FLT_EPSILON))
+	if opts['use-energy']:
+		energy = _floor_energy(energy,opts)[:,None]
+		feat = np.concatenate([feat,energy] if opts['htk-compat'] else [energy,feat],axis=1)
+	return feat
+
+def _plp_from_power(power,energy,opts):
+	numBins,numCeps,order = opts['num-mel-bins'],opts['num-ceps'],opts['lpc-order']
+	if not 0 < numCeps <= order+1:
+		raise WrongOperation('<num-ceps> must be in 1 ~ lpc-order+1 but got {}.'.format(numCeps))
+	banks,centers = _mel_banks(numBins,opts['sample-frequency'],(power.shape[1]-1)*2,opts['low-freq'],opts['high-freq'])
+	fsq = centers*centers
+	loudness = (fsq/(fsq+1.6e5))**2 * ((fsq+1.44e6)/(fsq+9.61e6))
+	mel = np.empty((power.shape[0],numBins+2))
+	mel[:,1:-1] = ((power @ banks.T)*loudness)**opts['compress-factor']
+	mel[:,0] = mel[:,1]
+	mel[:,-1] = mel[:,-2]
+	# Autocorrelation through the inverse DFT of the (symmetric) auditory spectrum.
+	dim = numBins + 2
+	bases = 2.0*np.cos(np.pi/(dim-1)*np.arange(order+1)[:,None]*np.arange(dim)[None,:])
+	bases[:,0] = 1.0
+	bases[:,-1] *= 0.5
+	autocorr = mel @ (bases/(2.0*(dim-1))).T
+	# Levinson-Durbin recursion and LPC-to-cepstrum conversion, vectorized over frames.
+	lpc = np.zeros((power.shape[0],order))
+	residual = autocorr[:,0].copy()
+	with np.errstate(divide='ignore',invalid='ignore'):
+		for i in range(order):
+			ki = (autocorr[:,i+1] + np.einsum('ij,ij->i',lpc[:,:i],autocorr[:,i:0:-1]))/residual
+			residual *= np.maximum(1 - ki*ki,1.0e-5)
+			lpc[:,:i] -= ki[:,None]*lpc[:,i-1::-1] if i > 0 else 0
+			lpc[:,i] = -ki
+		residual = np.maximum(np.log(residual),_FLT_MIN)
+	cepstrum = np.zeros((power.shape[0],order))
+	for i in range(order):
+		total = np.einsum('ij,ij->i',lpc[:,:i]*np.arange(i,0,-1),cepstrum[:,i-1::-1]) if i > 0 else 0
+		cepstrum[:,i] = -lpc[:,i] - total/(i+1)
+	feat = np.concatenate([residual[:,None],cepstrum[:,:numCeps-1]],axis=1)
+	if opts['cepstral-lifter'] != 0:
+		feat *= _lifter_coeffs(opts['cepstral-lifter'],numCeps)
+	if opts['cepstral-scale'] != 1:
+		feat *= opts['cepstral-scale']
+	if opts['use-energy']:
+		feat[:,0] = _floor_energy(energy,opts)
+	if opts['htk-compat']:
+		feat = np.concatenate([feat[:,1:],feat[:,:1]],axis=1)
+	return feat
+
+def _spectrogram_from_power(power,energy,opts):
+	feat = np.log(np.maximum(power,_FLT_EPSILON))
+	feat[:,0] = _floor_energy(energy,opts)
+	return feat
+
+_FEATURE_KINDS = {'compute_mfcc':_mfcc_from_power,'compute_fbank':_fbank_from_power,
+				'compute_plp':_plp_from_power,'compute_spectrogram':_spectrogram_from_power}
+
+def _compute_feature_matrices(name,waves,opts):
+	'''
+	Compute <name> features of a list of 1-D waveforms with the Kaldi algorithm. Return a list of float32 matrices.
+	Frames of all waveforms are processed together and transformed with one batched FFT.
+	'''
+	shift,length,padded = _frame_geometry(opts)
+	counts = [ _num_frames(len(wave),shift,length,opts['snip-edges']) for wave in waves ]
+	# Like Kaldi, frames are processed in single precision.
+	frames = np.concatenate([ np.asarray(wave,dtype=np.float32)[_frame_indices(len(wave),count,shift,length,opts['snip-edges'])] for wave,count in zip(waves,counts) ])
+	feat = _frames_to_features(name,frames,opts)
+
+	results = []
+	start = 0
+	for count in counts:
+		matrix = feat[start:start+count]
+		if opts['subtract-mean'] and count > 0:
+			matrix = matrix - matrix.mean(axis=0)
+		results.append(matrix.astype(np.float32))
+		start += count
+	return results
+
+def _frames_to_features(name,frames,opts):
+	'''
+	Process a float32 (frames, frame length) matrix of raw samples in place and return the <name> features of every frame.
+	'''
+	_,length,padded = _frame_geometry(opts)
+	if name == 'compute_spectrogram':
+		useEnergy = True
+	else:
+		useEnergy = opts['use-energy']
+	if opts['dither'] != 0:
+		frames += np.random.standard_normal(frames.shape).astype(np.float32)*np.float32(opts['dither'])
+	if opts['remove-dc-offset']:
+		frames -= frames.mean(axis=1,keepdims=True)
+	energy = None
+	if useEnergy and opts['raw-energy']:
+		energy = np.log(np.maximum(np.einsum('ij,ij->i',frames,frames),_FLT_EPSILON))
+	coeff = np.float32(opts['preemphasis-coefficient'])
+	if coeff != 0:
+		frames[:,1:] -= coeff*frames[:,:-1]
+		frames[:,0] *= 1 - coeff
+	frames *= _window_function(opts['window-type'],length,opts['blackman-coeff']).astype(np.float32)
+	if useEnergy and not opts['raw-energy']:
+		energy = np.log(np.maximum(np.einsum('ij,ij->i',frames,frames),_FLT_EPSILON))
+
+	spectrum = np.fft.rfft(frames,n=padded,axis=1)
+	spectrum = spectrum.view(spectrum.real.dtype)
+	spectrum *= spectrum
+	return _FEATURE_KINDS[name](spectrum[:,0::2] + spectrum[:,1::2],energy,opts)
+
+def _pcm_to_samples(data,width=2,channels=1,channel=-1):
+	'''
+	Decode little-endian signed PCM bytes. Return the samples of one channel as float64, unscaled like Kaldi does.
+	'''
+	if not width in (1,2,4):
+		raise UnsupportedDataType('Only 8, 16 and 32-bit PCM data can be read natively but got {}-bit samples.'.format(8*width))
+	if channel == -1:
+		channel = 0
+	elif channel >= channels:
+		raise WrongOperation('Invalid channel {}: data only has {} channel(s).'.format(channel,channels))
+	samples = np.frombuffer(data,dtype={1:'i1',2:'<i2',4:'<i4'}[width])
+	return samples[:len(samples)//channels*channels].reshape(-1,channels)[:,channel].astype(np.float64)
+
+def _read_wave(fileName,channel=-1):
+	'''
+	Read a PCM wave file. Return the sampling rate and the samples of one channel as float64, unscaled like Kaldi does.
+	'''
+	try:
+		with wave.open(fileName,'rb') as w:
+			rate,width,channels = w.getframerate(),w.getsampwidth(),w.getnchannels()
+			data = w.readframes(w.getnframes())
+	except (wave.Error,EOFError) as e:
+		raise UnsupportedDataType('Cannot read wave file {}: {}.'.format(fileName,e))
+	if width == 1:
+		# 8-bit wave files are unsigned.
+		data = (np.frombuffer(data,dtype=np.uint8) ^ 0x80).tobytes()
+	return rate,_pcm_to_samples(data,width,channels,channel)
+
+def _read_wave_scp(fileName):
+	'''
+	Read a "utterance-ID wave-file" list. Return a list of (utterance-ID, wave-file) pairs.
+	'''
+	entries = []
+	with open(fileName,'r',encoding='utf-8') as fr:
+		for line in fr:
+			line = line.strip()
+			if line == '':
+				continue
+			line = line.split(maxsplit=1)
+			if len(line) < 2:
+				raise WrongDataFormat('Wrong scp line format: {}.'.format(' '.join(line)))
+			entries.append(tuple(line))
+	return entries
+
+def _compute_feature_file(name,entries,opts):
+	'''
+	Compute features of (utterance-ID, wave-file) pairs. A waveform array can be given instead of a wave-file, which is taken to be sampled at <sample-frequency>. Return a KaldiDict object.
+	Utterances are read and computed in batches of about _FEATURE_BATCH_FRAMES frames.
+	'''
+	shift,length,_ = _frame_geometry(opts)
+	result = KaldiDict()
+	batchUtts,batchWaves,batchFrames = [],[],0
+
+	def flush():
+		for utt,matrix in zip(batchUtts,_compute_feature_matrices(name,batchWaves,opts)):
+			if len(matrix) == 0:
+				print('Warning: no frames were computed for utterance {}.'.format(utt))
+			else:
+				result[utt] = matrix
 
+	for utt,path in entries:
+		if not isinstance(path,str):
+			rate,samples = opts['sample-frequency'],path
+		elif path.endswith('|') or not os.path.isfile(path):
+			raise UnsupportedDataType('Only plain wave files can be read natively but got: {}.'.format(path))
+		else:
+			rate,samples = _read_wave(path,opts['channel'])
+			if rate != opts['sample-frequency']:
+				if (rate > opts['sample-frequency'] and opts['allow-downsample']) or (rate < opts['sample-frequency'] and opts['allow-upsample']):
+					raise UnsupportedDataType('Resampling {} from {} Hz is only supported by Kaldi.'.format(path,rate))
+				raise WrongOperation('Waveform and config sample frequency mismatch: {} vs {}.'.format(rate,opts['sample-frequency']))
+		if len(samples)/rate < opts['min-duration']:
+			print('Warning: utterance {} is too short ({} sec), skipping it.'.format(utt,len(samples)/rate))
+			continue
+		batchUtts.append(utt)
+		batchWaves.append(samples)
+		batchFrames += _num_frames(len(samples),shift,length,opts['snip-edges'])
+		if batchFrames >= _FEATURE_BATCH_FRAMES:
+			flush()
+			batchUtts,batchWaves,batchFrames = [],[],0
+	if len(batchUtts) > 0:
+		flush()
+	return result
+
+def _compute_feature_entries(name,config,entries):
+	'''
+	Compute features of (utterance-ID, wave-file) pairs natively, or with Kaldi if the native front-end does not support them. Return a KaldiArk object.
+	'''
 	global KALDIROOT,kaidiNotFoundError,ENV
-	if KALDIROOT is None:
-		raise kaidiNotFoundError
+	try:
+		return _compute_feature_file(name,entries,_feature_options(name,config)).ark
+	except UnsupportedDataType as e:
+		if not all([ isinstance(path,str) for utt,path in entries ]):
+			raise UnsupportedDataType('{} In-memory waveforms can not be given to Kaldi.'.format(e))
+		elif KALDIROOT is None:
+			raise UnsupportedDataType('{} {}'.format(e,kaidiNotFoundError))
+		kaldiTool = _FEATURE_TOOLS[name]
+		if config != None:
+			for key in config.keys():
+				kaldiTool += ' {}={}'.format(key,config[key])
+		cmd = '{} scp:- ark:-'.format(kaldiTool)
+		scpLines = ''.join([ '{} {}\n'.format(utt,path) for utt,path in entries ])
+		p = subprocess.Popen(cmd,shell=True,stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
+		(out,err) = p.communicate(input=scpLines.encode())
+		if out == b'':
+			print(err.decode())
+			raise KaldiProcessError('Compute {} defeated.'.format(_FEATURE_SUFFIXES[name]))
+		return KaldiArk(out)
+
+def _compute_feature_task(name,config,entries,outFile=None,outScpFile=False):
+	'''
+	Compute features of one shard of (utterance-ID, wave-file) pairs.
+	Return the KaldiArk object (or the saved file names if <outFile> is given) and the elapsed seconds. Worker processes of _compute_features run this function.
+	'''
+	startTime = time.time()
+	result = _compute_feature_entries(name,config,entries) if len(entries) > 0 else KaldiArk()
+	if outFile != None:
+		result = result.save(outFile,outScpFile=outScpFile)
+	return result,time.time()-startTime
+
+def _cache_keys(name,config,entries,cache):
+	'''
+	Return the keys of (utterance-ID, wave-file) pairs in <cache>.
+	'''
+	try:
+		resolved = _feature_options(name,config)
+	except UnsupportedDataType:
+		resolved = { key.lstrip('-'):str(value) for key,value in (config or {}).items() }
+	return [ cache.key(name,path,resolved) for utt,path in entries ]
+
+def _merge_cached(entries,keys,cached,computed,cache):
+	'''
+	Merge matrixes <cached> in <cache> and <computed> (a KaldiDict object of the missing ones) in the order of <entries>, and put computed ones into <cache>.
+	Return a KaldiArk object. Utterances which are neither cached nor computed (too short) are skipped.
+	'''
+	result = KaldiDict()
+	for (utt,path),key,matrix in zip(entries,keys,cached):
+		if matrix is None:
+			if not utt in computed:
+				continue
+			matrix = computed[utt]
+			cache.put(key,matrix)
+		result[utt] = matrix
+	return result.ark
 
+def _feature_inputs(name,wavFile,useSuffix="",config=None,sampleWidth=2,channels=1):
+	'''
+	Collect the inputs of feature extraction from file names, waveform arrays, PCM bytes or a dict of them.
+	Return a list of (output name, [(utterance-ID, wave-file or waveform),...]). Output name is None for in-memory inputs.
+	'''
+	inputs = []
 	if isinstance(wavFile,str):
 		if os.path.isdir(wavFile):
 			raise WrongOperation('Expected <wavFile> is file path but got a directory:{}.'.format(wavFile))
-		else:
-			p = subprocess.Popen('ls {}'.format(wavFile),shell=True,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()
-			if out == b'':
-				raise PathError("No such file:{}".format(wavFile))
-			else:
-				allFiles = out.decode().strip().split('\n')
-	else:
-		raise UnsupportedDataType('Expected filename-like string but got a {}.'.format(type(wavFile)))
-
-	kaldiTool = 'compute-mfcc-feats'
-	if config == None:    
-		config = {}
-		config["--allow-downsample"] = "true"
-		config["--allow-upsample"] = "true"
-		config["--sample-frequency"] = rate
-		config["--frame-length"] = frameWidth
-		config["--frame-shift"] = frameShift
-		config["--num-mel-bins"] = melBins
-		config["--num-ceps"] = featDim
-		config["--window-type"] = windowType
-	if check_config(name='compute_mfcc',config=config):
-		for key in config.keys():
-			kaldiTool += ' {}={}'.format(key,config[key])
-	
-	results = []
-
-	if asFile is True:
+		allFiles = sorted(glob.glob(wavFile))
+		if len(allFiles) == 0:
+			raise PathError("No such file:{}".format(wavFile))
 		for wavFile in allFiles:
 			wavFile = os.path.abspath(wavFile)
 			dirIndex = wavFile.rfind('/')
-			dirName = wavFile[:dirIndex+1]
-			fileName = wavFile[dirIndex+1:]
-			fileName = "".join(fileName.split("."))
-			outFile = dirName + fileName + ".mfcc.ark"
-
-			if fileName[-3:].lower() == 'wav':
-				cmd = 'echo {} {} | {} scp:- ark:{}'.format(fileName,wavFile,kaldiTool,outFile)
-			elif fileName[-3:].lower() == 'scp':
-				cmd = '{} scp:{} ark:{}'.format(kaldiTool,wavFile,outFile)
+			fileName = "".join(wavFile[dirIndex+1:].split("."))
+			outName = wavFile[:dirIndex+1] + fileName + ".{}".format(_FEATURE_SUFFIXES[name])
+			if wavFile[-3:].lower() == "wav":
+				inputs.append((outName,[(fileName,wavFile)]))
+			elif wavFile[-3:].lower() == 'scp':
+				inputs.append((outName,_read_wave_scp(wavFile)))
 			elif useSuffix == "wav":
-				cmd = 'echo {} {} | {} scp:- ark:{}'.format(fileName,wavFile,kaldiTool,outFile)
+				inputs.append((outName,[(fileName,wavFile)]))
 			elif useSuffix == "scp":
-				cmd = '{} scp:{} ark:{}'.format(kaldiTool,wavFile,outFile)
+				inputs.append((outName,_read_wave_scp(wavFile)))
 			else:
 				raise UnsupportedDataType('Unknown file suffix. You can declare it by making <useSuffix> "wav" or "scp".')
-			
-			p = subprocess.Popen(cmd,shell=True,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()
-			if not os.path.isfile(outFile) or os.path.getsize(outFile) == 0:
-				err = err.decode()
-				print(err)
-				if os.path.isfile(outFile):
-					os.remove(outFile)
-				raise KaldiProcessError('Compute MFCC defeated.')
-			else:
-				results.append(outFile)
-	
+	elif isinstance(wavFile,(np.ndarray,bytes,bytearray,dict)):
+		channel = int(config.get('--channel',-1)) if config != None else -1
+		waveforms = wavFile.items() if isinstance(wavFile,dict) else [('wave',wavFile)]
+		entries = []
+		for utt,data in waveforms:
+			if isinstance(data,(bytes,bytearray)):
+				data = _pcm_to_samples(data,sampleWidth,channels,channel)
+			elif not isinstance(data,np.ndarray):
+				raise UnsupportedDataType('Expected waveform is a NumPy array or PCM bytes but got a {}.'.format(type(data)))
+			elif data.ndim == 2:
+				data = data[:,max(channel,0)]
+			elif data.ndim != 1:
+				raise WrongDataFormat('Expected waveform is a 1-D (samples) or 2-D (samples x channels) array but got shape {}.'.format(data.shape))
+			entries.append((utt,data))
+		inputs.append((None,entries))
 	else:
-		for wavFile in allFiles:
-			wavFile = os.path.abspath(wavFile)
-
-			if wavFile[-3:].lower() == "wav":
-				dirIndex = wavFile.rfind('/')
-				fileName = wavFile[dirIndex+1:]
-				fileName = "".join(fileName.split("."))
-				cmd = 'echo {} {} | {} scp:- ark:-'.format(fileName,wavFile,kaldiTool)
-			elif wavFile[-3:].lower() == 'scp':
-				cmd = '{} scp:{} ark:-'.format(kaldiTool,wavFile)
-			elif "wav" in useSuffix:
-				dirIndex = wavFile.rfind('/')
-				fileName = wavFile[dirIndex+1:]
-				fileName = "".join(fileName.split("."))
-				cmd = 'echo {} {} | {} scp:- ark:-'.format(fileName,wavFile,kaldiTool)
-			elif "scp" in useSuffix:        
-				cmd = '{} scp:{} ark:-'.format(kaldiTool,wavFile)    
-			else:
-				raise UnsupportedDataType('Unknown file suffix. You can declare it by making <useSuffix> "wav" or "scp".')
-
-			p = subprocess.Popen(cmd,shell=True,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()   
-			if out == b'':
-				err = err.decode()
-				print(err)
-				raise KaldiProcessError('Compute MFCC defeated.')
-			else:
-				results.append(KaldiArk(out))
-	
-	if len(results) == 1:
-		results = results[0]
-	return results
+		raise UnsupportedDataType('Expected filename-like string, waveform array, PCM bytes or dict of them but got a {}.'.format(type(wavFile)))
+	return inputs
 
-def compute_fbank(wavFile,rate=16000,frameWidth=25,frameShift=10,melBins=23,windowType='povey',useSuffix=None,config=None,asFile=False):
+def _compute_features(name,wavFile,useSuffix,config,asFile,numWorkers=1,executor=None,cache=None,sampleWidth=2,channels=1):
 	'''
-	Usage:  obj = compute_fbank("test.wav") or compute_fbank("test.scp")
-
-	Compute fbank feature. If <asFile> is False, return a KaldiArk object. Or return file-path.
-	Some usual options can be assigned directly. If you want use more, set <config> = your-configure, but if you do this, these usual configures we provided will be ignored.
-	You can use check_config('compute_fbank') function to get configure information that you can set.
-	Also you can run shell command "compute-fbank-feats" to look their meaning.
+	Shared body of compute_mfcc, compute_fbank, compute_plp and compute_spectrogram.
+	Features are computed in-process by NumPy. Kaldi is only called for options and inputs the native front-end does not support.
+	If <numWorkers> is larger than 1 or an <executor> is given, every file, and every scp file split into <numWorkers> shards, is computed in parallel.
+	If a FeatureCache object <cache> is given, only utterances missing in it are computed. The cache is only read and written in this process, 
+	and workers compute the missing utterances, so its size, index and counters stay right. With <asFile>, every input is saved as one ark file then.
+	<wavFile> can also be a waveform array, PCM bytes of <sampleWidth> bytes and <channels> channels, or a dict of them.
 	'''
 	if useSuffix != None:
 		assert isinstance(useSuffix,str), "Expected <useSuffix> is a string."
@@ -2647,25 +5012,119 @@ def compute_fbank(wavFile,rate=16000,frameWidth=25,frameShift=10,melBins=23,wind
 	else:
 		useSuffix = ""
 	assert useSuffix in ["","scp","wav"], 'Expected <useSuffix> is "scp" or "wav".'
-
-	global KALDIROOT,kaidiNotFoundError,ENV
-	if KALDIROOT is None:
-		raise kaidiNotFoundError
-
-	if isinstance(wavFile,str):
-		if os.path.isdir(wavFile):
-			raise WrongOperation('Expected <wavFile> is file path but got a directory:{}.'.format(wavFile))
-		else:
-			p = subprocess.Popen('ls {}'.format(wavFile),shell=True,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()
-			if out == b'':
-				raise PathError("No such file:{}".format(wavFile))
+	assert isinstance(numWorkers,int) and numWorkers > 0, "Expected <numWorkers> is a positive int value."
+	assert cache is None or isinstance(cache,FeatureCache), "Expected <cache> is a FeatureCache object."
+
+	check_config(name=name,config=config)
+
+	if asFile is True and not isinstance(wavFile,str):
+		raise WrongOperation('<asFile> is only available when computing from files.')
+	inputs = _feature_inputs(name,wavFile,useSuffix,config,sampleWidth,channels)
+
+	# Look up the cache here, so that only missing utterances are given to workers.
+	if cache is not None:
+		cacheKeys = [ _cache_keys(name,config,entries,cache) for _,entries in inputs ]
+		cached = [ [ cache.get(key) for key in keys ] for keys in cacheKeys ]
+		missing = [ [ entry for entry,matrix in zip(entries,matrixes) if matrix is None ] for (_,entries),matrixes in zip(inputs,cached) ]
+
+	# Split inputs into tasks: up to <numWorkers> shards per input.
+	tasks = []
+	for fileIndex,(outName,entries) in enumerate(inputs):
+		if cache is not None:
+			entries = missing[fileIndex]
+		shards = max(min(numWorkers,len(entries)),1)
+		shardSize,remainder = divmod(len(entries),shards)
+		start = 0
+		for i in range(shards):
+			end = start + shardSize + (1 if i < remainder else 0)
+			if asFile is False or cache is not None:
+				outFile = None
+			elif shards == 1:
+				outFile = outName + ".ark"
 			else:
-				allFiles = out.decode().strip().split('\n')
+				outFile = outName + ".{}.ark".format(i+1)
+			tasks.append((fileIndex,entries[start:end],outFile,shards > 1))
+			start = end
+
+	if numWorkers == 1 and executor is None:
+		outputs = [ _compute_feature_task(name,config,entries,outFile,outScpFile) for _,entries,outFile,outScpFile in tasks ]
 	else:
-		raise UnsupportedDataType('Expected filename-like string but got a {}.'.format(type(wavFile)))
+		pool = executor if executor is not None else concurrent.futures.ProcessPoolExecutor(numWorkers)
+		try:
+			futures = [ pool.submit(_compute_feature_task,name,config,entries,outFile,outScpFile) for _,entries,outFile,outScpFile in tasks ]
+			outputs = [ future.result() for future in futures ]
+		finally:
+			if executor is None:
+				pool.shutdown()
+		for i,(task,(_,seconds)) in enumerate(zip(tasks,outputs)):
+			print('Shard {}/{}: {} utterance(s) computed in {:.2f} seconds.'.format(i+1,len(tasks),len(task[1]),seconds))
+
+	# Merge shards back in input order.
+	results = []
+	for fileIndex in range(len(inputs)):
+		shardOutputs = [ output for task,(output,_) in zip(tasks,outputs) if task[0] == fileIndex ]
+		if cache is not None:
+			computed = KaldiArk(b''.join(shardOutputs)).array
+			result = _merge_cached(inputs[fileIndex][1],cacheKeys[fileIndex],cached[fileIndex],computed,cache)
+			results.append(result if asFile is False else result.save(inputs[fileIndex][0]+".ark"))
+		elif asFile is False:
+			results.append(KaldiArk(b''.join(shardOutputs)))
+		elif len(shardOutputs) == 1:
+			results.append(shardOutputs[0])
+		else:
+			scpFile = inputs[fileIndex][0] + ".scp"
+			with open(scpFile,'w',encoding='utf-8') as fw:
+				for _,shardScpFile in shardOutputs:
+					with open(shardScpFile,'r',encoding='utf-8') as fr:
+						fw.write(fr.read())
+					os.remove(shardScpFile)
+			results.append(scpFile)
+
+	if len(results) == 1:
+		results = results[0]
+	return results
+
+def compute_mfcc(wavFile,rate=16000,frameWidth=25,frameShift=10,melBins=23,featDim=13,windowType='povey',useSuffix=None,config=None,asFile=False,numWorkers=1,executor=None,cache=None,sampleWidth=2,channels=1):
+	'''
+	Usage:  obj = compute_mfcc("test.wav") or compute_mfcc("test.scp")
+
+	Compute MFCC feature. If <asFile> is False, return a KaldiArk object. Or return file-path.
+	Some usual options can be assigned directly. If you want use more, set <config> = your-configure, but if you do this, these usual configures we provided will be ignored.
+	You can use .check_config('compute_mfcc') function to get configure information that you can set.
+	Also you can run shell command "compute-mfcc-feats" to look their meaning.
+	Features are computed by NumPy with Kaldi's algorithm. Kaldi is only needed for resampling, VTLN, HTK output, piped scp entries and options unknown to the native front-end.
+	If <numWorkers> is larger than 1, files and shards of scp files are computed by a process pool (or by your <executor>) and merged in order. With <asFile>, a sharded scp file is saved as several ark files and one scp file whose path is returned.
+	If a FeatureCache object <cache> is given, features of utterances computed before with the same configure are read from it instead of being computed again.
+	<wavFile> can also be in memory: a NumPy waveform (samples, or samples x channels) sampled at <rate>, raw PCM bytes with <sampleWidth> bytes per sample and <channels> channels, 
+	or a dict of them whose keys are utterance IDs. A single waveform gets utterance ID "wave".
+	'''
+	if config == None:    
+		config = {}
+		config["--allow-downsample"] = "true"
+		config["--allow-upsample"] = "true"
+		config["--sample-frequency"] = rate
+		config["--frame-length"] = frameWidth
+		config["--frame-shift"] = frameShift
+		config["--num-mel-bins"] = melBins
+		config["--num-ceps"] = featDim
+		config["--window-type"] = windowType
+
+	return _compute_features('compute_mfcc',wavFile,useSuffix,config,asFile,numWorkers,executor,cache,sampleWidth,channels)
+
+def compute_fbank(wavFile,rate=16000,frameWidth=25,frameShift=10,melBins=23,windowType='povey',useSuffix=None,config=None,asFile=False,numWorkers=1,executor=None,cache=None,sampleWidth=2,channels=1):
+	'''
+	Usage:  obj = compute_fbank("test.wav") or compute_fbank("test.scp")
 
-	kaldiTool = 'compute-fbank-feats'
+	Compute fbank feature. If <asFile> is False, return a KaldiArk object. Or return file-path.
+	Some usual options can be assigned directly. If you want use more, set <config> = your-configure, but if you do this, these usual configures we provided will be ignored.
+	You can use check_config('compute_fbank') function to get configure information that you can set.
+	Also you can run shell command "compute-fbank-feats" to look their meaning.
+	Features are computed by NumPy with Kaldi's algorithm. Kaldi is only needed for resampling, VTLN, HTK output, piped scp entries and options unknown to the native front-end.
+	If <numWorkers> is larger than 1, files and shards of scp files are computed by a process pool (or by your <executor>) and merged in order. With <asFile>, a sharded scp file is saved as several ark files and one scp file whose path is returned.
+	If a FeatureCache object <cache> is given, features of utterances computed before with the same configure are read from it instead of being computed again.
+	<wavFile> can also be in memory: a NumPy waveform (samples, or samples x channels) sampled at <rate>, raw PCM bytes with <sampleWidth> bytes per sample and <channels> channels, 
+	or a dict of them whose keys are utterance IDs. A single waveform gets utterance ID "wave".
+	'''
 	if config == None:    
 		config = {}
 		config["--allow-downsample"] = "true"
@@ -2675,78 +5134,10 @@ def compute_fbank(wavFile,rate=16000,frameWidth=25,frameShift=10,melBins=23,wind
 		config["--frame-shift"] = frameShift
 		config["--num-mel-bins"] = melBins
 		config["--window-type"] = windowType
-	if check_config(name='compute_fbank',config=config):
-		for key in config.keys():
-			kaldiTool += ' {}={}'.format(key,config[key])
-	
-	results = []
-
-	if asFile is True:
-
-		for wavFile in allFiles:
-			wavFile = os.path.abspath(wavFile)
-			dirIndex = wavFile.rfind('/')
-			dirName = wavFile[:dirIndex+1]
-			fileName = wavFile[dirIndex+1:]
-			fileName = "".join(fileName.split("."))
-			outFile = dirName + fileName + ".fbank.ark"
-
-			if fileName[-3:].lower() == 'wav':
-				cmd = 'echo {} {} | {} scp:- ark:{}'.format(fileName,wavFile,kaldiTool,outFile)
-			elif fileName[-3:].lower() == 'scp':
-				cmd = '{} scp:{} ark:{}'.format(kaldiTool,wavFile,outFile)
-			elif useSuffix == "wav":
-				cmd = 'echo {} {} | {} scp:- ark:{}'.format(fileName,wavFile,kaldiTool,outFile)
-			elif useSuffix == "scp":
-				cmd = '{} scp:{} ark:{}'.format(kaldiTool,wavFile,outFile)
-			else:
-				raise UnsupportedDataType('Unknown file suffix. You can declare it by making <useSuffix> "wav" or "scp".')
-	
-			p = subprocess.Popen(cmd,shell=True,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()
-			if not os.path.isfile(outFile) or os.path.getsize(outFile) == 0:
-				err = err.decode()
-				print(err)
-				if os.path.isfile(outFile):
-					os.remove(outFile)
-				raise KaldiProcessError('Compute fbank defeated.')
-			else:
-				results.append(outFile)
-	
-	else:
-		for wavFile in allFiles:
-			wavFile = os.path.abspath(wavFile)
-			if wavFile[-3:].lower() == "wav":
-				dirIndex = wavFile.rfind('/')
-				fileName = wavFile[dirIndex+1:]
-				fileName = "".join(fileName.split("."))
-				cmd = 'echo {} {} | {} scp:- ark:-'.format(fileName,wavFile,kaldiTool)
-			elif wavFile[-3:].lower() == 'scp':
-				cmd = '{} scp:{} ark:-'.format(kaldiTool,wavFile)
-			elif "wav" in useSuffix:
-				dirIndex = wavFile.rfind('/')
-				fileName = wavFile[dirIndex+1:]
-				fileName = "".join(fileName.split("."))
-				cmd = 'echo {} {} | {} scp:- ark:-'.format(fileName,wavFile,kaldiTool)
-			elif "scp" in useSuffix:        
-				cmd = '{} scp:{} ark:-'.format(kaldiTool,wavFile)    
-			else:
-				raise UnsupportedDataType('Unknown file suffix. You can declare it by making <useSuffix> "wav" or "scp".')
 
-			p = subprocess.Popen(cmd,shell=True,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()   
-			if out == b'':
-				err = err.decode()
-				print(err)
-				raise KaldiProcessError('Compute fbank defeated.')
-			else:
-				results.append(KaldiArk(out))
-	
-	if len(results) == 1:
-		results = results[0]
-	return results
+	return _compute_features('compute_fbank',wavFile,useSuffix,config,asFile,numWorkers,executor,cache,sampleWidth,channels)
 
-def compute_plp(wavFile,rate=16000,frameWidth=25,frameShift=10,melBins=23,featDim=13,windowType='povey',useSuffix=None,config=None,asFile=False):
+def compute_plp(wavFile,rate=16000,frameWidth=25,frameShift=10,melBins=23,featDim=13,windowType='povey',useSuffix=None,config=None,asFile=False,numWorkers=1,executor=None,cache=None,sampleWidth=2,channels=1):
 	'''
 	Usage:  obj = compute_plp("test.wav") or compute_plp("test.scp")
 
@@ -2754,32 +5145,12 @@ def compute_plp(wavFile,rate=16000,frameWidth=25,frameShift=10,melBins=23,featDi
 	Some usual options can be assigned directly. If you want use more, set <config> = your-configure, but if you do this, these usual configures we provided will be ignored.
 	You can use check_config('compute_plp') function to get configure information that you can set.
 	Also you can run shell command "compute-plp-feats" to look their meaning.
+	Features are computed by NumPy with Kaldi's algorithm. Kaldi is only needed for resampling, VTLN, HTK output, piped scp entries and options unknown to the native front-end.
+	If <numWorkers> is larger than 1, files and shards of scp files are computed by a process pool (or by your <executor>) and merged in order. With <asFile>, a sharded scp file is saved as several ark files and one scp file whose path is returned.
+	If a FeatureCache object <cache> is given, features of utterances computed before with the same configure are read from it instead of being computed again.
+	<wavFile> can also be in memory: a NumPy waveform (samples, or samples x channels) sampled at <rate>, raw PCM bytes with <sampleWidth> bytes per sample and <channels> channels, 
+	or a dict of them whose keys are utterance IDs. A single waveform gets utterance ID "wave".
 	'''
-	if useSuffix != None:
-		assert isinstance(useSuffix,str), "Expected <useSuffix> is a string."
-		useSuffix = useSuffix.strip().lower()[-3:]
-	else:
-		useSuffix = ""
-	assert useSuffix in ["","scp","wav"], 'Expected <useSuffix> is "scp" or "wav".'
-
-	global KALDIROOT,kaidiNotFoundError,ENV
-	if KALDIROOT is None:
-		raise kaidiNotFoundError
-
-	if isinstance(wavFile,str):
-		if os.path.isdir(wavFile):
-			raise WrongOperation('Expected <wavFile> file path but got a directory:{}.'.format(wavFile))
-		else:
-			p = subprocess.Popen('ls {}'.format(wavFile),shell=True,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()
-			if out == b'':
-				raise PathError("No such file:{}".format(wavFile))
-			else:
-				allFiles = out.decode().strip().split('\n')
-	else:
-		raise UnsupportedDataType('Expected filename-like string but got a {}.'.format(type(wavFile)))
-
-	kaldiTool = 'compute-plp-feats'
 	if config == None:    
 		config = {}
 		config["--allow-downsample"] = "true"
@@ -2790,113 +5161,23 @@ def compute_plp(wavFile,rate=16000,frameWidth=25,frameShift=10,melBins=23,featDi
 		config["--num-mel-bins"] = melBins
 		config["--num-ceps"] = featDim
 		config["--window-type"] = windowType
-	if check_config(name='compute_plp',config=config):
-		for key in config.keys():
-			kaldiTool += ' {}={}'.format(key,config[key])
-	
-	results = []
-
-	if asFile is True:
-
-		for wavFile in allFiles:
-			wavFile = os.path.abspath(wavFile)
-			dirIndex = wavFile.rfind('/')
-			dirName = wavFile[:dirIndex+1]
-			fileName = wavFile[dirIndex+1:]
-			fileName = "".join(fileName.split("."))
-			outFile = dirName + fileName + ".plp.ark"
-
-			if fileName[-3:].lower() == 'wav':
-				cmd = 'echo {} {} | {} scp:- ark:{}'.format(fileName,wavFile,kaldiTool,outFile)
-			elif fileName[-3:].lower() == 'scp':
-				cmd = '{} scp:{} ark:{}'.format(kaldiTool,wavFile,outFile)
-			elif useSuffix == "wav":
-				cmd = 'echo {} {} | {} scp:- ark:{}'.format(fileName,wavFile,kaldiTool,outFile)
-			elif useSuffix == "scp":
-				cmd = '{} scp:{} ark:{}'.format(kaldiTool,wavFile,outFile)
-			else:
-				raise UnsupportedDataType('Unknown file suffix. You can declare it by making <useSuffix> "wav" or "scp".')
-			
-			p = subprocess.Popen(cmd,shell=True,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()
-			if not os.path.isfile(outFile) or os.path.getsize(outFile) == 0:
-				err = err.decode()
-				print(err)
-				if os.path.isfile(outFile):
-					os.remove(outFile)
-				raise KaldiProcessError('Compute plp defeated.')
-			else:
-				results.append(outFile)
-	
-	else:
-
-		for wavFile in allFiles:
-			wavFile = os.path.abspath(wavFile)
-
-			if wavFile[-3:].lower() == "wav":
-				dirIndex = wavFile.rfind('/')
-				fileName = wavFile[dirIndex+1:]
-				fileName = "".join(fileName.split("."))
-				cmd = 'echo {} {} | {} scp:- ark:-'.format(fileName,wavFile,kaldiTool)
-			elif wavFile[-3:].lower() == 'scp':
-				cmd = '{} scp:{} ark:-'.format(kaldiTool,wavFile)
-			elif useSuffix == "wav":
-				dirIndex = wavFile.rfind('/')
-				fileName = wavFile[dirIndex+1:]
-				fileName = "".join(fileName.split("."))
-				cmd = 'echo {} {} | {} scp:- ark:-'.format(fileName,wavFile,kaldiTool)
-			elif useSuffix == "scp":        
-				cmd = '{} scp:{} ark:-'.format(kaldiTool,wavFile)    
-			else:
-				raise UnsupportedDataType('Unknown file suffix. You can declare it by making <useSuffix> "wav" or "scp".')
 
-			p = subprocess.Popen(cmd,shell=True,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()   
-			if out == b'':
-				err = err.decode()
-				print(err)
-				raise KaldiProcessError('Compute plp defeated.')
-			else:
-				results.append(KaldiArk(out))
-	
-	if len(results) == 1:
-		results = results[0]
-	return results
+	return _compute_features('compute_plp',wavFile,useSuffix,config,asFile,numWorkers,executor,cache,sampleWidth,channels)
 
-def compute_spectrogram(wavFile,rate=16000,frameWidth=25,frameShift=10,windowType='povey',useSuffix=None,config=None,asFile=False):
+def compute_spectrogram(wavFile,rate=16000,frameWidth=25,frameShift=10,windowType='povey',useSuffix=None,config=None,asFile=False,numWorkers=1,executor=None,cache=None,sampleWidth=2,channels=1):
 	'''
-	Usage:  obj = compute_spetrogram("test.wav") or compute_spetrogram("test.scp")
+	Usage:  obj = compute_spectrogram("test.wav") or compute_spectrogram("test.scp")
 
-	Compute spetrogram feature. If <asFile> is "False", return a KaldiArk object. Or return file-path.
+	Compute spectrogram feature. If <asFile> is "False", return a KaldiArk object. Or return file-path.
 	Some usual options can be assigned directly. If you want use more, set <config>=your-configure, but if you do this, these usual configures we provided will be ignored.
-	You can use .check_config('compute_spetrogram') function to get configure information that you can set.
-	Also you can run shell command "compute-spetrogram-feats" to look their meaning.
+	You can use .check_config('compute_spectrogram') function to get configure information that you can set.
+	Also you can run shell command "compute-spectrogram-feats" to look their meaning.
+	Features are computed by NumPy with Kaldi's algorithm. Kaldi is only needed for resampling, VTLN, HTK output, piped scp entries and options unknown to the native front-end.
+	If <numWorkers> is larger than 1, files and shards of scp files are computed by a process pool (or by your <executor>) and merged in order. With <asFile>, a sharded scp file is saved as several ark files and one scp file whose path is returned.
+	If a FeatureCache object <cache> is given, features of utterances computed before with the same configure are read from it instead of being computed again.
+	<wavFile> can also be in memory: a NumPy waveform (samples, or samples x channels) sampled at <rate>, raw PCM bytes with <sampleWidth> bytes per sample and <channels> channels, 
+	or a dict of them whose keys are utterance IDs. A single waveform gets utterance ID "wave".
 	'''
-	if useSuffix != None:
-		assert isinstance(useSuffix,str), "Expected <useSuffix> is a string."
-		useSuffix = useSuffix.strip().lower()[-3:]
-	else:
-		useSuffix = ""
-	assert useSuffix in ["","scp","wav"], 'Expected <useSuffix> is "scp" or "wav".'
-
-	global KALDIROOT,kaidiNotFoundError,ENV
-	if KALDIROOT is None:
-		raise kaidiNotFoundError
-
-	if isinstance(wavFile,str):
-		if os.path.isdir(wavFile):
-			raise WrongOperation('Expected <wavFile> is file path but got a directory:{}.'.format(wavFile))
-		else:
-			p = subprocess.Popen('ls {}'.format(wavFile),shell=True,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()
-			if out == b'':
-				raise PathError("No such file:{}".format(wavFile))
-			else:
-				allFiles = out.decode().strip().split('\n')
-	else:
-		raise UnsupportedDataType('Expected filename-like string but got a {}.'.format(type(wavFile)))
-
-	kaldiTool = 'compute-spetrogram-feats'
 	if config == None: 
 		config = {}
 		config["--allow-downsample"] = "true"
@@ -2905,156 +5186,39 @@ def compute_spectrogram(wavFile,rate=16000,frameWidth=25,frameShift=10,windowTyp
 		config["--frame-length"] = frameWidth
 		config["--frame-shift"] = frameShift
 		config["--window-type"] = windowType
-	if check_config(name='compute_spetrogram',config=config):
-		for key in config.keys():
-			kaldiTool += ' {}={}'.format(key,config[key])
-	
-	results = []
-
-	if asFile is True:
-		for wavFile in allFiles:
-			wavFile = os.path.abspath(wavFile)
-			dirIndex = wavFile.rfind('/')
-			dirName = wavFile[:dirIndex+1]
-			fileName = wavFile[dirIndex+1:]
-			fileName = "".join(fileName.split("."))
-			outFile = dirName + fileName + ".spetrogram.ark"
-
-			if fileName[-3:].lower() == 'wav':
-				cmd = 'echo {} {} | {} scp:- ark:{}'.format(fileName,wavFile,kaldiTool,outFile)
-			elif fileName[-3:].lower() == 'scp':
-				cmd = '{} scp:{} ark:{}'.format(kaldiTool,wavFile,outFile)
-			elif useSuffix == "wav":
-				cmd = 'echo {} {} | {} scp:- ark:{}'.format(fileName,wavFile,kaldiTool,outFile)
-			elif useSuffix == "scp":
-				cmd = '{} scp:{} ark:{}'.format(kaldiTool,wavFile,outFile)
-			else:
-				raise UnsupportedDataType('Unknown file suffix. You can declare it by making <useSuffix> "wav" or "scp".')
-
-			p = subprocess.Popen(cmd,shell=True,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()
-			if not os.path.isfile(outFile) or os.path.getsize(outFile) == 0:
-				err = err.decode()
-				print(err)
-				if os.path.isfile(outFile):
-					os.remove(outFile)
-				raise KaldiProcessError('Compute spetrogram defeated.')
-			else:
-				results.append(outFile)
-	else:
-		for wavFile in allFiles:
-			wavFile = os.path.abspath(wavFile)
-			if wavFile[-3:].lower() == "wav":
-				dirIndex = wavFile.rfind('/')
-				fileName = wavFile[dirIndex+1:]
-				fileName = "".join(fileName.split("."))
-				cmd = 'echo {} {} | {} scp:- ark:-'.format(fileName,wavFile,kaldiTool)
-			elif wavFile[-3:].lower() == 'scp':
-				cmd = '{} scp:{} ark:-'.format(kaldiTool,wavFile)
-			elif useSuffix == "wav":
-				dirIndex = wavFile.rfind('/')
-				fileName = wavFile[dirIndex+1:]
-				fileName = "".join(fileName.split("."))
-				cmd = 'echo {} {} | {} scp:- ark:-'.format(fileName,wavFile,kaldiTool)
-			elif useSuffix == "scp":
-				cmd = '{} scp:{} ark:-'.format(kaldiTool,wavFile)    
-			else:
-				raise UnsupportedDataType('Unknown file suffix. You can declare it by making <useSuffix> "wav" or "scp".')
 
-			p = subprocess.Popen(cmd,shell=True,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out,err) = p.communicate()   
-			if out == b'':
-				err = err.decode()
-				print(err)
-				raise KaldiProcessError('Compute spetrogram defeated.')
-			else:
-				results.append(KaldiArk(out))
-	
-	if len(results) == 1:
-		results = results[0]
-	return results
+	return _compute_features('compute_spectrogram',wavFile,useSuffix,config,asFile,numWorkers,executor,cache,sampleWidth,channels)
 
-def use_cmvn(feat,cmvnStatFile=None,utt2spkFile=None,spk2uttFile=None,outFile=None):
+def use_cmvn(feat,cmvnStatFile=None,utt2spkFile=None,spk2uttFile=None,outFile=None,std=False):
 	'''
 	Usage:  obj = use_cmvn(feat) or obj = use_cmvn(feat,cmvnStatFile,utt2spkFile) or obj = use_cmvn(feat,utt2spkFile,spk2uttFile)
 
 	Apply CMVN to feature. Return a KaldiArk object or file path if <outFile> is not None. 
 	If <cmvnStatFile> is None, it will firstly compute the CMVN state. But <utt2spkFile> and <spk2uttFile> are expected given at the same time if they are not None.
+	If <std> is "False", only normalize mean, or normalize both mean and variance.
 	''' 
-
-	global KALDIROOT,kaidiNotFoundError,ENV
-	if KALDIROOT is None:
-		raise kaidiNotFoundError
-
-	if isinstance(feat,KaldiArk):
-		pass
-	elif isinstance(feat,KaldiDict):
-		feat = feat.ark
-	else:
+	if not isinstance(feat,(KaldiArk,KaldiDict)):
 		raise UnsupportedDataType("Expected KaldiArk KaldiDict but got {}.".format(type(feat)))
 
-	fw = tempfile.NamedTemporaryFile('w+b',suffix='ark')
-
-	try:
-		if cmvnStatFile == None:
-			if spk2uttFile != None:
-				if utt2spkFile == None:
-					raise WrongOperation('Miss utt2spk file.')
-				else:
-					cmd1 = 'compute-cmvn-stats --spk2utt=ark:{} ark:- ark:-'.format(spk2uttFile)
-			else:
-				cmd1 = 'compute-cmvn-stats ark:- ark:-'
-			p1 = subprocess.Popen(cmd1,shell=True,stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out1,err1) = p1.communicate(input=feat)
-			if out1 == b'':
-				err1 = err1.decode()
-				print(err1)
-				raise KaldiProcessError("Compute cmvn stats defeated")
-			else:
-				fw.write(out1)
-				cmvnStatFile = fw.name
-
-		if cmvnStatFile.endswith('ark'):
-			cmvnStatFileOption = 'ark:'+cmvnStatFile
-		else:
-			cmvnStatFileOption = 'scp:'+cmvnStatFile
-
-		if outFile != None:
-			if not outFile.endswith('.ark'):
-				outFile += '.ark'
-			if utt2spkFile != None:
-				cmd2 = 'apply-cmvn --utt2spk=ark:{} {} ark:- ark:{}'.format(utt2spkFile,cmvnStatFileOption,outFile)
-			else:
-				cmd2 = 'apply-cmvn {} ark:- ark:{}'.format(cmvnStatFileOption,outFile)
-
-			p2 = subprocess.Popen(cmd2,shell=True,stdin=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out2,err2) = p2.communicate(input=feat)
-
-			if not os.path.isfile(outFile) or os.path.getsize(outFile) == 0:
-				err2 = err2.decode()
-				print(err2)
-				if os.path.isfile(outFile):
-					os.remove(outFile)
-				raise KaldiProcessError('Use cmvn defeated.')
-			else:
-				return outFile
+	if cmvnStatFile == None:
+		stats = CMVNStats()
+		if spk2uttFile != None:
+			if utt2spkFile == None:
+				raise WrongOperation('Miss utt2spk file.')
+			stats.accumulate(feat,spk2utt=spk2uttFile)
 		else:
-			if utt2spkFile != None:
-				cmd3 = 'apply-cmvn --utt2spk=ark:{} {} ark:- ark:-'.format(utt2spkFile,cmvnStatFileOption)
-			else:
-				cmd3 = 'apply-cmvn {} ark:- ark:-'.format(cmvnStatFileOption)
+			stats.accumulate(feat)
+	else:
+		stats = CMVNStats(cmvnStatFile)
 
-			p3 = subprocess.Popen(cmd3,shell=True,stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-			(out3,err3) = p3.communicate(input=feat)
+	result = stats.apply(feat,utt2spk=utt2spkFile,std=std).ark
 
-			if out3 == b'':
-				err3 = err3.decode()
-				print(err3)
-				raise KaldiProcessError('Use cmvn defeated.')
-			else:
-				return KaldiArk(out3)  
-	finally:
-		fw.close()
+	if outFile != None:
+		if not outFile.endswith('.ark'):
+			outFile += '.ark'
+		return result.save(outFile)
+	else:
+		return result
 
 def compute_cmvn_stats(feat,outFile,spk2uttFile=None):
 	'''
@@ -3062,128 +5226,76 @@ def compute_cmvn_stats(feat,outFile,spk2uttFile=None):
 
 	Compute CMVN state and save it as file. Return CMVN file path. 
 	''' 
-	global KALDIROOT,kaidiNotFoundError,ENV
-	if KALDIROOT is None:
-		raise kaidiNotFoundError
-
-	if isinstance(feat,KaldiArk):
-		pass
-	elif isinstance(feat,KaldiDict):
-		feat = feat.ark
-	else:
+	if not isinstance(feat,(KaldiArk,KaldiDict)):
 		raise UnsupportedDataType("Expected <feat> is a KaldiArk or KaldiDict object but got {}.".format(type(feat)))
-	
-	if spk2uttFile != None:
-		cmd = 'compute-cmvn-stats --spk2utt=ark:{} ark:-'.format(spk2uttFile)
-	else:
-		cmd = 'compute-cmvn-stats ark:-'
-
-	if outFile.endswith('.scp'):
-		cmd += ' ark,scp:{},{}'.format(outFile[0:-4]+'.ark',outFile)
-	else:
-		if not outFile.endswith('.ark'):
-			outFile = outFile + '.ark'
-		cmd += ' ark:{}'.format(outFile)
 
-	p = subprocess.Popen(cmd,shell=True,stdin=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-	(_,err) = p.communicate(input=feat)
+	stats = CMVNStats()
+	stats.accumulate(feat,spk2utt=spk2uttFile)
+	return stats.save(outFile)
 
-	if not os.path.isfile(outFile):
-		err = err.decode()
-		print(err)
-		raise KaldiProcessError('Compute CMVN stats defeated.')
-	else:
-		return outFile    
-
-def use_cmvn_sliding(feat,windowsSize=None,std=False):
+def use_cmvn_sliding(feat,windowsSize=None,std=False,minWindow=100,center=False):
 	'''
 	Usage:  obj = use_cmvn_sliding(feat) or obj = use_cmvn_sliding(feat,windows=200)
 
-	Apply sliding CMVN to feature. Return KaldiArk object. If <windowsSize> is None, the window width will be set larger than frames of <feat>.
+	Apply sliding CMVN to feature in the same way as Kaldi "apply-cmvn-sliding". Return KaldiArk object. If <windowsSize> is None, the window width will be set larger than frames of <feat>.
 	If <std> is "False", only apply "mean", or apply both "mean" and "std".
+	For online processing, use OnlineSlidingCMVN class.
 	''' 
-	global KALDIROOT,kaidiNotFoundError,ENV
-	if KALDIROOT is None:
-		raise kaidiNotFoundError
-	if isinstance(feat,KaldiArk):
+	if isinstance(feat,(KaldiArk,KaldiDict)):
 		pass
-	elif isinstance(feat,KaldiDict):
-		feat = feat.ark
 	else:
 		raise UnsupportedDataType("Expected <feat> is a KaldiArk or KaldiDict object but got {}.".format(type(feat)))
-	if windowsSize==None:
-		featLen = feat.lens[1]
-		maxLen = max([length for utt,length in featLen])
-		windowsSize = math.ceil(maxLen/100)*100
-	else:
-		assert isinstance(windowsSize,int), "Expected <windowsSize> is an int value."
-
-	if std==True:
-		std='true'
-	else:
-		std='false'
+	if windowsSize != None:
+		assert isinstance(windowsSize,int) and windowsSize > 0, "Expected <windowsSize> is a positive int value."
 
-	cmd = 'apply-cmvn-sliding --cmn-window={} --min-cmn-window=100 --norm-vars={} ark:- ark:-'.format(windowsSize,std)
-	p = subprocess.Popen(cmd,shell=True,stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-	(out,err) = p.communicate(input=feat)
-	if out == b'':
-		err = err.decode()
-		print(err)
-		raise KaldiProcessError('Use sliding cmvn defeated.')
-	else:
-		return KaldiArk(out)
+	newDict = KaldiDict()
+	for utt,matrix in feat.items():
+		if len(matrix.shape) == 1:
+			matrix = matrix[None,:]
+		newDict[utt] = _sliding_cmvn_matrix(matrix,windowsSize,minWindow,center,std)
+	return newDict.ark
 
-def add_delta(feat,order=2,outFile=None):
+def add_delta(feat,order=2,window=2,outFile=None):
 	'''
-	Usage:  newObj = add_delta(feat)
+	Usage:  newObj = add_delta(feat) or newMatrix = add_delta(matrix)
 
-	Add N orders delta to data. If <outFile> is not "None", return file path. Or return a KaldiArk object.
+	Add N orders delta to data in the same way as Kaldi "add-deltas". <window> is the size of regression window of each order.
+	If <feat> is a KaldiArk or KaldiDict object, return a KaldiArk object, or return file path if <outFile> is not "None".
+	If <feat> is a NumPy matrix of one utterance, return a new NumPy matrix, so it can be used on the fly while loading data.
 	''' 
-	global KALDIROOT,kaidiNotFoundError,ENV
-	if KALDIROOT is None:
-		raise kaidiNotFoundError
-	if isinstance(feat,KaldiArk):
-		pass
+	assert isinstance(order,int) and order >= 0, "Expected <order> is a non-negative int number."
+	assert isinstance(window,int) and window > 0, "Expected <window> is a positive int number."
+
+	if isinstance(feat,np.ndarray):
+		if len(feat.shape) == 1:
+			feat = feat[None,:]
+		return _delta_matrix(feat,_delta_scales(order,window))
+	elif isinstance(feat,KaldiArk):
+		feat = feat.array
 	elif isinstance(feat,KaldiDict):
-		feat = feat.ark
+		pass
 	else:
 		raise UnsupportedDataType("Expected <feat> is a KaldiArk or KaldiDict object but got {}.".format(type(feat)))
 	
+	result = feat.add_delta(order,window).ark
 	if outFile != None:
 		assert isinstance(outFile,str), "Expected <outFile> is a name-like string."
 		outFile = os.path.abspath(outFile)
 		if not outFile.endswith('.ark'):
 			outFile += '.ark'
-		cmd1 = 'add-deltas --delta-order={} ark:- ark:{}'.format(order,outFile)
-		p1 = subprocess.Popen(cmd1,shell=True,stdin=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-		(out,err) = p1.communicate(input=feat)
-		if not os.path.isfile(outFile) or os.path.getsize(outFile) == 0:
-			err = err.decode()
-			print(err)
-			if os.path.isfile(outFile):
-				os.remove(outFile)
-			raise KaldiProcessError('Add delta defeated.')
-		else:
-			return outFile
+		return result.save(outFile)
 	else:
-		cmd2 = 'add-deltas --delta-order={} ark:- ark:-'.format(order)
-		p2 = subprocess.Popen(cmd2,shell=True,stdin=subprocess.PIPE,stdout=subprocess.PIPE,stderr=subprocess.PIPE, env=ENV)
-		(out,err) = p2.communicate(input=feat)
-		if out == b'':
-			err = err.decode()
-			print(err)
-			raise KaldiProcessError('Add delta defeated.')
-		else:
-			return KaldiArk(out)      
+		return result
 
 def get_ali(aliFile,hmm=None,returnPhone=False):
 	raise WrongOperation(" .get_ali() function has been removed in current version. Please use .load_ali().")
 
-def load(fileName,useSuffix=None):
+def load(fileName,useSuffix=None,useMmap=False):
 	'''
 	Usage:  obj = load('feat.npy') or obj = load('feat.ark') or obj = load('feat.scp') or obj = load('feat.lst', useSuffix='scp')
 
 	Load Kaldi ark feat file, kaldi scp feat file, KaldiArk file, or KaldiDict file. Return a KaldiArk or KaldiDict object.
+	If <useMmap> is "True", binary ark files (or ark files refered by scp files) are memory-mapped rather than read, and return a KaldiMmapArk object.
 	'''
 	if useSuffix != None:
 		assert isinstance(useSuffix,str), "Expected <useSuffix> is a string."
@@ -3205,6 +5317,12 @@ def load(fileName,useSuffix=None):
 	else:
 		raise UnsupportedDataType('Expected <fileName> is file name-like string but got a {}.'.format(type(fileName)))
 
+	if useMmap is True:
+		mmapData = KaldiMmapArk()
+		for fileName in allFiles:
+			mmapData.open(fileName,useSuffix)
+		return mmapData
+
 	allData_ark = KaldiArk()
 	allData_dict = KaldiDict()
 
@@ -3226,26 +5344,35 @@ def load(fileName,useSuffix=None):
 	
 	def loadArkScpFile(fileName,allData,suffix):
 
-		global KALDIROOT,kaidiNotFoundError,ENV
-		if KALDIROOT is None:
-			raise kaidiNotFoundError
+		try:
+			if suffix == "ark":
+				data = _read_ark_file(fileName)
+			else:
+				data = _read_scp_data(fileName)
+		except UnsupportedDataType as e:
+			# Text ark, pipe command or matrix range can only be read by Kaldi
+			global KALDIROOT,kaidiNotFoundError,ENV
+			if KALDIROOT is None:
+				raise e
 
-		if suffix == "ark":
-			cmd = 'copy-feats ark:'
-		else:
-			cmd = 'copy-feats scp:'
+			if suffix == "ark":
+				cmd = 'copy-feats ark:'
+			else:
+				cmd = 'copy-feats scp:'
 
-		cmd1 = cmd + '{} ark:-'.format(fileName)
-		p = subprocess.Popen(cmd1,shell=True,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
-		(out,err) = p.communicate()
-		if out == b'':
-			err = err.decode()
-			print(err)
-			raise KaldiProcessError('Copy feat defeated.')
-		else:
-			#if sys.getsizeof(out) > 10000000000:
-			#    print('Warning: Data is extramely large. It could not be used correctly sometimes.') 
-			allData += KaldiArk(out)
+			cmd1 = cmd + '{} ark:-'.format(fileName)
+			p = subprocess.Popen(cmd1,shell=True,stdout=subprocess.PIPE,stderr=subprocess.PIPE,env=ENV)
+			(out,err) = p.communicate()
+			if out == b'':
+				err = err.decode()
+				print(err)
+				raise KaldiProcessError('Copy feat defeated.')
+			data = KaldiArk(out)
+
+		if allData == b'':
+			# Do not copy the only file.
+			return data
+		allData += data
 		return allData
 
 	for fileName in allFiles:
@@ -3264,11 +5391,11 @@ def load(fileName,useSuffix=None):
 		if allFiles[0][-3:].lower() == "npy":
 			return allData_dict + allData_ark.array
 		else:
-			return allData_ark + allData_dict.ark 
+			return allData_ark if len(allData_dict) == 0 else allData_ark + allData_dict.ark 
 	elif useSuffix == "npy":
 		return  allData_dict + allData_ark.array
 	else:
-		return allData_ark + allData_dict.ark
+		return allData_ark if len(allData_dict) == 0 else allData_ark + allData_dict.ark
 
 def load_ali(aliFile,hmm=None,returnPhone=False):
 	'''
@@ -3420,74 +5547,15 @@ def decompress(data):
 	'''
 	Usage:  obj = decompress(feat)
 
-	Expected <data> is a KaldiArk object whose data-type is "CM", kaldi compressed ark data. Return a KaldiArk object.
+	Expected <data> is a KaldiArk object whose data-type is "CM", "CM2" or "CM3", kaldi compressed ark data. Return a KaldiArk object.
 	This function is a cover of kaldi-io-for-python tools. For more information about it, please access to https://github.com/vesis84/kaldi-io-for-python/blob/master/kaldi_io/kaldi_io.py 
 	'''     
-	def _read_compressed_mat(fd):
-
-		# Format of header 'struct',
-		global_header = np.dtype([('minvalue','float32'),('range','float32'),('num_rows','int32'),('num_cols','int32')]) # member '.format' is not written,
-		per_col_header = np.dtype([('percentile_0','uint16'),('percentile_25','uint16'),('percentile_75','uint16'),('percentile_100','uint16')])
-
-		# Read global header,
-		globmin, globrange, rows, cols = np.frombuffer(fd.read(16), dtype=global_header, count=1)[0]
-		cols = int(cols)
-		rows = int(rows)
-
-		# The data is structed as [Colheader, ... , Colheader, Data, Data , .... ]
-		#                         {           cols           }{     size         }
-		col_headers = np.frombuffer(fd.read(cols*8), dtype=per_col_header, count=cols)
-		col_headers = np.array([np.array([x for x in y]) * globrange * 1.52590218966964e-05 + globmin for y in col_headers], dtype=np.float32)
-		data = np.reshape(np.frombuffer(fd.read(cols*rows), dtype='uint8', count=cols*rows), newshape=(cols,rows)) # stored as col-major,
-
-		mat = np.zeros((cols,rows), dtype='float32')
-		p0 = col_headers[:, 0].reshape(-1, 1)
-		p25 = col_headers[:, 1].reshape(-1, 1)
-		p75 = col_headers[:, 2].reshape(-1, 1)
-		p100 = col_headers[:, 3].reshape(-1, 1)
-		mask_0_64 = (data <= 64)
-		mask_193_255 = (data > 192)
-		mask_65_192 = (~(mask_0_64 | mask_193_255))
-
-		mat += (p0  + (p25 - p0) / 64. * data) * mask_0_64.astype(np.float32)
-		mat += (p25 + (p75 - p25) / 128. * (data - 64)) * mask_65_192.astype(np.float32)
-		mat += (p75 + (p100 - p75) / 63. * (data - 192)) * mask_193_255.astype(np.float32)
-
-		return mat.T,rows,cols        
-	
-	with BytesIO(data) as sp:
-		newData = []
-
-		while True:
-			data = b''
-			utt = ''
-			while True:
-				char = sp.read(1)
-				data += char
-				char = char.decode()
-				if (char == '') or (char == ' '):break
-				utt += char
-			utt = utt.strip()
-			if utt == '':break
-			binarySymbol = sp.read(2)
-			data += binarySymbol
-			binarySymbol = binarySymbol.decode()
-			if binarySymbol == '\0B':
-				dataType = sp.read(3).decode()
-				if dataType == 'CM ':
-					data += 'FM '.encode()
-					matrix,rows,cols = _read_compressed_mat(sp)
-					data += '\04'.encode()
-					data += struct.pack(np.dtype('uint32').char, rows)
-					data += '\04'.encode()
-					data += struct.pack(np.dtype('uint32').char, cols)
-					data += matrix.tobytes()
-					newData.append(data)
-				else:
-					raise UnsupportedDataType("This is not a compressed ark data.")
-			else:
-				raise WrongDataFormat('Miss right binary symbol.')    
-	return KaldiArk(b''.join(newData))
+	newData = []
+	for (utt,dataType,headOffset,dataOffset,rows,cols,endOffset) in _scan_ark(data):
+		if not dataType in _ARK_CM_TYPES:
+			raise UnsupportedDataType("This is not a compressed ark data.")
+		newData.append((utt,_read_compressed_matrix(data,dataType,dataOffset)))
+	return KaldiArk(_join_ark(newData))
 
 # ---------- Decode Funtions -----------
 
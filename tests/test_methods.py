@@ -1,4 +1,16 @@
+import os
+import struct
+import subprocess
+import tempfile
+import time
 import unittest
+from unittest import mock
+
+import numpy as np
+
+import exkaldi as E
+
+KALDI_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),'data','kaldi')
 
 
 class TestKaldiIO(unittest.TestCase):
@@ -10,4 +22,749 @@ class TestKaldiIO(unittest.TestCase):
 
     def test_sample(self):
         test = 1
-        self.assertEqual(test,1)
\ No newline at end of file
+        self.assertEqual(test,1)
+
+
+class TestCompressedMatrix(unittest.TestCase):
+
+    def test_decompress(self):
+        # With global range [0,65535] and column percentiles (0,64,192,255), every format decodes to its stored integers.
+        values = np.arange(256,dtype=np.uint8).reshape(64,4)
+        head = struct.pack('<ffii',0.0,65535.0,64,4)
+        data = b'utt1 \0BCM ' + head + np.array([0,64,192,255]*4,dtype=np.uint16).tobytes() + values.T.tobytes()
+        data += b'utt2 \0BCM2 ' + head + values.astype(np.uint16).tobytes()
+        data += b'utt3 \0BCM3 ' + struct.pack('<ffii',0.0,255.0,64,4) + values.tobytes()
+        feat = E.decompress(E.KaldiArk(data)).array
+        self.assertEqual(feat.utts,['utt1','utt2','utt3'])
+        for utt in feat.utts:
+            self.assertEqual(feat[utt].dtype,np.float32)
+            np.testing.assert_allclose(feat[utt],values,rtol=1e-5)
+
+    def test_compress(self):
+        feat = E.KaldiDict({'utt1':np.random.randn(100,13).astype('float32'),'utt2':np.random.randn(4,13).astype('float32')})
+        ark = feat.to_ark(compress=True)
+        self.assertLess(len(ark),len(feat.ark)//2)
+        newFeat = E.decompress(ark).array
+        for utt in feat.utts:
+            scale = feat[utt].max() - feat[utt].min()
+            self.assertLess(np.abs(newFeat[utt]-feat[utt]).max(),scale*0.01)
+        with tempfile.TemporaryDirectory() as tempDir:
+            arkFile,scpFile = feat.ark.save(os.path.join(tempDir,'feat.ark'),outScpFile=True,compress=True)
+            self.assertEqual(E.load(scpFile),E.load(arkFile))
+            data = E.load(arkFile)
+            self.assertEqual(data,ark)
+            self.assertEqual(data.dtype,'float32')
+            self.assertEqual(data.lens,feat.lens)
+            np.testing.assert_array_equal(data.get_matrix('utt1'),newFeat['utt1'])
+            for utt,matrix in data.items():
+                np.testing.assert_array_equal(matrix,newFeat[utt])
+            with E.load(scpFile,useMmap=True) as data:
+                np.testing.assert_array_equal(data['utt2'],newFeat['utt2'])
+
+
+class TestKaldiArk(unittest.TestCase):
+    def setUp(self):
+        self.feat = E.KaldiDict()
+        self.feat['utt1'] = np.arange(12,dtype=np.float32).reshape(4,3)
+        self.feat['utt2'] = np.ones((2,3),dtype=np.float32)
+        self.feat['utt3'] = np.zeros((5,3),dtype=np.float32)
+        self.ark = self.feat.ark
+
+    def test_meta_information(self):
+        self.assertEqual(self.ark.utts,['utt1','utt2','utt3'])
+        self.assertEqual(self.ark.lens,(3,{'utt1':4,'utt2':2,'utt3':5}))
+        self.assertEqual(self.ark.dim,3)
+        self.assertEqual(self.ark.dtype,'float32')
+        self.assertTrue(self.ark.check_format())
+
+    def test_subset(self):
+        self.assertEqual(self.ark.subset(nHead=2).utts,['utt1','utt2'])
+        self.assertEqual([x.utts for x in self.ark.subset(chunks=2)],[['utt1','utt2'],['utt3']])
+        sub = self.ark.subset(uttList=['utt3','utt1'])
+        self.assertEqual(sub.utts,['utt1','utt3'])
+        np.testing.assert_array_equal(sub.array['utt3'],self.feat['utt3'])
+        # Duplicated utterance IDs keep all their records.
+        duplicated = E.KaldiArk(bytes(self.ark)+bytes(self.feat.subset(uttList=['utt1']).ark))
+        sub = duplicated.subset(uttList=['utt1'])
+        self.assertEqual(sub.utts,['utt1','utt1'])
+        self.assertEqual(bytes(sub),bytes(self.ark.subset(uttList=['utt1']))*2)
+
+    def test_add(self):
+        other = E.KaldiDict({'utt2':np.zeros((1,3),dtype=np.float64),'utt4':np.ones((3,3),dtype=np.float64)})
+        new = self.ark + other.ark
+        self.assertEqual(new.utts,['utt1','utt2','utt3','utt4'])
+        self.assertEqual(new.array['utt4'].dtype,np.float32)
+        np.testing.assert_array_equal(new.array['utt2'],self.feat['utt2'])
+
+    def test_join_intersect(self):
+        label = E.KaldiDict({'utt3':np.zeros((5,1),dtype=np.int32),'utt4':np.ones((2,1),dtype=np.int32),'utt1':np.ones((4,1),dtype=np.int32)})
+        feat,ali = self.feat.intersect(label.ark)
+        self.assertEqual(feat.utts,['utt1','utt3'])
+        self.assertEqual(ali.utts,['utt1','utt3'])
+        self.assertIs(feat['utt1'],self.feat['utt1'])
+        with self.assertRaises(KeyError):
+            self.feat.tuple_value(label)
+        pairs = feat.tuple_value(ali)
+        self.assertEqual([x[0] for x in pairs],['utt1','utt3'])
+        np.testing.assert_array_equal(pairs[1][2],label['utt3'])
+        # Only one member with one frame can be repeated to all frames.
+        concated = self.feat.concat(E.KaldiDict({utt:np.full((1,2),i,dtype=np.float32) for i,utt in enumerate(self.feat.utts)}))
+        np.testing.assert_array_equal(concated['utt3'][:,3:],np.full((5,2),2))
+        oneFrame = E.KaldiDict({'utt1':np.zeros((1,1),dtype=np.float32)})
+        with self.assertRaises(E.core.WrongDataFormat):
+            self.feat.subset(uttList=['utt1']).concat([oneFrame,oneFrame])
+        other = E.KaldiDict({'utt2':np.zeros((1,3),dtype=np.float32),'utt5':np.ones((3,3),dtype=np.float32)})
+        joined = self.feat.join([other,E.KaldiDict({'utt6':np.ones((1,3),dtype=np.float32)})])
+        self.assertEqual(joined.utts,['utt1','utt2','utt3','utt5','utt6'])
+        np.testing.assert_array_equal(joined['utt2'],self.feat['utt2'])
+        self.assertEqual((self.feat + other).utts,joined.utts[0:4])
+        self.assertEqual(self.feat.subset(uttList=['utt3','utt9','utt1']).utts,['utt3','utt1'])
+
+    def test_matching_scale(self):
+        # Hashed matching keeps merging and subsetting of large utterance sets linear. A list scan took about 7 seconds at 20000 utterances.
+        matrix = np.zeros((1,3),dtype=np.float32)
+        first = E.KaldiDict({'utt{:06d}'.format(i):matrix for i in range(50000)})
+        second = E.KaldiDict({'utt{:06d}'.format(i):matrix for i in range(25000,75000)})
+        firstArk = first.ark
+        secondArk = second.ark
+        uttList = second.utts
+        for operation in [
+                    lambda:first + second,
+                    lambda:first.join(second),
+                    lambda:first.subset(uttList=uttList),
+                    lambda:first.intersect(second),
+                    lambda:first.intersect(second)[0].tuple_value(second),
+                    lambda:firstArk + secondArk,
+                    lambda:firstArk.subset(uttList=uttList),
+                ]:
+            start = time.time()
+            operation()
+            self.assertLess(time.time()-start,5.0)
+        self.assertEqual(len((first + second).utts),75000)
+        self.assertEqual(len(firstArk.subset(uttList=uttList).utts),25000)
+
+    def test_splice_select(self):
+        for ark in (self.ark,self.ark.to_dtype('int64')):
+            spliced = ark.splice(2,1)
+            self.assertEqual(spliced.dtype,ark.dtype)
+            expected = ark.array.splice(2,1)
+            for utt in ark.utts:
+                np.testing.assert_array_equal(spliced.get_matrix(utt),expected[utt])
+            seleArk,reseArk = ark.select('2,0',retain=True)
+            self.assertEqual(seleArk.dtype,ark.dtype)
+            for utt,matrix in ark.items():
+                np.testing.assert_array_equal(seleArk.get_matrix(utt),matrix[:,[2,0]])
+                np.testing.assert_array_equal(reseArk.get_matrix(utt),matrix[:,[1]])
+        self.assertEqual(self.ark.select('0-2',retain=True)[1],b'')
+        np.testing.assert_array_equal(self.ark.select(1).get_matrix('utt1'),self.feat['utt1'][:,1:2])
+
+    def test_to_dict(self):
+        view = self.ark.array
+        self.assertFalse(view['utt1'].flags.writeable)
+        np.testing.assert_array_equal(view['utt1'],self.feat['utt1'])
+        copied = self.ark.to_dict(copy=True)
+        self.assertTrue(copied['utt1'].flags.writeable)
+        copied['utt1'][0,0] = 100
+        self.assertEqual(self.ark.array['utt1'][0,0],0)
+
+    def test_mmap(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            arkFile = os.path.join(tempDir,'feat.ark')
+            with open(arkFile,'wb') as fw:
+                fw.write(self.ark)
+            index = self.ark._get_index()
+            with open(os.path.join(tempDir,'feat.scp'),'w') as fw:
+                for i,utt in enumerate(index.utts):
+                    fw.write('{} {}:{}\n'.format(utt,arkFile,index.headOffsets[i]+len(utt)+1))
+            for fileName in ['feat.ark','feat.scp']:
+                with E.load(os.path.join(tempDir,fileName),useMmap=True) as data:
+                    self.assertEqual(data.utts,['utt1','utt2','utt3'])
+                    self.assertEqual(data.lens,self.ark.lens)
+                    np.testing.assert_array_equal(data['utt1'],self.feat['utt1'])
+                    self.assertEqual(data.ark,self.ark)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            arkFile,scpFile = self.ark.save(os.path.join(tempDir,'feat.ark'),outScpFile=True)
+            self.assertEqual(E.load(arkFile),self.ark)
+            self.assertEqual(E.load(scpFile),self.ark)
+            files = self.ark.save(os.path.join(tempDir,'feat.ark'),chunks=2,outScpFile=True)
+            self.assertEqual(len(files),2)
+            data = E.load(files[1][1]) + E.load(files[0][1])
+            self.assertEqual(sorted(data.utts),['utt1','utt2','utt3'])
+
+    def test_scp_index(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            files = self.ark.save(os.path.join(tempDir,'feat.ark'),chunks=2,outScpFile=True)
+            scpFile = os.path.join(tempDir,'feats.scp')
+            with open(scpFile,'w') as fw:
+                for arkFile,chunkScpFile in files:
+                    with open(chunkScpFile) as fr:
+                        fw.write(fr.read())
+            indexFile = os.path.join(tempDir,'feats.idx.npz')
+            for i in range(2):
+                with E.KaldiScpIndex(scpFile,indexFile=indexFile) as index:
+                    self.assertEqual(index.utts,['utt1','utt2','utt3'])
+                    np.testing.assert_array_equal(index['utt2'],self.feat['utt2'])
+                    data = index.get_many(['utt3','utt1'])
+                    self.assertEqual(data.utts,['utt3','utt1'])
+                    np.testing.assert_array_equal(data['utt3'],self.feat['utt3'])
+                    self.assertEqual(index[1:].utts,['utt2','utt3'])
+                    self.assertRaises(KeyError,index.__getitem__,'utt4')
+            # A name without ".npz" is saved as "feats.idx.npz" and loaded from it again.
+            # The index is built again if any ark file in it is newer.
+            readScp = E.core._read_scp
+            with mock.patch.object(E.core,'_read_scp',side_effect=readScp) as mocked:
+                E.KaldiScpIndex(scpFile,indexFile=os.path.join(tempDir,'feats.idx')).close()
+                self.assertEqual(mocked.call_count,0)
+                earlier = os.path.getmtime(indexFile) - 100
+                os.utime(scpFile,(earlier,earlier))
+                os.utime(indexFile,(earlier+10,earlier+10))
+                os.utime(files[1][0],(earlier+20,earlier+20))
+                E.KaldiScpIndex(scpFile,indexFile=os.path.join(tempDir,'feats.idx')).close()
+                self.assertEqual(mocked.call_count,1)
+                E.KaldiScpIndex(scpFile,indexFile=os.path.join(tempDir,'feats.idx')).close()
+                self.assertEqual(mocked.call_count,1)
+
+
+class TestKaldiPackedDict(unittest.TestCase):
+
+    def setUp(self):
+        self.feat = E.KaldiDict({
+                        'utt1':np.random.randn(5,6).astype('float32'),
+                        'utt2':np.random.randn(3,6).astype('float32'),
+                    })
+        self.packed = self.feat.pack()
+
+    def test_views(self):
+        self.assertTrue(self.packed.is_packed)
+        self.assertEqual(self.packed.frames.shape,(8,6))
+        np.testing.assert_array_equal(self.packed.offsets,[0,5,8])
+        self.assertTrue(np.shares_memory(self.packed['utt2'],self.packed.frames))
+        self.assertEqual(self.packed.lens,self.feat.lens)
+        self.packed['utt3'] = np.zeros((2,6),dtype='float32')
+        self.assertFalse(self.packed.is_packed)
+        self.assertEqual(self.packed.frames.shape,(10,6))
+
+    def test_splice(self):
+        result = self.feat.splice(2,1)
+        self.assertIsInstance(result,E.KaldiPackedDict)
+        for utt,matrix in self.feat.items():
+            T = len(matrix)
+            expected = np.concatenate([matrix[np.clip(np.arange(T)+lag,0,T-1)] for lag in range(-2,2)],axis=1)
+            self.assertEqual(result[utt].dtype,np.float32)
+            np.testing.assert_array_equal(result[utt],expected)
+        lazyResult = dict(self.feat.splice(2,1,lazy=True))
+        np.testing.assert_array_equal(lazyResult['utt2'],result['utt2'])
+
+    def test_select(self):
+        for dims,selected,rest in [('1-3',[1,2,3],[0,4,5]),('5,0,2-3',[5,0,2,3],[1,4]),(4,[4],[0,1,2,3,5]),('0-',list(range(6)),[])]:
+            seleDict,reseDict = self.feat.select(dims,retain=True)
+            for utt,matrix in self.feat.items():
+                np.testing.assert_array_equal(seleDict[utt],matrix[:,selected])
+                if rest:
+                    np.testing.assert_array_equal(reseDict[utt],matrix[:,rest])
+            if not rest:
+                self.assertEqual(len(reseDict),0)
+        self.assertFalse(np.shares_memory(self.feat.select('1-3')['utt1'],self.feat['utt1']))
+        self.assertFalse(np.shares_memory(self.packed.select('0-4')['utt2'],self.packed.frames))
+        self.assertTrue(np.shares_memory(self.feat.select('1-3',copy=False)['utt1'],self.feat['utt1']))
+        self.assertTrue(np.shares_memory(self.packed.select('0-4',copy=False)['utt2'],self.packed.frames))
+
+    def test_global_operations(self):
+        for packedResult,result in [
+                    (self.packed.normalize(),self.feat.normalize()),
+                    (self.packed.select('4,0-2'),self.feat.select('4,0-2')),
+                    (self.packed.select(1,retain=True)[1],self.feat.select(1,retain=True)[1]),
+                    (self.packed.to_dtype('float64'),self.feat.to_dtype('float64')),
+                ]:
+            self.assertIsInstance(packedResult,E.KaldiPackedDict)
+            self.assertEqual(packedResult.utts,result.utts)
+            for utt in result.utts:
+                self.assertEqual(packedResult[utt].dtype,result[utt].dtype)
+                np.testing.assert_allclose(packedResult[utt],result[utt],rtol=1e-5)
+        data,uttLens = self.packed.merge()
+        np.testing.assert_array_equal(data,self.feat.merge()[0])
+        self.assertEqual(uttLens,{'utt1':5,'utt2':3})
+
+
+class TestDelta(unittest.TestCase):
+
+    @staticmethod
+    def kaldi_delta(matrix,order,window):
+        # A literal port of Kaldi DeltaFeatures, frame by frame.
+        scales = [np.ones(1,dtype=np.float32)]
+        for i in range(1,order+1):
+            prevScales = scales[i-1]
+            prevOffset = (len(prevScales)-1)//2
+            curOffset = prevOffset + window
+            curScales = np.zeros(len(prevScales)+2*window,dtype=np.float32)
+            normalizer = 0.0
+            for j in range(-window,window+1):
+                normalizer += j*j
+                for k in range(-prevOffset,prevOffset+1):
+                    curScales[j+k+curOffset] += j * prevScales[k+prevOffset]
+            scales.append(curScales * np.float32(1.0/normalizer))
+        frames,dim = matrix.shape
+        out = np.zeros((frames,dim*(order+1)),dtype=np.float32)
+        for frame in range(frames):
+            for i in range(order+1):
+                maxOffset = (len(scales[i])-1)//2
+                for j in range(-maxOffset,maxOffset+1):
+                    offsetFrame = min(max(frame+j,0),frames-1)
+                    out[frame,i*dim:(i+1)*dim] += scales[i][j+maxOffset] * matrix[offsetFrame]
+        return out
+
+    def test_parity(self):
+        feat = E.KaldiDict({'utt1':np.random.randn(20,5).astype('float32'),'utt2':np.random.randn(3,5).astype('float32')})
+        for order,window in [(2,2),(1,3),(3,1)]:
+            result = E.add_delta(feat,order=order,window=window).array
+            for utt in feat.utts:
+                self.assertEqual(result[utt].shape,(len(feat[utt]),5*(order+1)))
+                np.testing.assert_allclose(result[utt],self.kaldi_delta(feat[utt],order,window),rtol=1e-5,atol=1e-6)
+        self.assertIsInstance(feat.add_delta(),E.KaldiPackedDict)
+        self.assertIsInstance(E.KaldiDict().add_delta(),E.KaldiPackedDict)
+
+    def test_ramp(self):
+        ramp = np.tile(np.arange(30,dtype='float32')[:,None],(1,3))
+        result = E.add_delta(ramp)
+        np.testing.assert_array_equal(result[:,0:3],ramp)
+        np.testing.assert_allclose(result[4:-4,3:6],1.0,rtol=1e-6)
+        np.testing.assert_allclose(result[4:-4,6:9],0.0,atol=1e-6)
+
+
+class TestCMVN(unittest.TestCase):
+
+    def setUp(self):
+        self.feat = E.KaldiDict({
+                        'spk1_utt1':np.random.randn(10,4).astype('float32'),
+                        'spk1_utt2':np.random.randn(6,4).astype('float32'),
+                        'spk2_utt1':np.random.randn(8,4).astype('float32')+3,
+                    })
+        self.utt2spk = {utt:utt[0:4] for utt in self.feat.utts}
+
+    def test_stats(self):
+        stats = E.CMVNStats()
+        stats.accumulate(self.feat,utt2spk=self.utt2spk)
+        self.assertEqual(sorted(stats.keys),['spk1','spk2'])
+        frames = np.concatenate([self.feat['spk1_utt1'],self.feat['spk1_utt2']]).astype('float64')
+        np.testing.assert_allclose(stats.stats['spk1'][0],np.append(frames.sum(axis=0),16))
+        np.testing.assert_allclose(stats.stats['spk1'][1],np.append((frames**2).sum(axis=0),0))
+        # Incremental accumulation over chunks gives the same statistics.
+        chunkStats = E.CMVNStats()
+        for chunk in self.feat.subset(chunks=3):
+            chunkStats.accumulate(chunk,utt2spk=self.utt2spk)
+        np.testing.assert_allclose(chunkStats.stats['spk1'],stats.stats['spk1'])
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = stats.save(os.path.join(tempDir,'cmvn.ark'))
+            np.testing.assert_array_equal(E.CMVNStats(fileName).stats['spk2'],stats.stats['spk2'])
+
+    def test_apply(self):
+        stats = E.CMVNStats()
+        stats.accumulate(self.feat,utt2spk=self.utt2spk)
+        result = stats.apply(self.feat,utt2spk=self.utt2spk,std=True)
+        frames = np.concatenate([result['spk1_utt1'],result['spk1_utt2']])
+        np.testing.assert_allclose(frames.mean(axis=0),0,atol=1e-5)
+        np.testing.assert_allclose(frames.std(axis=0),1,atol=1e-4)
+        self.assertEqual(result['spk2_utt1'].dtype,np.float32)
+        result = E.use_cmvn(self.feat).array
+        for utt in self.feat.utts:
+            np.testing.assert_allclose(result[utt],self.feat[utt]-self.feat[utt].mean(axis=0),atol=1e-5)
+
+    def test_normalize_stats(self):
+        frames = np.concatenate([self.feat[utt] for utt in self.feat.utts]).astype('float64')
+        stats = E.NormalizeStats()
+        for chunk in self.feat.subset(chunks=3):
+            stats.accumulate(chunk)
+        self.assertEqual(stats.count,24)
+        np.testing.assert_allclose(stats.mean,frames.mean(axis=0))
+        np.testing.assert_allclose(stats.std,frames.std(axis=0))
+        result = self.feat.normalize(alpha=2.0,beta=1.0)
+        for utt in self.feat.utts:
+            expected = 2.0*(self.feat[utt]-frames.mean(axis=0))/(frames.std(axis=0)+1e-6) + 1.0
+            np.testing.assert_allclose(result[utt],expected,atol=1e-5)
+            self.assertEqual(result[utt].dtype,np.float32)
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = stats.save(os.path.join(tempDir,'norm'))
+            copied = E.KaldiDict({utt:self.feat[utt].copy() for utt in self.feat.utts})
+            E.NormalizeStats(fileName).apply(copied,alpha=2.0,beta=1.0,inPlace=True)
+            # File input is normalized in one streaming pass.
+            arkFile = self.feat.ark.save(os.path.join(tempDir,'feat.ark'))
+            with E.load(arkFile,useMmap=True) as mmapData:
+                streamed = E.normalize(mmapData,alpha=2.0,beta=1.0)
+            for utt in self.feat.utts:
+                np.testing.assert_allclose(streamed[utt],result[utt],atol=1e-5)
+        for utt in self.feat.utts:
+            np.testing.assert_allclose(copied[utt],result[utt],atol=1e-5)
+
+    @staticmethod
+    def kaldi_sliding_cmvn(matrix,cmnWindow,minWindow,center,std):
+        # A literal port of Kaldi SlidingWindowCmn, frame by frame.
+        frames = len(matrix)
+        out = np.zeros(matrix.shape)
+        for t in range(frames):
+            if center:
+                start = t - cmnWindow//2
+                end = start + cmnWindow
+            else:
+                start = t - cmnWindow
+                end = t + 1
+            if start < 0:
+                end -= start
+                start = 0
+            if not center and end < minWindow:
+                end = minWindow
+            if end > frames:
+                start = max(start-(end-frames),0)
+                end = frames
+            count = end - start
+            windowSum = matrix[start:end].sum(axis=0)
+            out[t] = matrix[t] - windowSum/count
+            if std:
+                if count == 1:
+                    out[t] = 0
+                else:
+                    variance = (matrix[start:end]**2).sum(axis=0)/count - (windowSum/count)**2
+                    out[t] *= np.maximum(variance,1e-10)**-0.5
+        return out
+
+    def test_sliding_cmvn(self):
+        matrix = np.random.randn(1500,3) + 2
+        for cmnWindow,minWindow,center,std in [(100,30,False,False),(60,0,True,True),(2000,100,False,True)]:
+            expected = self.kaldi_sliding_cmvn(matrix,cmnWindow,minWindow,center,std)
+            result = E.use_cmvn_sliding(E.KaldiDict({'utt1':matrix}),cmnWindow,std,minWindow,center).array['utt1']
+            np.testing.assert_allclose(result,expected,atol=1e-5)
+            online = E.OnlineSlidingCMVN(cmnWindow,minWindow,center,std)
+            chunks = [online.accept(matrix[i:i+7]) for i in range(0,len(matrix),7)]
+            chunks.append(online.finish())
+            np.testing.assert_allclose(np.concatenate(chunks),expected,atol=1e-4)
+
+
+class TestFeatureExtraction(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.samples = (np.random.RandomState(1).randn(8000)*2000 + 3000*np.sin(np.arange(8000)*0.05)).astype('int16')
+        self.wavFile = os.path.join(self.tempDir.name,'test.wav')
+        import wave
+        with wave.open(self.wavFile,'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(self.samples.tobytes())
+
+    def tearDown(self):
+        self.tempDir.cleanup()
+
+    @staticmethod
+    def kaldi_frames(wave,snipEdges):
+        # A literal port of Kaldi ExtractWindow and ProcessWindow (dither 0), frame by frame.
+        shift,length,padded = 160,400,512
+        if snipEdges:
+            numFrames = 1 + (len(wave)-length)//shift
+        else:
+            numFrames = (len(wave)+shift//2)//shift
+        a = 2*np.pi/(length-1)
+        window = np.array([(0.5-0.5*np.cos(a*i))**0.85 for i in range(length)])
+        frames,energies = [],[]
+        for f in range(numFrames):
+            start = f*shift if snipEdges else f*shift + shift//2 - length//2
+            frame = np.zeros(padded)
+            for s in range(length):
+                i = s + start
+                while i < 0 or i >= len(wave):
+                    i = -i-1 if i < 0 else 2*len(wave)-1-i
+                frame[s] = wave[i]
+            frame[:length] -= frame[:length].sum()/length
+            energies.append(np.log(max(np.dot(frame,frame),np.finfo(np.float32).eps)))
+            for i in range(length-1,0,-1):
+                frame[i] -= 0.97*frame[i-1]
+            frame[0] -= 0.97*frame[0]
+            frame[:length] *= window
+            frames.append(frame)
+        return frames,energies
+
+    @staticmethod
+    def kaldi_mel_banks(numBins,padded=512,rate=16000,lowFreq=20):
+        mel = lambda f:1127.0*np.log(1.0+f/700.0)
+        delta = (mel(rate/2)-mel(lowFreq))/(numBins+1)
+        banks,centers = np.zeros((numBins,padded//2+1)),[]
+        for b in range(numBins):
+            left,center,right = [mel(lowFreq)+(b+k)*delta for k in range(3)]
+            centers.append(700*(np.exp(center/1127.0)-1))
+            for i in range(padded//2):
+                m = mel(rate/padded*i)
+                if left < m < right:
+                    banks[b,i] = (m-left)/(center-left) if m <= center else (right-m)/(right-center)
+        return banks,np.array(centers)
+
+    def kaldi_mfcc(self,wave,snipEdges,numBins=23,numCeps=13,lifter=22):
+        frames,energies = self.kaldi_frames(wave,snipEdges)
+        banks,_ = self.kaldi_mel_banks(numBins)
+        out = []
+        for frame,energy in zip(frames,energies):
+            power = np.abs(np.fft.rfft(frame))**2
+            logMel = np.log(np.maximum(banks.dot(power),np.finfo(np.float32).eps))
+            ceps = np.zeros(numCeps)
+            for k in range(numCeps):
+                norm = np.sqrt(1.0/numBins) if k == 0 else np.sqrt(2.0/numBins)
+                ceps[k] = sum(norm*np.cos(np.pi/numBins*(n+0.5)*k)*logMel[n] for n in range(numBins))
+                ceps[k] *= 1.0 + 0.5*lifter*np.sin(np.pi*k/lifter)
+            ceps[0] = energy
+            out.append(ceps)
+        return np.array(out)
+
+    def kaldi_plp(self,wave,numBins=23,numCeps=13,order=12,lifter=22):
+        frames,energies = self.kaldi_frames(wave,True)
+        banks,centers = self.kaldi_mel_banks(numBins)
+        dim = numBins + 2
+        out = []
+        for frame,energy in zip(frames,energies):
+            power = np.abs(np.fft.rfft(frame))**2
+            mel = np.zeros(dim)
+            for b in range(numBins):
+                fsq = centers[b]**2
+                loudness = (fsq/(fsq+1.6e5))**2*((fsq+1.44e6)/(fsq+9.61e6))
+                mel[b+1] = (banks[b].dot(power)*loudness)**0.33333
+            mel[0],mel[-1] = mel[1],mel[-2]
+            scale = 1.0/(2.0*(dim-1))
+            autocorr = np.zeros(order+1)
+            for i in range(order+1):
+                autocorr[i] = scale*mel[0] + scale*np.cos(np.pi/(dim-1)*i*(dim-1))*mel[-1]
+                autocorr[i] += sum(2*scale*np.cos(np.pi/(dim-1)*i*j)*mel[j] for j in range(1,dim-1))
+            lpc,E = np.zeros(order),autocorr[0]
+            for i in range(order):
+                ki = (autocorr[i+1] + sum(lpc[j]*autocorr[i-j] for j in range(i)))/E
+                E *= max(1-ki*ki,1.0e-5)
+                tmp = np.zeros(order)
+                tmp[i] = -ki
+                for j in range(i):
+                    tmp[j] = lpc[j] - ki*lpc[i-j-1]
+                lpc[:i+1] = tmp[:i+1]
+            ceps = np.zeros(order)
+            for i in range(order):
+                total = sum((i-j)*lpc[j]*ceps[i-j-1] for j in range(i))
+                ceps[i] = -lpc[i] - total/(i+1)
+            feat = np.concatenate([[np.log(E)],ceps[:numCeps-1]])
+            feat *= 1.0 + 0.5*lifter*np.sin(np.pi*np.arange(numCeps)/lifter)
+            feat[0] = energy
+            out.append(feat)
+        return np.array(out)
+
+    def test_mfcc(self):
+        wave = self.samples.astype('float64')
+        for snipEdges in ['true','false']:
+            config = {'--dither':0,'--snip-edges':snipEdges}
+            result = E.compute_mfcc(self.wavFile,config=config).array
+            self.assertEqual(result.utts,['testwav'])
+            self.assertEqual(result['testwav'].dtype,np.float32)
+            np.testing.assert_allclose(result['testwav'],self.kaldi_mfcc(wave,snipEdges=='true'),rtol=1e-4,atol=1e-3)
+
+    def test_plp(self):
+        result = E.compute_plp(self.wavFile,config={'--dither':0}).array['testwav']
+        np.testing.assert_allclose(result,self.kaldi_plp(self.samples.astype('float64')),rtol=1e-4,atol=1e-3)
+
+    @staticmethod
+    def read_text_ark(fileName):
+        # Text ark of one utterance written by Kaldi "ark,t:".
+        with open(fileName,'r') as fr:
+            lines = fr.read().split('[')[1].replace(']','').strip().split('\n')
+        return np.array([ line.split() for line in lines ],dtype=np.float32)
+
+    def test_kaldi_output(self):
+        # Features written by Kaldi's compute-*-feats, see tests/data/kaldi/README.md.
+        wavFile = os.path.join(KALDI_DATA,'test.wav')
+        for name,config,fileName in [('compute_mfcc',{},'mfcc.txt'),
+                                     ('compute_fbank',{'--use-energy':'true','--htk-compat':'true'},'fbank-energy-htk.txt'),
+                                     ('compute_plp',{'--htk-compat':'true','--num-ceps':10},'plp-htk-10-ceps.txt')]:
+            config['--dither'] = 0
+            result = getattr(E,name)(wavFile,config=config).array['testwav']
+            expected = self.read_text_ark(os.path.join(KALDI_DATA,fileName))
+            self.assertEqual(result.shape,expected.shape)
+            # Kaldi works in float32, so log energies of bins far from the tone differ a little.
+            np.testing.assert_allclose(result,expected,rtol=2e-3,atol=0.1)
+
+    def test_kaldi_only_options(self):
+        config = {'--dither':0,'--vtln-warp':0.9}
+        with mock.patch.object(E.core,'KALDIROOT',None):
+            with self.assertRaises(E.core.UnsupportedDataType):
+                E.compute_mfcc(self.wavFile,config=config)
+        with self.assertRaises(E.core.UnsupportedDataType):
+            E.compute_mfcc(self.samples,config=config)
+        with self.assertRaises(E.core.UnsupportedDataType):
+            E.core._feature_options('compute_mfcc',{'--dither':0,'--verbose':1})
+        # Options the native front-end does not implement are given to Kaldi.
+        expected = E.compute_mfcc(self.wavFile,config={'--dither':0})
+        commands = []
+        def popen(cmd,*args,**kwargs):
+            commands.append(cmd)
+            return mock.Mock(communicate=lambda input=None:(bytes(expected),b''))
+        with mock.patch.object(E.core,'KALDIROOT','kaldi'), mock.patch.object(E.core.subprocess,'Popen',side_effect=popen):
+            self.assertEqual(E.compute_mfcc(self.wavFile,config=config),expected)
+        self.assertEqual(commands,['compute-mfcc-feats --dither=0 --vtln-warp=0.9 scp:- ark:-'])
+
+    def test_fbank_spectrogram(self):
+        frames,energies = self.kaldi_frames(self.samples.astype('float64'),True)
+        power = np.abs(np.fft.rfft(np.array(frames),axis=1))**2
+        fbank = E.compute_fbank(self.wavFile,config={'--dither':0,'--use-energy':'true'}).array['testwav']
+        banks,_ = self.kaldi_mel_banks(23)
+        np.testing.assert_allclose(fbank[:,0],energies,rtol=1e-5)
+        np.testing.assert_allclose(fbank[:,1:],np.log(power.dot(banks.T)),rtol=1e-4,atol=1e-3)
+        spectrogram = E.compute_spectrogram(self.wavFile,config={'--dither':0}).array['testwav']
+        self.assertEqual(spectrogram.shape,(len(frames),257))
+        np.testing.assert_allclose(spectrogram[:,1:],np.log(power[:,1:]),rtol=1e-4,atol=1e-3)
+        # Batched extraction over a scp gives the same features as one file at a time.
+        scpFile = os.path.join(self.tempDir.name,'wav.scp')
+        with open(scpFile,'w') as fw:
+            fw.write('utt1 {0}\nutt2 {0}\n'.format(self.wavFile))
+        batch = E.compute_fbank(scpFile,config={'--dither':0,'--use-energy':'true'}).array
+        self.assertEqual(batch.utts,['utt1','utt2'])
+        np.testing.assert_array_equal(batch['utt2'],fbank)
+
+    def test_parallel(self):
+        scpFile = os.path.join(self.tempDir.name,'wav.scp')
+        with open(scpFile,'w') as fw:
+            for i in range(5):
+                fw.write('utt{} {}\n'.format(i,self.wavFile))
+        config = {'--dither':0}
+        serial = E.compute_mfcc(scpFile,config=config)
+        parallel = E.compute_mfcc(scpFile,config=config,numWorkers=2)
+        self.assertEqual(parallel.utts,serial.utts)
+        self.assertEqual(parallel,serial)
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(3) as executor:
+            outFile = E.compute_mfcc(scpFile,config=config,asFile=True,numWorkers=3,executor=executor)
+        self.assertTrue(outFile.endswith('wavscp.mfcc.scp'))
+        self.assertEqual(E.load(outFile).array.utts,serial.utts)
+        np.testing.assert_array_equal(E.load(outFile).array['utt4'],serial.array['utt4'])
+
+    def test_cache(self):
+        cache = E.FeatureCache(os.path.join(self.tempDir.name,'cache'))
+        config = {'--dither':0}
+        first = E.compute_fbank(self.wavFile,config=config,cache=cache)
+        self.assertEqual((cache.hits,cache.misses,len(cache)),(0,1,1))
+        second = E.compute_fbank(self.wavFile,config=config,cache=cache)
+        self.assertEqual(cache.hits,1)
+        self.assertEqual(first,second)
+        # Another configure is another key.
+        E.compute_fbank(self.wavFile,config={'--dither':0,'--num-mel-bins':40},cache=cache)
+        self.assertEqual(len(cache),2)
+        # The least recently used file is evicted first.
+        os.utime(self.wavFile,ns=(0,0))
+        small = E.FeatureCache(cache.cacheDir,maxSize=cache.size)
+        E.compute_fbank(self.wavFile,config=config,cache=small)
+        self.assertEqual(len(small),2)
+        self.assertLessEqual(small.size,small.maxSize)
+        # Overwriting a key replaces its size.
+        small.maxSize = None
+        key = small.key('test','utt',{})
+        small.put(key,np.zeros((10,10),dtype=np.float32))
+        size = small.size
+        small.put(key,np.zeros((20,10),dtype=np.float32))
+        self.assertEqual(len(small),3)
+        self.assertEqual(small.size,size+400)
+        self.assertEqual(small.size,sum([ os.path.getsize(os.path.join(small.cacheDir,name)) for name in os.listdir(small.cacheDir) ]))
+        small.clear()
+        self.assertEqual((len(small),small.size),(0,0))
+
+    def test_cache_parallel(self):
+        import wave
+        scpFile = os.path.join(self.tempDir.name,'wav.scp')
+        with open(scpFile,'w') as fw:
+            for i in range(4):
+                wavFile = os.path.join(self.tempDir.name,'test{}.wav'.format(i))
+                with wave.open(wavFile,'wb') as w:
+                    w.setnchannels(1)
+                    w.setsampwidth(2)
+                    w.setframerate(16000)
+                    w.writeframes(self.samples[i*1000:].tobytes())
+                fw.write('utt{} {}\n'.format(i,wavFile))
+        cache = E.FeatureCache(os.path.join(self.tempDir.name,'cache'))
+        config = {'--dither':0}
+        # Workers only compute, and the cache is updated in this process.
+        first = E.compute_mfcc(scpFile,config=config,numWorkers=2,cache=cache)
+        self.assertEqual((cache.hits,cache.misses,len(cache)),(0,4,4))
+        self.assertEqual(cache.size,sum([ os.path.getsize(os.path.join(cache.cacheDir,name)) for name in os.listdir(cache.cacheDir) ]))
+        second = E.compute_mfcc(scpFile,config=config,numWorkers=2,cache=cache)
+        self.assertEqual((cache.hits,cache.misses,len(cache)),(4,4,4))
+        self.assertEqual(first,second)
+        self.assertEqual(first.utts,['utt0','utt1','utt2','utt3'])
+
+    def test_in_memory_input(self):
+        config = {'--dither':0}
+        expected = E.compute_mfcc(self.wavFile,config=config).array['testwav']
+        fromArray = E.compute_mfcc(self.samples,config=config).array
+        self.assertEqual(fromArray.utts,['wave'])
+        np.testing.assert_array_equal(fromArray['wave'],expected)
+        stereo = np.stack([self.samples,np.zeros_like(self.samples)],axis=1)
+        fromBytes = E.compute_mfcc({'utt1':self.samples.tobytes()},config=config).array
+        np.testing.assert_array_equal(fromBytes['utt1'],expected)
+        fromStereo = E.compute_mfcc({'utt2':stereo.tobytes()},config=config,channels=2).array
+        np.testing.assert_array_equal(fromStereo['utt2'],expected)
+
+    def test_online_extractor(self):
+        for featType,snipEdges in [('mfcc','true'),('mfcc','false'),('plp','false')]:
+            config = {'--dither':0,'--snip-edges':snipEdges}
+            expected = getattr(E,'compute_'+featType)(self.samples,config=config).array['wave']
+            extractor = E.OnlineFeatureExtractor(featType,config)
+            chunks = [extractor.accept(self.samples[i:i+1024]) for i in range(0,len(self.samples),1024)]
+            chunks.append(extractor.finish())
+            for chunk in chunks:
+                self.assertEqual(chunk.shape[1],expected.shape[1])
+            result = np.concatenate(chunks)
+            np.testing.assert_allclose(result,expected,rtol=1e-5,atol=1e-5)
+            self.assertEqual(extractor.received,0)
+        extractor = E.OnlineFeatureExtractor('fbank',{'--dither':0})
+        self.assertEqual(extractor.accept(self.samples[:399].tobytes()).shape,(0,extractor.dim))
+        self.assertEqual(len(extractor.accept(self.samples[399:400].tobytes())),1)
+
+    def test_pipeline(self):
+        config = {'--dither':0}
+        waves = {'spk1_utt1':self.samples,'spk1_utt2':self.samples[:5000],'spk2_utt1':self.samples[::-1].copy()}
+        utt2spk = {utt:utt[0:4] for utt in waves}
+        pipeline = E.Pipeline(waves).compute('mfcc',config).cmvn(utt2spk=utt2spk,std=True).delta().splice(2).select('0-38')
+        feat = E.compute_mfcc(waves,config=config)
+        stats = E.CMVNStats()
+        stats.accumulate(feat,utt2spk=utt2spk)
+        expected = stats.apply(feat,utt2spk=utt2spk,std=True).add_delta().splice(2).select('0-38')
+        result = pipeline.run()
+        self.assertEqual(result.utts,expected.utts)
+        for utt in expected.utts:
+            np.testing.assert_allclose(result[utt],expected[utt],rtol=1e-5,atol=1e-5)
+        # Stages are lazy and every stage method returns a new pipeline.
+        outFile = pipeline.run(os.path.join(self.tempDir.name,'feat.ark'))
+        np.testing.assert_allclose(E.load(outFile).array['spk2_utt1'],expected['spk2_utt1'],rtol=1e-5,atol=1e-5)
+        perUtt = E.Pipeline(feat).cmvn().run()
+        np.testing.assert_allclose(perUtt['spk1_utt2'],E.use_cmvn(feat).array['spk1_utt2'],atol=1e-5)
+        # Every stage runs once although two stages need statistics of all data.
+        calls = []
+        counted = E.Pipeline(feat).map(lambda matrix:calls.append(1) or matrix*2)
+        result = counted.cmvn(isGlobal=True).normalize().run()
+        self.assertEqual(len(calls),len(feat.utts))
+        expected = E.Pipeline(feat).map(lambda matrix:matrix*2).cmvn(isGlobal=True).run().normalize()
+        for utt in feat.utts:
+            np.testing.assert_allclose(result[utt],expected[utt],rtol=1e-4,atol=1e-4)
+
+    def test_pipeline_kaldi_source(self):
+        # Text ark and pipe scp can not be mapped, so they are read through "copy-feats" like load() does.
+        feat = E.KaldiDict({'utt1':np.arange(6,dtype=np.float32).reshape(2,3)})
+        arkFile = os.path.join(self.tempDir.name,'feat.ark')
+        feat.ark.save(arkFile)
+        textArk = os.path.join(self.tempDir.name,'text.ark')
+        with open(textArk,'w') as fw:
+            fw.write('utt1  [\n  0 1 2\n  3 4 5 ]\n')
+        pipeScp = os.path.join(self.tempDir.name,'pipe.scp')
+        with open(pipeScp,'w') as fw:
+            fw.write('utt1 cat {} |\n'.format(arkFile))
+        realPopen = subprocess.Popen
+        commands = []
+        def popen(cmd,*args,**kwargs):
+            if cmd.startswith('copy-feats'):
+                commands.append(cmd)
+                return mock.Mock(communicate=lambda:(bytes(feat.ark),b''))
+            return realPopen(cmd,*args,**kwargs)
+        with mock.patch.object(E.core,'KALDIROOT','kaldi'), mock.patch.object(E.core.subprocess,'Popen',side_effect=popen):
+            for source,command in [(textArk,'copy-feats ark:'),(pipeScp,'copy-feats scp:')]:
+                result = E.Pipeline(source).map(lambda matrix:matrix*2).run()
+                np.testing.assert_array_equal(result['utt1'],feat['utt1']*2)
+                self.assertTrue(commands[-1].startswith(command))